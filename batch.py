@@ -0,0 +1,326 @@
+import numpy as np
+import engine
+import protocol
+
+
+"""
+Vectorized simulation of many independent matches at once, for bot training and balance analysis.
+A BatchEngine holds N boards as NumPy arrays and advances all of them in one step() call,
+with the rules of engine.update_game: every snake moves in player order, eats the food on
+its new head cell (keeping its tail), and dies on a wall, on its own body or on another
+snake's body; a head-to-head collision kills the shorter snake (both on a tie). Dead snakes
+are removed at the end of the tick, eaten food respawns on a random empty cell, and a match
+ends when at most one snake is left or the board has no room for food. Boards with a single
+player (for training a snake on its own) end when that snake dies.
+Player order matters for these rules, so a step loops over the player slots in Python and
+handles every board at once inside each slot.
+Each board is stored as an occupancy grid (owner code per cell, as in engine) plus a link
+grid giving, for each body cell, the direction towards the next segment nearer the head.
+A snake is then only its head cell, tail cell and length: the tail follows the links, so no
+body buffer is needed and memory stays two bytes per cell.
+"""
+
+
+# Direction codes are the wire codes of protocol.DIRECTIONS (UP, DOWN, LEFT, RIGHT)
+UP, DOWN, LEFT, RIGHT = (protocol.DIRECTION_CODES[name] for name in ("UP", "DOWN", "LEFT", "RIGHT"))
+
+# Reversing a direction flips its lowest bit (UP <-> DOWN, LEFT <-> RIGHT)
+REVERSE = 1
+
+# Input value meaning "keep the current direction"
+NO_INPUT = -1
+
+# Random cells tried for new food before counting a board's empty cells
+SPAWN_ATTEMPTS = 4
+
+
+class BatchEngine:
+    """
+    N boards of columns x rows cells with up to players snakes each.
+    Per-board arrays have the board as first axis; per-snake arrays are (boards, players).
+    Cells are numbered row by row (cell = row * columns + column) and -1 means none.
+    """
+
+    def __init__(self, boards, players=2, columns=None, rows=None, starts=None, seed=None):
+        self.boards = boards
+        self.players = players
+        self.columns = columns or engine.COLUMNS
+        self.rows = rows or engine.ROWS
+        self.cells = self.columns * self.rows
+        self.rng = np.random.default_rng(seed)
+
+        # Starting cells and directions: the server's starting positions, placed on this board
+        if starts is None:
+            starts = []
+            for index in range(min(players, len(engine.starting_positions))):
+                column, row, direction = engine.starting_cell(index, self.columns, self.rows)
+                starts.append((column, row, protocol.DIRECTION_CODES[direction]))
+        if len(starts) < players:
+            raise ValueError(f"{players} players need {players} starting positions")
+        self.starts = starts
+
+        # Cell offset of one move in each direction
+        self.offsets = np.zeros(4, np.int64)
+        self.offsets[[UP, DOWN, LEFT, RIGHT]] = (-self.columns, self.columns, -1, 1)
+
+        # Boards
+        self.owner = np.zeros((boards, self.cells), np.uint8)
+        self.link = np.zeros((boards, self.cells), np.uint8)
+        self.food = np.full(boards, -1, np.int64)
+        self.game_over = np.zeros(boards, bool)
+        self.winner = np.full(boards, -1, np.int64)
+        self.board_full = np.zeros(boards, bool)
+        self.ticks = np.zeros(boards, np.int64)
+
+        # Snakes
+        self.alive = np.zeros((boards, players), bool)
+        self.head = np.full((boards, players), -1, np.int64)
+        self.tail = np.full((boards, players), -1, np.int64)
+        self.length = np.zeros((boards, players), np.int64)
+        self.direction = np.zeros((boards, players), np.int64)
+        self.score = np.zeros((boards, players), np.int64)
+
+        self.reset()
+
+    def reset(self, mask=None):
+        """
+        Parameters: Boolean array of the boards to restart, None for all of them (mask)
+
+        Function for starting new matches: every snake at its starting position with
+        engine.BODY_PARTS segments, scores at zero and a new food cell.
+
+        Returns: NULL (Nothing)
+        """
+        index = np.arange(self.boards) if mask is None else np.flatnonzero(mask)
+        if not len(index):
+            return
+
+        self.owner[index] = 0
+        self.food[index] = -1
+        self.game_over[index] = False
+        self.winner[index] = -1
+        self.board_full[index] = False
+        self.ticks[index] = 0
+        self.score[index] = 0
+        self.alive[index] = True
+        self.length[index] = engine.BODY_PARTS
+
+        # Lay out each snake behind its head, linked towards the head
+        for slot, (column, row, direction) in enumerate(self.starts[:self.players]):
+            step = self.offsets[direction]
+            cells = [row * self.columns + column - step * i for i in range(engine.BODY_PARTS)]
+            columns = [column - (step if abs(step) == 1 else 0) * i for i in range(engine.BODY_PARTS)]
+            if not all(0 <= cell < self.cells for cell in cells) or not all(0 <= c < self.columns for c in columns):
+                raise ValueError(f"Starting position {slot} does not fit on a {self.columns}x{self.rows} board")
+
+            self.owner[index[:, None], cells] = slot + 1
+            self.link[index[:, None], cells] = direction
+            self.head[index, slot] = cells[0]
+            self.tail[index, slot] = cells[-1]
+            self.direction[index, slot] = direction
+
+        self.food[index] = self.spawn_food(index)
+
+    def spawn_food(self, index):
+        """
+        Parameters: array of board numbers (index)
+
+        Function for drawing a uniformly random empty cell on each of the given boards.
+        A few random cells are tried first (an occupied one is drawn again), so only the
+        crowded boards pay for scanning their grid.
+
+        Returns: Array of cells, -1 for a board with no empty cell
+        """
+        cells = np.full(len(index), -1, np.int64)
+
+        # Random cells, kept where they are empty (cheap while boards are mostly empty)
+        todo = np.arange(len(index))
+        for _ in range(SPAWN_ATTEMPTS):
+            if not len(todo):
+                return cells
+            guess = self.rng.integers(0, self.cells, len(todo))
+            hit = self.owner[index[todo], guess] == 0
+            cells[todo[hit]] = guess[hit]
+            todo = todo[~hit]
+
+        # Crowded boards: pick among their empty cells directly
+        if len(todo):
+            free = self.owner[index[todo]] == 0
+            counts = free.sum(axis=1)
+            pick = (self.rng.random(len(todo)) * counts).astype(np.int64)
+            chosen = np.argmax(np.cumsum(free, axis=1) > pick[:, None], axis=1)
+            cells[todo] = np.where(counts > 0, chosen, -1)
+        return cells
+
+    def step(self, directions=None):
+        """
+        Parameters: (boards, players) array of direction codes to turn to, NO_INPUT to keep
+                    going, None for no input at all (directions)
+
+        Function for playing one tick on every board whose match is still running.
+        Turns are validated as on the server (a 180-degree turn is ignored).
+
+        Returns: Boolean array of the boards whose match ended on this tick
+        """
+        running = ~self.game_over
+        alive_before = self.alive.sum(axis=1)
+
+        # Apply the inputs
+        if directions is not None:
+            directions = np.asarray(directions)
+            turn = running[:, None] & self.alive & (directions >= 0) & (directions != self.direction ^ REVERSE)
+            self.direction[turn] = directions[turn]
+
+        removed = np.zeros((self.boards, self.players), bool)
+        eaten = np.zeros(self.boards, bool)
+
+        for slot in range(self.players):
+            index = np.flatnonzero(running & self.alive[:, slot] & ~removed[:, slot])
+            if len(index):
+                self._move_slot(slot, index, removed, eaten)
+
+        # Respawn eaten food (before the dead are removed, as on the server)
+        eaters = np.flatnonzero(eaten)
+        self.food[eaters] = self.spawn_food(eaters)
+
+        # Remove the dead, leaving cells that another snake claimed this tick alone
+        for slot in range(self.players):
+            dead = np.flatnonzero(removed[:, slot] & self.alive[:, slot])
+            if len(dead):
+                cells = self.owner[dead] == slot + 1
+                self.owner[dead] = np.where(cells, 0, self.owner[dead])
+                self.alive[dead, slot] = False
+                self.head[dead, slot] = -1
+
+        # No room for food even after clearing the dead: the highest score wins
+        retry = eaters[self.food[eaters] < 0]
+        self.food[retry] = self.spawn_food(retry)
+        full = retry[self.food[retry] < 0]
+        if len(full):
+            self.board_full[full] = True
+            scores = np.where(self.alive[full], self.score[full], -1)
+            best = scores.max(axis=1, keepdims=True)
+            leaders = (scores == best) & self.alive[full]
+            single = leaders.sum(axis=1) == 1
+            self.winner[full] = np.where(single, np.argmax(leaders, axis=1), -1)
+
+        # Last snake standing wins; no snake left is a tie (a one-player board ends when its snake dies)
+        remaining = self.alive.sum(axis=1)
+        if self.players == 1:
+            over = running & (remaining == 0) & ~self.board_full
+        else:
+            over = running & (remaining <= 1) & (alive_before > 1) & ~self.board_full
+        self.winner[over] = np.where(remaining[over] == 1, np.argmax(self.alive[over], axis=1), -1)
+
+        finished = running & (over | self.board_full)
+        self.game_over |= finished
+        self.ticks[running] += 1
+        return finished
+
+    def _move_slot(self, slot, index, removed, eaten):
+        """
+        Parameters: player slot (slot), boards on which its snake moves (index),
+                    (boards, players) Boolean array of snakes dying this tick (removed),
+                    Boolean array of boards whose food was eaten (eaten)
+
+        Function for moving one player's snake on the given boards and resolving its collisions
+        (engine.move_snake followed by engine.check_collision).
+
+        Returns: NULL (Nothing)
+        """
+        code = slot + 1
+        columns = self.columns
+        owner = self.owner
+
+        head = self.head[index, slot]
+        direction = self.direction[index, slot]
+        column = head % columns
+        row = head // columns
+        wall = (((direction == UP) & (row == 0)) | ((direction == DOWN) & (row == self.rows - 1)) |
+                ((direction == LEFT) & (column == 0)) | ((direction == RIGHT) & (column == columns - 1)))
+        new_head = head + self.offsets[direction]
+
+        # The old head links to the new one
+        self.link[index, head] = direction
+
+        # Food on the new head cell: score and keep the tail
+        ate = ~wall & (new_head == self.food[index])
+        self.score[index[ate], slot] += 1
+        self.length[index[ate], slot] += 1
+        eaten[index[ate]] = True
+
+        # Otherwise the tail moves up one link (and frees its cell before collisions are checked)
+        grow = index[~ate]
+        tail = self.tail[grow, slot]
+        owner[grow, tail] = np.where(owner[grow, tail] == code, 0, owner[grow, tail])
+        self.tail[grow, slot] = tail + self.offsets[self.link[grow, tail]]
+
+        self.head[index, slot] = np.where(wall, -1, new_head)
+        removed[index[wall], slot] = True
+
+        # Collisions on the board
+        on_board = ~wall
+        index = index[on_board]
+        cell = new_head[on_board]
+        other = owner[index, cell].astype(np.int64)
+
+        # Free cell: the head claims it
+        free = other == 0
+        owner[index[free], cell[free]] = code
+
+        # Own body
+        removed[index[other == code], slot] = True
+
+        # Another snake: its head means a head-to-head collision, anything else kills this snake
+        hit = np.flatnonzero((other != 0) & (other != code))
+        if not len(hit):
+            return
+        boards = index[hit]
+        other_slot = other[hit] - 1
+        cell = cell[hit]
+        head_on = self.head[boards, other_slot] == cell
+        removed[boards[~head_on], slot] = True
+
+        boards, other_slot, cell = boards[head_on], other_slot[head_on], cell[head_on]
+        mine = self.length[boards, slot]
+        theirs = self.length[boards, other_slot]
+        wins = mine > theirs
+        removed[boards[mine <= theirs], slot] = True
+        removed[boards[mine >= theirs], other_slot[mine >= theirs]] = True
+        owner[boards[wins], cell[wins]] = code
+
+    def board_state(self, board):
+        """
+        Parameters: board number (board)
+
+        Function for turning one board into a client-style game state (as decoded from a snapshot),
+        for drawing it or checking it against the engine.
+
+        Returns: Game state dictionary
+        """
+        players = {}
+        for slot in np.flatnonzero(self.alive[board]):
+            body = []
+            cell = self.tail[board, slot]
+            for _ in range(self.length[board, slot]):
+                body.append([int(cell % self.columns) * engine.SPACE_SIZE, int(cell // self.columns) * engine.SPACE_SIZE])
+                cell += self.offsets[self.link[board, cell]]
+            body.reverse()
+            players[str(slot)] = {"body": body, "direction": protocol.DIRECTIONS[self.direction[board, slot]]}
+
+        food = self.food[board]
+        game_state = {
+            "players": players,
+            "food": None if food < 0 else [int(food % self.columns) * engine.SPACE_SIZE,
+                                           int(food // self.columns) * engine.SPACE_SIZE],
+            "scores": {str(slot): int(score) for slot, score in enumerate(self.score[board])},
+            "game_started": True,
+            "game_over": bool(self.game_over[board]),
+            "countdown": False
+        }
+        if self.game_over[board]:
+            if self.winner[board] >= 0:
+                game_state["winner"] = str(self.winner[board])
+            else:
+                game_state["tie"] = True
+        return game_state
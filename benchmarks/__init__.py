@@ -0,0 +1,4 @@
+"""
+Micro-benchmarks for the server and client hot paths.
+Run from the repository root, e.g. `python -m benchmarks.bench_protocol`.
+"""
@@ -0,0 +1,96 @@
+import argparse
+import contextlib
+import io
+import random
+import time
+import numpy as np
+import batch
+import engine
+
+
+"""
+Steps per second of batch.BatchEngine from 1 to 10,000 boards, against engine.update_game
+stepping the same kind of board one at a time in Python. Every snake gets a random turn
+now and then, and boards whose match ends are restarted so the batch stays full.
+"""
+
+
+# Chance that a snake is sent a random turn on a tick
+TURN_PROBABILITY = 0.2
+
+
+def bench_batch(boards, players, seconds, seed):
+    """
+    Parameters: number of boards (boards), snakes per board (players), seconds to run for (seconds),
+                random seed (seed)
+
+    Function for stepping a batch of boards for a while.
+
+    Returns: Steps per second, matches finished
+    """
+    engine_batch = batch.BatchEngine(boards, players, seed=seed)
+    rng = np.random.default_rng(seed)
+    steps = finished = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        turns = rng.integers(0, 4, (boards, players))
+        turns[rng.random((boards, players)) >= TURN_PROBABILITY] = batch.NO_INPUT
+        done = engine_batch.step(turns)
+        finished += int(done.sum())
+        engine_batch.reset(done)
+        steps += 1
+    return steps / (time.perf_counter() - started), finished
+
+
+def bench_engine(players, seconds, seed):
+    """
+    Parameters: snakes per board (players), seconds to run for (seconds), random seed (seed)
+
+    Function for stepping one board at a time with engine.update_game, restarting it when its match ends.
+
+    Returns: Steps per second
+    """
+    rng = random.Random(seed)
+    starts = batch.BatchEngine(1, players).starts
+    steps = 0
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while time.perf_counter() - started < seconds:
+            game_state = engine.new_game_state(rng.randrange(2 ** 32))
+            for slot, (column, row, code) in enumerate(starts):
+                direction = batch.protocol.DIRECTIONS[code]
+                position = [column * engine.SPACE_SIZE, row * engine.SPACE_SIZE]
+                engine.add_snake(game_state, str(slot), engine.initialize_snake(position, direction), direction)
+                game_state["scores"][str(slot)] = 0
+
+            while not game_state["game_over"]:
+                for snake in game_state["players"].values():
+                    if rng.random() < TURN_PROBABILITY:
+                        direction = rng.choice(batch.protocol.DIRECTIONS)
+                        if not engine.is_reversal(snake.direction, direction):
+                            snake.direction = direction
+                engine.update_game(game_state)
+                steps += 1
+    return steps / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--boards", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--players", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{engine.COLUMNS}x{engine.ROWS} boards, {args.players} snakes each")
+    reference = bench_engine(args.players, args.seconds, args.seed)
+    print(f"engine.update_game, one board at a time: {reference:,.0f} board-steps/s\n")
+    print(f"{'boards':>8}{'steps/s':>10}{'board-steps/s':>16}{'vs engine':>11}{'matches ended':>15}")
+
+    for boards in args.boards:
+        steps, finished = bench_batch(boards, args.players, args.seconds, args.seed)
+        print(f"{boards:>8}{steps:>10,.0f}{steps * boards:>16,.0f}{steps * boards / reference:>10.1f}x{finished:>15}")
+
+
+if __name__ == "__main__":
+    main()
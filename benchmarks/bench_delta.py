@@ -0,0 +1,127 @@
+import argparse
+import pickle
+import random
+import time
+import engine
+import protocol
+
+
+"""
+Bytes-per-tick measurement for snapshot broadcasting on a simulated long game.
+Snakes random-walk on the board and grow whenever one of them reaches the food,
+and each tick is serialized three ways: the old pickle of the whole state, a
+full binary snapshot, and the keyframe + delta stream from SnapshotEncoder.
+The delta stream is also applied on a simulated client and checked against the
+server state at the end.
+"""
+
+
+MOVES = {"UP": (0, -20), "DOWN": (0, 20), "LEFT": (-20, 0), "RIGHT": (20, 0)}
+TURNS = {"UP": ("LEFT", "RIGHT"), "DOWN": ("LEFT", "RIGHT"), "LEFT": ("UP", "DOWN"), "RIGHT": ("UP", "DOWN")}
+
+
+def simulate_tick(game_state, rng, grow_every, tick):
+    """
+    Parameters: game state dictionary (game_state), random generator (rng),
+                ticks between growth (grow_every), current tick (tick)
+
+    Function for advancing the synthetic game by one tick (movement and growth only, no deaths).
+
+    Returns: NULL (Nothing)
+    """
+    for player_id, snake in game_state["players"].items():
+
+        # Turn occasionally
+        if rng.random() < 0.2:
+            snake.direction = rng.choice(TURNS[snake.direction])
+
+        dx, dy = MOVES[snake.direction]
+        head_x, head_y = snake.head()
+        snake.push_head((head_x + dx) % 800, (head_y + dy) % 800)
+
+        # Grow instead of popping the tail, as if food was eaten
+        if tick % grow_every == int(player_id):
+            game_state["scores"][player_id] += 1
+            game_state["food"] = [rng.randrange(0, 800, 20), rng.randrange(0, 800, 20)]
+        else:
+            snake.pop_tail()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--ticks", type=int, default=6000)
+    parser.add_argument("--grow-every", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    game_state = {
+        "players": {str(p): engine.Snake([[100 + 100 * p, 100 + 20 * i] for i in range(3)], "UP")
+                    for p in range(args.players)},
+        "food": [400, 400],
+        "scores": {str(p): 0 for p in range(args.players)},
+        "game_over": False,
+        "countdown": False,
+        "countdown_value": 0,
+        "game_started": True
+    }
+
+    encoder = protocol.SnapshotEncoder()
+    decoder = protocol.StreamDecoder()
+    client_state = None
+    totals = {"pickle": 0, "snapshot": 0, "delta": 0}
+    encode_time = {"pickle": 0.0, "snapshot": 0.0, "delta": 0.0}
+    report_every = args.ticks // 6
+
+    print(f"{'tick':>6}{'length':>8}{'pickle B/tick':>15}{'snapshot B/tick':>17}{'delta B/tick':>14}")
+    window = {"pickle": 0, "snapshot": 0, "delta": 0}
+
+    for tick in range(1, args.ticks + 1):
+        simulate_tick(game_state, rng, args.grow_every, tick)
+
+        # The old server pickled snakes as dictionaries of [x, y] lists
+        start = time.perf_counter()
+        old_state = dict(game_state, players={player_id: snake.to_dict()
+                                              for player_id, snake in game_state["players"].items()})
+        pickled = pickle.dumps(old_state)
+        encode_time["pickle"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        snapshot = protocol.encode_snapshot(game_state, tick)
+        encode_time["snapshot"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        frame, _ = encoder.encode(game_state, tick)
+        encode_time["delta"] += time.perf_counter() - start
+
+        for name, size in (("pickle", len(pickled)), ("snapshot", len(snapshot)), ("delta", len(frame))):
+            totals[name] += size
+            window[name] += size
+
+        # Apply on a simulated client
+        for msg_type, data in decoder.feed(frame):
+            if msg_type == protocol.MSG_SNAPSHOT:
+                _, client_state = data
+            else:
+                _, _, delta = data
+                client_state = protocol.apply_delta(client_state, delta)
+
+        if tick % report_every == 0:
+            length = len(game_state["players"]["0"])
+            print(f"{tick:>6}{length:>8}" + "".join(f"{window[name] / report_every:>{w}.0f}"
+                  for name, w in (("pickle", 15), ("snapshot", 17), ("delta", 14))))
+            window = {"pickle": 0, "snapshot": 0, "delta": 0}
+
+    print(f"\nAverage over {args.ticks} ticks ({args.players} snakes, keyframe every {encoder.keyframe_interval} ticks):")
+    for name in ("pickle", "snapshot", "delta"):
+        print(f"  {name:<10}{totals[name] / args.ticks:>10.0f} B/tick{encode_time[name] / args.ticks * 1e6:>10.1f} us/tick encode")
+
+    server_players = {player_id: dict(snake.to_dict(), ack=snake.last_input)
+                      for player_id, snake in game_state["players"].items()}
+    consistent = client_state["players"] == server_players and client_state["scores"] == game_state["scores"]
+    print(f"  client state matches server: {consistent}")
+
+
+if __name__ == "__main__":
+    main()
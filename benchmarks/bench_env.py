@@ -0,0 +1,52 @@
+import argparse
+import time
+import numpy as np
+import env
+
+
+"""
+Environment steps per second of env.SnakeEnv (game step, rewards, restarts and observations)
+for both observation types and a growing number of environments, with random actions.
+"""
+
+
+def bench(num_envs, players, observation, seconds, seed):
+    """
+    Parameters: number of environments (num_envs), agents per environment (players),
+                observation type (observation), seconds to run for (seconds), random seed (seed)
+
+    Function for stepping a batch of environments with random actions for a while.
+
+    Returns: Environment steps per second, episodes finished
+    """
+    snake_env = env.SnakeEnv(num_envs, players, observation=observation, seed=seed)
+    snake_env.reset()
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, snake_env.action_count, (64, num_envs, players))
+    steps = episodes = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        _, _, _, _, info = snake_env.step(actions[steps % len(actions)])
+        episodes += len(info.get("done_envs", ()))
+        steps += 1
+    return steps * num_envs / (time.perf_counter() - started), episodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--envs", type=int, nargs="+", default=[1, 64, 1024, 8192])
+    parser.add_argument("--players", type=int, default=1)
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{args.players} player(s) per environment, 20x20 boards, random actions")
+    print(f"{'envs':>6}{'grid steps/s':>15}{'features steps/s':>19}{'episodes':>10}")
+    for num_envs in args.envs:
+        grid, episodes = bench(num_envs, args.players, "grid", args.seconds, args.seed)
+        features, _ = bench(num_envs, args.players, "features", args.seconds, args.seed)
+        print(f"{num_envs:>6}{grid:>15,.0f}{features:>19,.0f}{episodes:>10}")
+
+
+if __name__ == "__main__":
+    main()
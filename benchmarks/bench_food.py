@@ -0,0 +1,93 @@
+import argparse
+import random
+import time
+import engine
+
+
+"""
+Food spawn cost at increasing board fill.
+The board is filled to a given fraction with one long snake and food is spawned
+repeatedly, once with the old approach (draw a random cell, scan every body for it,
+retry on a hit) and once with engine.generate_new_food, which draws from the
+free-cell list in constant time.
+"""
+
+
+def fill_board(fill, seed):
+    """
+    Parameters: fraction of the board to cover (fill), random seed (seed)
+
+    Function for building a game state whose board is covered by one snake up to the given fraction.
+
+    Returns: Game state dictionary
+    """
+    game_state = engine.new_game_state(seed)
+    cells = engine.COLUMNS * engine.ROWS
+    count = int(cells * fill)
+
+    # Walk the rows back and forth so the body stays connected
+    body = []
+    for row in range(engine.ROWS):
+        columns = range(engine.COLUMNS) if row % 2 == 0 else range(engine.COLUMNS - 1, -1, -1)
+        body.extend([column * engine.SPACE_SIZE, row * engine.SPACE_SIZE] for column in columns)
+    engine.add_snake(game_state, "0", body[:count][::-1], "UP")
+    game_state["bodies"] = [snake.to_dict()["body"] for snake in game_state["players"].values()]
+    return game_state
+
+
+def old_generate_new_food(game_state, rng):
+    """
+    Parameters: game state dictionary (game_state), random generator (rng)
+
+    Function for spawning food the way the engine used to: retry random cells until one is not on a snake.
+    Bodies are scanned as the lists of [x, y] segments the old engine stored (game_state["bodies"]).
+
+    Returns: Pair of coordinates for the food
+    """
+    while True:
+        new_food = [rng.randint(0, engine.COLUMNS - 1) * engine.SPACE_SIZE,
+                    rng.randint(0, engine.ROWS - 1) * engine.SPACE_SIZE]
+        if not any(new_food in body for body in game_state["bodies"]):
+            return new_food
+
+
+def bench(function, repeat):
+    """
+    Parameters: function to time (function), number of calls (repeat)
+
+    Function for timing repeated calls of a function.
+
+    Returns: Microseconds per call
+    """
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{engine.COLUMNS}x{engine.ROWS} board, {args.repeat} spawns per run")
+    print(f"{'fill':>6}{'old us/spawn':>15}{'free-cell us/spawn':>21}{'speedup':>10}")
+
+    for fill in (0.10, 0.50, 0.95):
+        game_state = fill_board(fill, args.seed)
+        rng = random.Random(args.seed)
+
+        old = bench(lambda: old_generate_new_food(game_state, rng), args.repeat)
+        new = bench(lambda: engine.generate_new_food(game_state), args.repeat)
+        print(f"{fill:>6.0%}{old:>15.1f}{new:>21.2f}{old / new:>9.0f}x")
+
+    # Same seed, same food sequence
+    first = fill_board(0.5, args.seed)
+    second = fill_board(0.5, args.seed)
+    same = all(engine.generate_new_food(first) == engine.generate_new_food(second) for _ in range(100))
+    print(f"\nsame seed gives the same spawns: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import argparse
+import random
+import time
+import engine
+import interest
+import protocol
+
+
+"""
+Bytes-per-player measurement for area-of-interest filtering as the arena grows.
+Boards of growing size are filled with snakes at the same density; the snakes steer
+away from walls and bodies and are played with engine.update_game. Each tick every
+player is sent either the shared frame of the whole board (what a room without a view
+radius broadcasts) or the frame of its own interest.View. The stream of one view is
+applied on a simulated client and checked against that view's state at the end.
+"""
+
+
+def place_snakes(game_state, count, length, rng):
+    """
+    Parameters: game state of the match (game_state), snakes to add (count),
+                segments of each (length), random generator (rng)
+
+    Function for putting snakes on free straight runs of the board.
+
+    Returns: NULL (Nothing)
+    """
+    size = engine.SPACE_SIZE
+    player_id = 0
+    while player_id < count:
+        x = rng.randrange(length, engine.COLUMNS - length) * size
+        y = rng.randrange(1, engine.ROWS - 1) * size
+        body = [[x - i * size, y] for i in range(length)]
+        if all(game_state["grid"][engine.cell_index(*segment)] == 0 for segment in body):
+            engine.add_snake(game_state, str(player_id), body, "RIGHT")
+            game_state["scores"][str(player_id)] = 0
+            player_id += 1
+
+
+def steer(game_state, rng):
+    """
+    Parameters: game state of the match (game_state), random generator (rng)
+
+    Function for turning each snake now and then, and away from a wall or body in front of it.
+
+    Returns: NULL (Nothing)
+    """
+    grid = game_state["grid"]
+    for snake in game_state["players"].values():
+        options = [direction for direction in engine.OPPOSITE_DIRECTIONS
+                   if not engine.is_reversal(snake.direction, direction)]
+        cells = {direction: engine.cell_index(*engine.next_head(*snake.head(), direction)) for direction in options}
+        safe = [direction for direction in options if cells[direction] >= 0 and grid[cells[direction]] == 0]
+        if snake.direction not in safe or rng.random() < 0.1:
+            snake.direction = rng.choice(safe or options)
+
+
+def run(columns, rows, snakes, radius, ticks, seed):
+    """
+    Parameters: board size in cells (columns, rows), snakes on it (snakes), view radius in cells (radius),
+                ticks to play (ticks), seed of the match (seed)
+
+    Function for playing one arena and measuring what each player is sent.
+
+    Returns: Dictionary of averages
+    """
+    engine.configure_board(columns, rows)
+    rng = random.Random(seed)
+    game_state = engine.new_game_state(seed)
+    game_state["game_started"] = True
+    place_snakes(game_state, snakes, 6, rng)
+
+    encoder = protocol.SnapshotEncoder()
+    views = {player_key: interest.View(radius) for player_key in game_state["players"]}
+    watched = next(iter(views))
+    decoder = protocol.StreamDecoder()
+    client_state = None
+    shared_bytes = view_bytes = view_frames = 0
+    view_time = 0.0
+    visible = 0
+
+    for tick in range(1, ticks + 1):
+        steer(game_state, rng)
+        engine.update_game(game_state)
+        game_state["game_over"] = False
+
+        shared, _ = encoder.encode(game_state, tick)
+        shared_bytes += len(shared)
+
+        start = time.perf_counter()
+        for player_key, view in views.items():
+            frame, _ = view.encode(game_state, player_key, tick)
+            view_bytes += len(frame)
+            view_frames += 1
+            if player_key == watched:
+                for msg_type, data in decoder.feed(frame):
+                    if msg_type == protocol.MSG_SNAPSHOT:
+                        _, client_state = data
+                    else:
+                        client_state = protocol.apply_delta(client_state, data[2])
+                visible += len(client_state["players"])
+        view_time += time.perf_counter() - start
+
+    expected = views[watched].visible_state(game_state, watched)
+    consistent = (client_state["players"] == {key: dict(snake.to_dict(), ack=snake.last_input)
+                                              for key, snake in expected["players"].items()} and
+                  client_state["scores"] == expected["scores"] and client_state["food"] == expected["food"])
+    return {
+        "alive": len(game_state["players"]),
+        "shared": shared_bytes / ticks,
+        "view": view_bytes / view_frames,
+        "visible": visible / ticks,
+        "view_us": view_time / view_frames * 1e6,
+        "consistent": consistent
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--radius", type=int, default=15, help="view radius in cells")
+    parser.add_argument("--cells-per-snake", type=int, default=400, help="board cells per snake")
+    parser.add_argument("--ticks", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'board':>9}{'snakes':>8}{'alive':>7}{'shared B/tick':>15}{'view B/tick':>13}"
+          f"{'in view':>9}{'us/view':>9}{'consistent':>12}")
+    for side in (40, 80, 120, 160, 200):
+        snakes = side * side // args.cells_per_snake
+        result = run(side, side, snakes, args.radius, args.ticks, args.seed)
+        print(f"{side:>4}x{side:<4}{snakes:>8}{result['alive']:>7}{result['shared']:>15.0f}{result['view']:>13.0f}"
+              f"{result['visible']:>9.1f}{result['view_us']:>9.1f}{str(result['consistent']):>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import pickle
+import random
+import timeit
+import engine
+import protocol
+
+
+"""
+Encode/decode micro-benchmark: the binary wire protocol against the pickle path
+the server and client used before. Builds a synthetic game state with a number
+of snakes of a given length and times a full serialize + parse round trip.
+"""
+
+
+def build_game_state(players, length, seed=0):
+    """
+    Parameters: number of snakes (players), segments per snake (length), random seed (seed)
+
+    Function for building a game state shaped like the one the server used to pickle
+    (snakes as dictionaries of [x, y] lists), with random-walk snakes.
+
+    Returns: Game state dictionary
+    """
+    rng = random.Random(seed)
+    game_state = {
+        "players": {},
+        "food": [400, 400],
+        "scores": {},
+        "game_over": False,
+        "countdown": False,
+        "countdown_value": 0,
+        "game_started": True
+    }
+
+    for player_id in range(players):
+        x, y = rng.randrange(0, 800, 20), rng.randrange(0, 800, 20)
+        body = []
+        for _ in range(length):
+            body.append([x, y])
+            dx, dy = rng.choice(((20, 0), (-20, 0), (0, 20), (0, -20)))
+            x, y = x + dx, y + dy
+        game_state["players"][str(player_id)] = {"body": body, "direction": rng.choice(protocol.DIRECTIONS)}
+        game_state["scores"][str(player_id)] = length - 3
+
+    return game_state
+
+
+def server_state(game_state):
+    """
+    Parameters: game state dictionary with dictionary snakes (game_state)
+
+    Function for converting the snakes into the engine.Snake objects the protocol encodes.
+
+    Returns: Game state dictionary
+    """
+    players = {player_id: engine.Snake(player_data["body"], player_data["direction"])
+               for player_id, player_data in game_state["players"].items()}
+    return dict(game_state, players=players)
+
+
+def bench(label, func, number):
+    """
+    Parameters: row label (label), function to time (func), iterations (number)
+
+    Function for timing a callable and printing the per-call cost.
+
+    Returns: Seconds per call
+    """
+    per_call = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"  {label:<22}{per_call * 1e6:>10.1f} us")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--players", type=int, default=4)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[3, 50, 200, 800])
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    for length in args.lengths:
+        game_state = build_game_state(args.players, length)
+        snake_state = server_state(game_state)
+        pickled = pickle.dumps(game_state)
+        framed = protocol.encode_snapshot(snake_state)
+        decoder = protocol.StreamDecoder()
+
+        print(f"{args.players} snakes x {length} segments: pickle {len(pickled)} B, protocol {len(framed)} B")
+        pickle_encode = bench("pickle encode", lambda: pickle.dumps(game_state), args.number)
+        pickle_decode = bench("pickle decode", lambda: pickle.loads(pickled), args.number)
+        proto_encode = bench("protocol encode", lambda: protocol.encode_snapshot(snake_state), args.number)
+        proto_decode = bench("protocol decode", lambda: decoder.feed(framed), args.number)
+        print(f"  round trip speedup    {(pickle_encode + pickle_decode) / (proto_encode + proto_decode):>10.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import os
+import random
+import time
+import engine
+import prediction
+
+# Run without a display unless one is requested (set SDL_VIDEODRIVER to measure a real window)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+import pygame
+import renderer
+
+
+"""
+Client frames per second with 4 long snakes: the old per-frame drawing (every brick,
+every segment shape and every score string drawn from scratch, full-window update)
+against renderer.Renderer (cached surfaces, dirty rectangles). Snakes random-walk on
+the board and are interpolated between ticks as the client does, so they move every frame.
+"""
+
+
+def old_render(window, game_state, frame_state, font, space_size):
+    """
+    Parameters: window surface (window), server state (game_state), interpolated state (frame_state),
+                score font (font), cell size (space_size)
+
+    Function for drawing a frame the way the client used to.
+
+    Returns: NULL (Nothing)
+    """
+    width, height = window.get_size()
+
+    # Brick background, brick by brick
+    window.fill(renderer.MORTAR_COLOR)
+    for y in range(0, height, renderer.BRICK_HEIGHT):
+        offset = renderer.BRICK_WIDTH // 2 if (y // renderer.BRICK_HEIGHT) % 2 else 0
+        for x in range(-offset, width, renderer.BRICK_WIDTH):
+            pygame.draw.rect(window, renderer.BRICK_COLOR, (x, y, renderer.BRICK_WIDTH - 2, renderer.BRICK_HEIGHT - 2))
+
+    food_x, food_y = game_state["food"]
+    pygame.draw.ellipse(window, renderer.FOOD_COLOR, (food_x, food_y, space_size, space_size))
+    pygame.draw.rect(window, renderer.STEM_COLOR, (food_x + space_size // 3, food_y - space_size // 4, 2, space_size // 4))
+
+    # Snakes, segment by segment
+    for player_key, player_data in frame_state["players"].items():
+        color = renderer.PLAYER_COLORS[int(player_key) % len(renderer.PLAYER_COLORS)]
+        body = player_data["body"]
+        for i, (x, y) in enumerate(body):
+            if i == 0:
+                pygame.draw.ellipse(window, color, (x, y, space_size, space_size))
+                for eye in ((x + space_size // 1.5, y + space_size // 4), (x + space_size // 1.5, y + space_size // 1.5)):
+                    pygame.draw.circle(window, (255, 255, 255), (int(eye[0]), int(eye[1])), space_size // 8)
+                    pygame.draw.circle(window, (0, 0, 0), (int(eye[0]), int(eye[1])), space_size // 12)
+            else:
+                size = max(space_size - (len(body) - i) // 3, space_size // 2)
+                pygame.draw.rect(window, color, (x, y, size, size), border_radius=size // 4)
+
+    # Scores, rendered again every frame
+    y_offset = 10
+    for player_key, score in game_state["scores"].items():
+        color = renderer.PLAYER_COLORS[int(player_key) % len(renderer.PLAYER_COLORS)]
+        window.blit(font.render(f"Player {int(player_key) + 1}: {score}", True, color), (10, y_offset))
+        y_offset += 35
+
+    pygame.display.update()
+
+
+def build_states(snakes, length, ticks, seed):
+    """
+    Parameters: number of snakes (snakes), segments per snake (length), ticks to simulate (ticks),
+                random seed (seed)
+
+    Function for recording a sequence of client-side game states with wandering snakes.
+
+    Returns: List of game state dictionaries, one per tick
+    """
+    rng = random.Random(seed)
+    columns, rows = engine.COLUMNS, engine.ROWS
+    bodies = []
+    for snake in range(snakes):
+        row = (snake * rows) // snakes
+        bodies.append([[(i % columns) * engine.SPACE_SIZE, (row + i // columns) % rows * engine.SPACE_SIZE]
+                       for i in range(length)])
+
+    states = []
+    for tick in range(ticks):
+        players = {}
+        for snake, body in enumerate(bodies):
+            direction = rng.choice(tuple(engine.OPPOSITE_DIRECTIONS)) if tick % 5 == 0 else None
+            head_x, head_y = engine.next_head(body[0][0], body[0][1], direction or "RIGHT")
+            body.insert(0, [head_x % engine.GAME_WIDTH, head_y % engine.GAME_HEIGHT])
+            body.pop()
+            players[str(snake)] = {"body": [list(segment) for segment in body], "direction": "RIGHT"}
+        states.append({"players": players, "food": [400, 400], "game_started": True, "game_over": False,
+                       "countdown": False, "scores": {str(snake): length - 3 for snake in range(snakes)}})
+    return states
+
+
+def run(draw, states, frames, frames_per_tick):
+    """
+    Parameters: function drawing one frame from (game_state, frame_state) (draw), recorded states (states),
+                frames to draw (frames), frames between two ticks (frames_per_tick)
+
+    Function for drawing interpolated frames as fast as possible.
+
+    Returns: Frames per second
+    """
+    start = time.perf_counter()
+    for frame in range(frames):
+        tick = frame // frames_per_tick % (len(states) - 1) + 1
+        alpha = (frame % frames_per_tick) / frames_per_tick
+        previous, current = states[tick - 1], states[tick]
+        players = {player_key: dict(player_data, body=prediction.interpolate_body(
+                       previous["players"][player_key]["body"], player_data["body"], alpha))
+                   for player_key, player_data in current["players"].items()}
+        draw(current, dict(current, players=players))
+    return frames / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--snakes", type=int, default=4)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[50, 200, 400])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    pygame.init()
+    window = pygame.display.set_mode((engine.GAME_WIDTH, engine.GAME_HEIGHT))
+    font = pygame.font.SysFont('Arial', 20)
+    print(f"video driver: {pygame.display.get_driver()}, {args.snakes} snakes, {args.frames} frames per run")
+    print(f"{'segments':>9}{'old FPS':>10}{'cached FPS':>12}{'speedup':>9}")
+
+    for length in args.lengths:
+        states = build_states(args.snakes, length, 40, args.seed)
+        screen = renderer.Renderer(window, engine.SPACE_SIZE)
+
+        old = run(lambda game_state, frame_state: old_render(window, game_state, frame_state, font, engine.SPACE_SIZE),
+                  states, args.frames, 6)
+        new = run(lambda game_state, frame_state: screen.render(game_state, frame_state, args.snakes),
+                  states, args.frames, 6)
+        print(f"{length:>9}{old:>10.0f}{new:>12.0f}{new / old:>8.1f}x")
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import argparse
+import timeit
+import tracemalloc
+import engine
+
+
+"""
+Memory and movement cost of a snake body: the old list of [x, y] lists against
+engine.Snake, which keeps the segments in a ring buffer of packed coordinates.
+Memory is measured with tracemalloc and reported per 1,000 segments; movement is
+one push-head plus one pop-tail, the work of a tick in which no food is eaten.
+"""
+
+
+def make_body(length):
+    """
+    Parameters: number of segments (length)
+
+    Function for building a body that walks back and forth across the board.
+
+    Returns: List of [x, y] segments
+    """
+    columns = engine.COLUMNS
+    return [[(i % columns) * engine.SPACE_SIZE, (i // columns) % engine.ROWS * engine.SPACE_SIZE]
+            for i in range(length)]
+
+
+def measure(build):
+    """
+    Parameters: function that builds the object to measure (build)
+
+    Function for measuring the memory held by what a function builds.
+
+    Returns: Bytes allocated and still alive after the call
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def move_list(body):
+    """
+    Parameters: list of [x, y] segments (body)
+
+    Function for one tick of movement the old way (insert a new head list, drop the tail).
+
+    Returns: NULL (Nothing)
+    """
+    body.insert(0, [body[0][0], body[0][1]])
+    body.pop()
+
+
+def move_snake(snake):
+    """
+    Parameters: engine.Snake (snake)
+
+    Function for one tick of movement on the ring buffer.
+
+    Returns: NULL (Nothing)
+    """
+    x, y = snake.head()
+    snake.push_head(x, y)
+    snake.pop_tail()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'segments':>9}{'list B/1k seg':>15}{'Snake B/1k seg':>16}"
+          f"{'list us/move':>14}{'Snake us/move':>15}")
+
+    for length in args.lengths:
+        template = make_body(length)
+
+        # Copy the coordinates inside the measurement so the old body owns its segment lists
+        list_bytes = measure(lambda: [[x, y] for x, y in template])
+        snake_bytes = measure(lambda: engine.Snake(template, "UP"))
+
+        body = [[x, y] for x, y in template]
+        snake = engine.Snake(template, "UP")
+        list_move = min(timeit.repeat(lambda: move_list(body), number=args.number, repeat=3)) / args.number
+        snake_move = min(timeit.repeat(lambda: move_snake(snake), number=args.number, repeat=3)) / args.number
+
+        print(f"{length:>9}{list_bytes * 1000 / length:>15.0f}{snake_bytes * 1000 / length:>16.0f}"
+              f"{list_move * 1e6:>14.2f}{snake_move * 1e6:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import importlib.util
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+"""
+Server cold-start time and resident memory, headless against the old pygame path.
+Each run starts server.py in a fresh interpreter, waits for its "Server started"
+line, reads the process's resident set size from /proc (Linux) and stops it.
+The pygame run imports pygame before starting the same server, which is what every
+server process used to pay; it is skipped when pygame is not installed.
+"""
+
+
+# Root of the repository (server.py lives there)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Starts the server the way it used to start: pygame first
+WITH_PYGAME = "import pygame, runpy, sys; sys.argv[0] = 'server.py'; runpy.run_path('server.py', run_name='__main__')"
+
+
+def rss_kb(pid):
+    """
+    Parameters: process id (pid)
+
+    Function for reading a process's resident set size.
+
+    Returns: Kilobytes, or None where /proc is not available
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def start_once(command, port):
+    """
+    Parameters: interpreter arguments that start the server (command), port to listen on (port)
+
+    Function for timing one server start.
+
+    Returns: Seconds until the server was listening, resident memory in KB
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-u"] + command + ["--port", str(port)], cwd=ROOT,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        for line in process.stdout:
+            if line.startswith("Server started"):
+                break
+        else:
+            raise RuntimeError(f"Server exited before listening (code {process.wait()})")
+        elapsed = time.perf_counter() - started
+        return elapsed, rss_kb(process.pid)
+    finally:
+        process.kill()
+        process.wait()
+        process.stdout.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=5599)
+    args = parser.parse_args()
+
+    variants = [("headless", ["server.py"])]
+    if importlib.util.find_spec("pygame") is not None:
+        variants.append(("with pygame", ["-c", WITH_PYGAME]))
+    else:
+        print("pygame is not installed: only the headless server is measured")
+
+    print(f"{'variant':<14}{'startup ms':>12}{'RSS MB':>10}   (median of {args.runs} runs)")
+    for name, command in variants:
+        times, sizes = [], []
+        for run in range(args.runs):
+            elapsed, size = start_once(command, args.port + run)
+            times.append(elapsed)
+            if size is not None:
+                sizes.append(size)
+        memory = f"{statistics.median(sizes) / 1024:>10.1f}" if sizes else f"{'n/a':>10}"
+        print(f"{name:<14}{statistics.median(times) * 1000:>12.1f}{memory}")
+
+
+if __name__ == "__main__":
+    main()
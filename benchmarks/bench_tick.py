@@ -0,0 +1,241 @@
+import argparse
+import contextlib
+import io
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import engine
+import protocol
+
+
+"""
+Per-phase cost of the server's tick, without sockets.
+Each scenario builds a seeded synthetic board (board size, number of snakes, snake length),
+then plays ticks with engine.update_game itself, which times each of its phases when given a
+timings dictionary: move (move_snake), collide (check_collision and removing the dead) and
+spawn (generate_new_food); serialize (the SnapshotEncoder broadcast of the tick) is timed
+around it. With --arena the boards are arenas, which play the arena's end of the tick. Every snake owns a band of rows
+and is steered around a cycle through every cell of its band, so no snake dies and the
+load stays the same for the whole run; food spawning in a band is eaten by its snake.
+Steering is not timed. The seed picks where each snake starts on its cycle and where the
+food spawns, so the same seed always plays the same ticks. Results can be written as
+JSON (--json) and a previous file passed to --compare to see the change of every phase.
+"""
+
+
+# Scenarios run by default, as "COLUMNSxROWS:SNAKES:LENGTH"
+DEFAULT_SCENARIOS = ["40x40:4:10", "100x100:16:100", "200x200:64:200", "500x500:100:1000"]
+
+# Phases in the order they run
+PHASES = ("move", "collide", "spawn", "serialize")
+
+
+def parse_scenario(text):
+    """
+    Parameters: scenario as "COLUMNSxROWS:SNAKES:LENGTH" (text)
+
+    Function for reading a scenario from the command line.
+
+    Returns: Tuple of (columns, rows, snakes, length)
+    """
+    try:
+        board, snakes, length = text.split(":")
+        columns, rows = board.lower().split("x")
+        return int(columns), int(rows), int(snakes), int(length)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Scenario must look like 100x100:16:100, not {text!r}")
+
+
+def cycle_direction(column, row, top, height):
+    """
+    Parameters: cell of a snake's head (column, row), first row (top) and number of rows (height) of its band
+
+    Function for steering around the band's cycle: right and left along the rows from
+    column 1 to the last column, zigzagging down, then back up column 0.
+    The band has an even number of rows so the zigzag ends next to column 0.
+
+    Returns: Direction name
+    """
+    line = row - top
+    if column == 0:
+        return "RIGHT" if line == 0 else "UP"
+    if line % 2 == 0:
+        return "RIGHT" if column < engine.COLUMNS - 1 else "DOWN"
+    if column > 1 or line == height - 1:
+        return "LEFT"
+    return "DOWN"
+
+
+def build_board(columns, rows, snakes, length, seed, arena=False):
+    """
+    Parameters: board size in cells (columns, rows), number of snakes (snakes),
+                segments per snake (length), random seed (seed), whether the board is an arena (arena)
+
+    Function for laying snakes out on a new board, one band of rows per snake, each snake
+    lying along its band's cycle from a random starting point.
+
+    Returns: Game state dictionary, dictionary of player -> (first row, rows) of its band
+    """
+    engine.configure_board(columns, rows)
+    height = rows // snakes // 2 * 2
+    if height < 2 or length >= columns * height:
+        raise ValueError(f"{snakes} snakes of {length} segments do not fit on a {columns}x{rows} board")
+
+    rng = random.Random(seed)
+    game_state = engine.new_game_state(seed, arena)
+    bands = {}
+    for snake in range(snakes):
+        player_id = str(snake)
+        top = snake * height
+        bands[player_id] = (top, height)
+
+        # Walk the cycle from a random cell; the last cell walked is the head
+        x, y = rng.randrange(columns) * engine.SPACE_SIZE, (top + rng.randrange(height)) * engine.SPACE_SIZE
+        body = []
+        for _ in range(length):
+            body.append([x, y])
+            x, y = engine.next_head(x, y, cycle_direction(x // engine.SPACE_SIZE, y // engine.SPACE_SIZE, top, height))
+
+        body.reverse()
+        head_x, head_y = body[0]
+        engine.add_snake(game_state, player_id, body,
+                         cycle_direction(head_x // engine.SPACE_SIZE, head_y // engine.SPACE_SIZE, top, height))
+        game_state["scores"][player_id] = 0
+
+    game_state["game_started"] = True
+    return game_state, bands
+
+
+def steer(game_state, bands):
+    """
+    Parameters: game state of the match (game_state), dictionary of player -> band (bands)
+
+    Function for pointing every snake at the next cell of its band's cycle.
+
+    Returns: NULL (Nothing)
+    """
+    space_size = engine.SPACE_SIZE
+    for player_id, snake in game_state["players"].items():
+        head_x, head_y = snake.head()
+        snake.direction = cycle_direction(head_x // space_size, head_y // space_size, *bands[player_id])
+
+
+def play(game_state, bands, ticks):
+    """
+    Parameters: game state of the match (game_state), dictionary of player -> band (bands), ticks to play (ticks)
+
+    Function for playing ticks with engine.update_game timing its phases, and the broadcast timed after it.
+    The match never ends: a board with one snake left keeps being played.
+
+    Returns: Dictionary of phase -> seconds per tick, dictionary of counters
+    """
+    encoder = protocol.SnapshotEncoder()
+    clock = time.perf_counter
+    timings = {}
+    serialize = 0.0
+    counters = {"spawns": 0, "deaths": 0, "bytes": 0}
+
+    for tick in range(1, ticks + 1):
+        steer(game_state, bands)
+        food = game_state["food"]
+        counters["deaths"] += len(engine.update_game(game_state, timings))
+        counters["spawns"] += game_state["food"] is not food
+
+        started = clock()
+        frame, _ = encoder.encode(game_state, tick)
+        serialize += clock() - started
+        counters["bytes"] += len(frame)
+
+    totals = {
+        "move": timings.get("move", 0.0),
+        "collide": timings.get("collision", 0.0) + timings.get("remove", 0.0),
+        "spawn": timings.get("food", 0.0),
+        "serialize": serialize
+    }
+    counters["snakes_left"] = len(game_state["players"])
+    counters["segments_left"] = sum(len(snake) for snake in game_state["players"].values())
+    return {phase: total / ticks for phase, total in totals.items()}, counters
+
+
+def run_scenario(scenario, ticks, repeats, seed, arena=False):
+    """
+    Parameters: (columns, rows, snakes, length) tuple (scenario), ticks per run (ticks),
+                runs to take the median of (repeats), random seed (seed), whether to play arenas (arena)
+
+    Function for benchmarking one scenario.
+
+    Returns: Dictionary of results
+    """
+    columns, rows, snakes, length = scenario
+    runs = []
+    for _ in range(repeats):
+        game_state, bands = build_board(columns, rows, snakes, length, seed, arena)
+        with contextlib.redirect_stdout(io.StringIO()):
+            runs.append(play(game_state, bands, ticks))
+
+    # Median of every phase over the runs (the counters are the same for every run)
+    phases = {phase: statistics.median(run[0][phase] for run in runs) for phase in PHASES}
+    total = sum(phases.values())
+    return {
+        "name": f"{columns}x{rows}:{snakes}:{length}",
+        "columns": columns,
+        "rows": rows,
+        "snakes": snakes,
+        "length": length,
+        "ticks": ticks,
+        "phases_us": {phase: seconds * 1e6 for phase, seconds in phases.items()},
+        "tick_us": total * 1e6,
+        "ticks_per_second": 1 / total if total else 0.0,
+        "bytes_per_tick": runs[0][1]["bytes"] / ticks,
+        **{name: value for name, value in runs[0][1].items() if name != "bytes"}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--scenarios", type=parse_scenario, nargs="+",
+                        default=[parse_scenario(text) for text in DEFAULT_SCENARIOS],
+                        help="boards to play, as COLUMNSxROWS:SNAKES:LENGTH")
+    parser.add_argument("--ticks", type=int, default=200)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--arena", action="store_true", help="play the boards as arenas")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="results file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as previous:
+            baseline = {result["name"]: result for result in json.load(previous)["scenarios"]}
+
+    print(f"{args.ticks} ticks per run, median of {args.repeats} runs, seed {args.seed} (times in us per tick)")
+    print(f"{'scenario':<20}" + "".join(f"{phase:>11}" for phase in PHASES) + f"{'tick':>11}{'ticks/s':>10}")
+
+    results = []
+    for scenario in args.scenarios:
+        result = run_scenario(scenario, args.ticks, args.repeats, args.seed, args.arena)
+        results.append(result)
+        print(f"{result['name']:<20}" + "".join(f"{result['phases_us'][phase]:>11.1f}" for phase in PHASES) +
+              f"{result['tick_us']:>11.1f}{result['ticks_per_second']:>10.0f}")
+
+        # Change against the earlier run of the same scenario
+        previous = baseline.get(result["name"])
+        if previous is not None:
+            changes = [result["phases_us"][phase] / previous["phases_us"][phase] - 1
+                       if previous["phases_us"][phase] else 0.0 for phase in PHASES]
+            changes.append(result["tick_us"] / previous["tick_us"] - 1)
+            print(f"{'  vs baseline':<20}" + "".join(f"{change:>+11.0%}" for change in changes))
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"python": sys.version.split()[0], "platform": platform.platform(),
+                       "ticks": args.ticks, "repeats": args.repeats, "seed": args.seed, "arena": args.arena,
+                       "scenarios": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+import asyncio
+import collections
+import random
+import time
+import engine
+import protocol
+
+
+"""
+Headless players for exercising a server without pygame windows.
+A Bot speaks the same protocol as client.py over an asyncio connection: it joins a room,
+keeps its game state up to date from keyframes and deltas (asking for a keyframe after
+a gap), and steers its snake with a policy. When a match ends it joins the next one.
+While it plays, a Bot records what the server looks like from the client side:
+the time between consecutive tick updates, how long a turn takes to be acknowledged in
+the snapshots, and how many bytes it received.
+A Bot can also ask for the game state over UDP (see udp.py), optionally dropping a
+fraction of the datagrams it sends and receives to simulate a lossy network.
+"""
+
+
+# Seconds to wait before joining again after a refused join or a dropped connection
+RETRY_DELAY = 1.0
+
+# A turn that has not shown up in a snapshot after this many seconds counts as lost
+INPUT_TIMEOUT = 1.0
+
+# Seconds to wait for a requested keyframe before asking again (the datagram carrying it may be lost)
+KEYFRAME_RETRY = 0.5
+
+
+class DatagramReceiver(asyncio.DatagramProtocol):
+    """UDP socket of a Bot that switched to datagrams"""
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    def datagram_received(self, data, addr):
+        self.bot.receive_datagram(data)
+
+
+class RandomWalk:
+    """
+    Steering policy that wanders: the snake turns at random now and then, and always
+    turns away from a wall or a snake body in front of it when it can.
+    """
+
+    def __init__(self, turn_probability=0.2, rng=None):
+        self.turn_probability = turn_probability
+        self.rng = rng or random.Random()
+
+    def choose(self, game_state, player_key, width, height, tick):
+        """
+        Parameters: current game state (game_state), key of the bot's snake (player_key),
+                    board size in pixels (width, height), tick of the state (tick)
+
+        Function for picking the next direction.
+
+        Returns: Direction to turn to, or None to keep going
+        """
+        snake = game_state["players"][player_key]
+        direction = snake["direction"]
+        options = [name for name in engine.OPPOSITE_DIRECTIONS if not engine.is_reversal(direction, name)]
+        self.rng.shuffle(options)
+
+        # Keep going straight unless it is time for a random turn
+        if self.rng.random() >= self.turn_probability:
+            options.remove(direction)
+            options.insert(0, direction)
+
+        # First option whose next cell is on the board and not taken by a snake
+        occupied = {(x, y) for player_data in game_state["players"].values() for x, y in player_data["body"]}
+        head_x, head_y = snake["body"][0]
+        for name in options:
+            x, y = engine.next_head(head_x, head_y, name)
+            if 0 <= x < width and 0 <= y < height and (x, y) not in occupied:
+                return None if name == direction else name
+        return None
+
+
+class Scripted:
+    """
+    Steering policy that plays a fixed sequence of directions, moving on to the next
+    one every ticks_per_turn ticks (a direction that would reverse the snake is skipped).
+    """
+
+    def __init__(self, directions=("RIGHT", "DOWN", "LEFT", "UP"), ticks_per_turn=5):
+        self.directions = list(directions)
+        self.ticks_per_turn = ticks_per_turn
+        self.index = 0
+
+    def choose(self, game_state, player_key, width, height, tick):
+        """
+        Parameters: current game state (game_state), key of the bot's snake (player_key),
+                    board size in pixels (width, height), tick of the state (tick)
+
+        Function for picking the next direction.
+
+        Returns: Direction to turn to, or None to keep going
+        """
+        if tick % self.ticks_per_turn:
+            return None
+
+        direction = game_state["players"][player_key]["direction"]
+        for _ in range(len(self.directions)):
+            name = self.directions[self.index % len(self.directions)]
+            self.index += 1
+            if not engine.is_reversal(direction, name):
+                return None if name == direction else name
+        return None
+
+
+class Bot:
+    """
+    One simulated player. run() plays matches until it is cancelled; the measurement
+    attributes can be read at any time (they cover every match played so far).
+    """
+
+    def __init__(self, policy, max_players=0, tick_rate=0, room_id=None, create=False, udp=False, udp_loss=0.0):
+        self.policy = policy
+        self.max_players = max_players
+        self.tick_rate = tick_rate
+        self.room_id = room_id
+        self.create = create
+        self.udp = udp
+        self.udp_loss = udp_loss
+        self.rng = random.Random()
+
+        # Measurements
+        self.bytes_received = 0
+        self.messages = 0
+        self.intervals = []        # Seconds between the arrivals of consecutive ticks
+        self.expected_interval = None
+        self.latencies = []        # Seconds from sending a turn to the first snapshot acknowledging it
+        self.inputs_sent = 0
+        self.inputs_lost = 0
+        self.keyframe_requests = 0
+        self.datagrams = 0
+        self.games = 0
+        self.errors = 0
+        self.play_ticks = 0        # Ticks received while a match was running ...
+        self.play_time = 0.0       # ... over this many seconds
+
+        self._reset_match()
+
+    def _reset_match(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for forgetting the state of the previous match.
+
+        Returns: NULL (Nothing)
+        """
+        self.player_key = None
+        self.game_state = {}
+        self.last_tick = None
+        self.last_arrival = None
+        self.keyframe_requested = None
+        self.pending = None
+        self.game_over = False
+        self.width = engine.GAME_WIDTH
+        self.height = engine.GAME_HEIGHT
+
+        # Sequence number of the last turn sent
+        self.input_seq = 0
+
+        # UDP state: offer from the server, datagram socket, newest datagram applied, inputs to repeat
+        self.udp_offer = None
+        self.datagram_transport = None
+        self.datagram_seq = 0
+        self.udp_confirmed = False
+        self.recent_inputs = collections.deque(maxlen=protocol.REDUNDANT_INPUTS)
+        self.input_resends = 0
+        self.writer = None
+
+    async def run(self, host, port):
+        """
+        Parameters: server address (host), server port (port)
+
+        Function for playing one match after another until the task is cancelled.
+
+        Returns: NULL (Nothing)
+        """
+        while True:
+            try:
+                await self.play(host, port)
+            except (OSError, protocol.ProtocolError, asyncio.IncompleteReadError) as e:
+                self.errors += 1
+                print(f"Bot error: {e}")
+                await asyncio.sleep(RETRY_DELAY)
+
+    async def play(self, host, port):
+        """
+        Parameters: server address (host), server port (port)
+
+        Function for joining a room and playing until the match ends or the server hangs up.
+
+        Returns: NULL (Nothing)
+        """
+        self._reset_match()
+        reader, writer = await asyncio.open_connection(host, port)
+        decoder = protocol.StreamDecoder()
+        self.writer = writer
+
+        try:
+            writer.write(protocol.encode_join(self.room_id, self.max_players, self.create, self.tick_rate,
+                                              udp=self.udp))
+
+            while not self.game_over:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    return
+                now = time.monotonic()
+                self.bytes_received += len(chunk)
+
+                replies = []
+                for msg_type, data in decoder.feed(chunk):
+                    self.messages += 1
+                    self.handle(msg_type, data, now, replies)
+
+                if replies:
+                    writer.write(b"".join(replies))
+                    await writer.drain()
+
+                # Accept the server's UDP offer: open a socket and register it
+                if self.udp_offer is not None and self.datagram_transport is None:
+                    self.datagram_transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+                        lambda: DatagramReceiver(self), remote_addr=(host, self.udp_offer["port"]))
+                    self.send_datagram()
+
+        finally:
+            writer.close()
+            if self.datagram_transport is not None:
+                self.datagram_transport.close()
+
+        self.games += 1
+
+    def handle(self, msg_type, data, now, replies):
+        """
+        Parameters: message type (msg_type), decoded message (data), arrival time (now),
+                    list to add frames to send back to (replies)
+
+        Function for applying one message from the server and steering after each tick.
+
+        Returns: NULL (Nothing)
+        """
+        if msg_type == protocol.MSG_HELLO:
+            self.player_key = str(data["player_id"])
+            self.width = data["columns"] * engine.SPACE_SIZE
+            self.height = data["rows"] * engine.SPACE_SIZE
+            if data["tick_rate"]:
+                self.expected_interval = 1 / data["tick_rate"]
+
+        elif msg_type == protocol.MSG_ERROR:
+            raise protocol.ProtocolError(f"Server refused join: {data['reason']}")
+
+        elif msg_type == protocol.MSG_UDP_OFFER:
+            self.udp_offer = data
+
+        elif msg_type == protocol.MSG_SNAPSHOT:
+            tick, game_state = data
+
+            # Datagrams repeat the last few ticks: skip what is already applied
+            if self.last_tick is not None and tick < self.last_tick:
+                return
+            self.game_state = game_state
+            self.keyframe_requested = None
+            self.on_tick(tick, now, replies)
+
+        elif msg_type == protocol.MSG_DELTA:
+            tick, base_tick, delta = data
+            if self.last_tick is not None and tick <= self.last_tick:
+                return
+
+            # Gap in the stream: ask for a keyframe once (again after a while) and ignore deltas until it arrives
+            if base_tick != self.last_tick:
+                if self.keyframe_requested is None or now - self.keyframe_requested >= KEYFRAME_RETRY:
+                    replies.append(protocol.encode_keyframe_request(self.last_tick or 0))
+                    self.keyframe_requested = now
+                    self.keyframe_requests += 1
+                return
+
+            self.game_state = protocol.apply_delta(self.game_state, delta)
+            self.on_tick(tick, now, replies)
+
+        elif msg_type == protocol.MSG_GAME_OVER:
+            self.game_over = True
+
+    def on_tick(self, tick, now, replies):
+        """
+        Parameters: tick of the state just applied (tick), arrival time (now),
+                    list to add frames to send back to (replies)
+
+        Function for recording the timing of a tick update and choosing the next turn.
+
+        Returns: NULL (Nothing)
+        """
+        game_state = self.game_state
+        playing = game_state.get("game_started") and tick > 0
+
+        # Time since the previous tick (only between consecutive ticks of a running match)
+        if playing and self.last_arrival is not None and self.last_tick == tick - 1:
+            interval = now - self.last_arrival
+            self.intervals.append(interval)
+            self.play_ticks += 1
+            self.play_time += interval
+        self.last_tick = tick
+        self.last_arrival = now if playing else None
+
+        # Over UDP, repeat the registration until the server answers, and each turn on the next few ticks
+        if self.datagram_transport is not None and (not self.udp_confirmed or self.input_resends):
+            self.input_resends = max(0, self.input_resends - 1)
+            self.send_datagram()
+
+        snake = game_state["players"].get(self.player_key)
+        if snake is None or not playing or game_state.get("game_over"):
+            self.pending = None
+            return
+
+        # The server acknowledges a turn in the first tick that applied it
+        if self.pending is not None:
+            seq, sent = self.pending
+            if snake.get("ack", 0) >= seq:
+                self.latencies.append(now - sent)
+                self.pending = None
+            elif now - sent >= INPUT_TIMEOUT:
+                self.inputs_lost += 1
+                self.pending = None
+            else:
+                return
+
+        # One turn in flight at a time, so each effect is matched to the input that caused it
+        direction = self.policy.choose(game_state, self.player_key, self.width, self.height, tick)
+        if direction is not None:
+            self.input_seq += 1
+            if self.datagram_transport is not None:
+                self.recent_inputs.append((self.input_seq, direction, tick + 1))
+                self.input_resends = protocol.REDUNDANT_INPUTS - 1
+                self.send_datagram()
+            else:
+                replies.append(protocol.encode_input(int(self.player_key), direction, self.input_seq, tick + 1))
+            self.pending = (self.input_seq, time.monotonic())
+            self.inputs_sent += 1
+
+    def send_datagram(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for sending the server the bot's latest inputs over UDP (only registering
+        its address if it has none), unless the simulated loss drops the datagram.
+
+        Returns: NULL (Nothing)
+        """
+        if self.udp_loss and self.rng.random() < self.udp_loss:
+            return
+        self.datagram_transport.sendto(protocol.encode_client_datagram(self.udp_offer["token"], self.recent_inputs))
+
+    def receive_datagram(self, data):
+        """
+        Parameters: datagram from the server (data)
+
+        Function for applying the frames of a datagram that is newer than the last one applied.
+
+        Returns: NULL (Nothing)
+        """
+        if self.udp_loss and self.rng.random() < self.udp_loss:
+            return
+        now = time.monotonic()
+        self.bytes_received += len(data)
+        try:
+            seq, _, messages = protocol.decode_datagram(data)
+        except protocol.ProtocolError:
+            return
+        self.udp_confirmed = True
+        if seq <= self.datagram_seq:
+            return
+        self.datagram_seq = seq
+        self.datagrams += 1
+
+        replies = []
+        for msg_type, message in messages:
+            self.messages += 1
+            self.handle(msg_type, message, now, replies)
+        if replies and not self.writer.is_closing():
+            self.writer.write(b"".join(replies))
+
+    def summary(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for collecting the measurements in a form that can be sent between processes.
+
+        Returns: Dictionary of the bot's counters and samples
+        """
+        return {
+            "bytes_received": self.bytes_received,
+            "messages": self.messages,
+            "intervals": self.intervals,
+            "expected_interval": self.expected_interval,
+            "latencies": self.latencies,
+            "inputs_sent": self.inputs_sent,
+            "inputs_lost": self.inputs_lost,
+            "keyframe_requests": self.keyframe_requests,
+            "datagrams": self.datagrams,
+            "games": self.games,
+            "errors": self.errors,
+            "play_ticks": self.play_ticks,
+            "play_time": self.play_time
+        }
@@ -1,7 +1,13 @@
 import pygame
 import socket
-import pickle
 import threading
+import argparse
+import collections
+import random
+import time
+import prediction
+import protocol
+import renderer
 
 
 """
@@ -10,6 +16,13 @@ The client-side game state contains information about the position and direction
 the client snake. This information is updated and sent to the server through sockets.
 The client is also responsible for handling game state updates that it receives.
 These updates contain position of food, positions of other snakes, etc.
+With --udp the game state and our turns travel as datagrams once the server offers it
+(see udp.py); the handshake, countdown and result stay on TCP.
+Frames are drawn at the display rate: prediction.ClientView interpolates the other
+snakes between server ticks and predicts the local snake from the keys pressed.
+In a room with a view radius the server only sends what is near our snake; the window
+then shows that square of the board and a camera keeps our snake (a spectator's: the
+leading snake) in the middle of it.
 """
 
 
@@ -27,136 +40,318 @@ pygame.init()
 GAME_WIDTH = 800
 GAME_HEIGHT = 800
 SPACE_SIZE = 20
-PLAYER_COLORS = [
-    (50, 200, 50),   # Green
-    (50, 50, 200),   # Blue
-    (200, 200, 50),  # Yellow
-    (200, 100, 50)   # Orange
-]
-FOOD_COLOR = (255, 50, 50)
-BRICK_COLOR = (40, 40, 40)
-MORTAR_COLOR = (30, 30, 30)
-BRICK_WIDTH = 50
-BRICK_HEIGHT = 25
-
-# Setup the game window 
+FPS = 60
+
+# Setup the game window (colors, fonts and cached surfaces live in the renderer)
 window = pygame.display.set_mode((GAME_WIDTH, GAME_HEIGHT))
 pygame.display.set_caption("Multiplayer Snake")
-
-# Fonts for score
-font = pygame.font.SysFont('Arial', 20)
+screen = renderer.Renderer(window, SPACE_SIZE)
+
+# Room options (default: quick match into any open room)
+parser = argparse.ArgumentParser(description="Multiplayer Snake client")
+parser.add_argument("--room", type=int, help="join the room with this number")
+parser.add_argument("--create", action="store_true", help="open a new room instead of joining one")
+parser.add_argument("--players", type=int, default=0, help="players needed to start a new room (2-4, up to 255 in an arena)")
+parser.add_argument("--tick-rate", type=int, default=0, help="ticks per second of a new room's matches")
+parser.add_argument("--spectate", action="store_true", help="watch a room (--room, or the busiest one) without playing")
+parser.add_argument("--host", default='142.58.88.156', help="server address")  # Change to LAN IP if needed for multiple devices
+parser.add_argument("--port", type=int, default=5555, help="server port")
+parser.add_argument("--udp", action="store_true", help="receive the game state over UDP if the server offers it")
+parser.add_argument("--udp-loss", type=float, default=0.0, help="fraction of datagrams to drop at random, for testing")
+args = parser.parse_args()
 
 # Network setup & socket connection to server
-SERVER_IP = '142.58.88.156'  # Change to LAN IP if needed for multiple devices
-PORT = 5555
+SERVER_IP = args.host
+PORT = args.port
 client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
 client.connect((SERVER_IP, PORT))
+client.sendall(protocol.encode_join(args.room, args.players, args.create, args.tick_rate, args.spectate, args.udp))
 
 # Initialize empty game state
 player_id = None
 game_state = {}
 max_players = 2  # Default minimum value for multiplayer
+tick_rate = 10  # Ticks per second of the room's match (sent by the server)
+board_size = (GAME_WIDTH // SPACE_SIZE, GAME_HEIGHT // SPACE_SIZE)  # Board in cells (sent by the server)
+view_radius = 0  # Cells around our head the server sends us, 0 for the whole board (sent by the server)
+
+# Board position of the window's top-left corner
+camera = (0, 0)
 
 # Current direction of snake (used for moving logic)
 current_direction = None  
 
-def draw_brick_background():
-    """Draws a brick wall pattern for the bachgroun of the game"""
-    window.fill(MORTAR_COLOR)
-    
-    # Draw bricks in staggered pattern
-    for y in range(0, GAME_HEIGHT, BRICK_HEIGHT):
-        offset = BRICK_WIDTH // 2 if (y // BRICK_HEIGHT) % 2 else 0
-        for x in range(-offset, GAME_WIDTH, BRICK_WIDTH):
-            pygame.draw.rect(window, BRICK_COLOR, 
-                           (x, y, BRICK_WIDTH-2, BRICK_HEIGHT-2))
-
-def draw_snake_segment(x, y, size, color, is_head=False):
-    """Draws a single snake segment"""
-    if is_head:
-        # Draw rounded head with eyes
-        pygame.draw.ellipse(window, color, (x, y, size, size))
-        
-        # Calculate eye positions (looking in movement direction)
-        if current_direction == "RIGHT":
-            eye_positions = [(x + size//1.5, y + size//4), (x + size//1.5, y + size//1.5)]
-        elif current_direction == "LEFT":
-            eye_positions = [(x + size//4, y + size//4), (x + size//4, y + size//1.5)]
-        elif current_direction == "UP":
-            eye_positions = [(x + size//4, y + size//4), (x + size//1.5, y + size//4)]
-        else:  # DOWN
-            eye_positions = [(x + size//4, y + size//1.5), (x + size//1.5, y + size//1.5)]
-        # Draw eyes
-        for eye in eye_positions:
-            pygame.draw.circle(window, (255, 255, 255), (int(eye[0]), int(eye[1])), size//8)
-            pygame.draw.circle(window, (0, 0, 0), (int(eye[0]), int(eye[1])), size//12)
-    else:
-        # Draw tapered body segments
-        pygame.draw.rect(window, color, (x, y, size, size), border_radius=size//4)
+# Tick of the last snapshot or delta applied (deltas must continue from it)
+last_tick = None
 
-def draw_snake(player_id, body, color):
-    """Draws a complete snake with head and add the snake segment tto it"""
-    for i, segment in enumerate(body):
-        # Head is first segment
-        is_head = (i == 0)
-        # Calculate size (the tail of snake)
-        size = SPACE_SIZE
-        if not is_head:
-            size = max(SPACE_SIZE - (len(body) - i) // 3, SPACE_SIZE//2)
-        draw_snake_segment(segment[0], segment[1], size, color, is_head)
+# When a keyframe was requested and not yet received (None: not waiting for one)
+keyframe_requested = None
+KEYFRAME_RETRY = 0.5
 
+# Sequence number of our last turn and the tick it is meant for (the server applies one turn per tick)
+input_seq = 0
+input_tick = 0
 
-def receive_updates():
+# UDP state: datagram socket once the server offered it, our token, whether the server
+# answered, and the last few turns (repeated in every datagram)
+udp_socket = None
+udp_token = None
+udp_confirmed = False
+recent_inputs = collections.deque(maxlen=protocol.REDUNDANT_INPUTS)
+input_resends = 0
+
+# Held while a message is applied (TCP and UDP are read by different threads)
+update_lock = threading.Lock()
+
+# Interpolated and predicted view of the game state that is drawn every frame
+view = prediction.ClientView()
+
+
+def send_datagram():
     """
     Parameters: NULL (Nothing)
 
-    Function for receiving updates from server.
+    Function for sending the server our latest inputs over UDP (only registering our
+    address if there are none), unless the simulated loss drops the datagram.
+
+    Returns: NULL (Nothing)
+    """
+    if args.udp_loss and random.random() < args.udp_loss:
+        return
+    try:
+        udp_socket.send(protocol.encode_client_datagram(udp_token, recent_inputs))
+    except OSError as e:
+        print(f"Error sending datagram: {e}")
+
+
+def send_input(direction):
+    """
+    Parameters: direction the snake turns to (direction)
+
+    Function for sending a turn to the server: in a datagram that repeats the last few
+    turns once we are on UDP, over TCP otherwise. Each turn is numbered and meant for
+    the tick after the last one we have or after our previous turn's, whichever is later.
+
+    Returns: Sequence number of the turn
+    """
+    global input_seq, input_tick, input_resends
+
+    with update_lock:
+        input_seq += 1
+        input_tick = max(input_tick + 1, (last_tick or 0) + 1)
+        seq, tick = input_seq, input_tick
+        if udp_socket is not None:
+            recent_inputs.append((seq, direction, tick))
+            input_resends = protocol.REDUNDANT_INPUTS - 1
+
+    if udp_socket is not None:
+        send_datagram()
+    else:
+        client.sendall(protocol.encode_input(player_id, direction, seq, tick))
+    return seq
+
+
+def handle_message(msg_type, data):
+    """
+    Parameters: message type (msg_type), decoded message (data)
+
+    Function for applying one message from the server, received over TCP or in a datagram.
     If first connection, establish player ID and game_state.
     Otherwise, update game state with new information.
+    Must be called with update_lock held.
 
     Returns: NULL (Nothing)
     """
 
     # Global variables
-    global game_state, player_id, current_direction, max_players  
+    global game_state, player_id, current_direction, max_players, tick_rate, board_size, view_radius, last_tick
+    global keyframe_requested, udp_socket, udp_token, input_resends
+
+    # If this is the initial connection data
+    if msg_type == protocol.MSG_HELLO:
+        player_id = data["player_id"]
+        max_players = data["max_players"]
+        tick_rate = data["tick_rate"]
+        board_size = (data["columns"], data["rows"])
+        view_radius = data["view_radius"]
+        view.player_key = str(player_id)
+        view.set_tick_rate(tick_rate)
+        if player_id == protocol.SPECTATOR_ID:
+            print(f"Watching room {data['room_id']} ({tick_rate} ticks/s, {max_players} players)")
+        else:
+            print(f"Connected as Player {player_id + 1} in room {data['room_id']} ({tick_rate} ticks/s), "
+                  f"waiting for {max_players} players")
+
+    # The server refused to place us in a room
+    elif msg_type == protocol.MSG_ERROR:
+        print(f"Server refused connection: {data['reason']}")
+
+    # The server can send us the game state over UDP: register our datagram socket with it
+    elif msg_type == protocol.MSG_UDP_OFFER:
+        udp_token = data["token"]
+        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp_socket.connect((SERVER_IP, data["port"]))
+        threading.Thread(target=receive_datagrams, daemon=True).start()
+        send_datagram()
+        print(f"Receiving the game state over UDP port {data['port']}")
+
+    # A full game state update (keyframe)
+    elif msg_type == protocol.MSG_SNAPSHOT:
+
+        # Datagrams repeat the last few ticks: skip what is already applied
+        if last_tick is not None and data[0] < last_tick:
+            return
+        last_tick, game_state = data
+        keyframe_requested = None
+
+    # A per-tick change on top of the previous state
+    elif msg_type == protocol.MSG_DELTA:
+        tick, base_tick, delta = data
+        if last_tick is not None and tick <= last_tick:
+            return
+
+        # Gap in the stream: ignore deltas until a keyframe arrives (asking again if it got lost)
+        if base_tick != last_tick:
+            if keyframe_requested is None or time.monotonic() - keyframe_requested >= KEYFRAME_RETRY:
+                print(f"Missed update (have tick {last_tick}, delta is for {base_tick}), requesting keyframe")
+                client.sendall(protocol.encode_keyframe_request(last_tick or 0))
+                keyframe_requested = time.monotonic()
+            return
+
+        game_state = protocol.apply_delta(game_state, delta)
+        last_tick = tick
+
+    # Countdown update
+    elif msg_type == protocol.MSG_COUNTDOWN and game_state:
+        game_state["countdown"] = True
+        game_state["countdown_value"] = data["countdown_value"]
+
+    # Game result
+    elif msg_type == protocol.MSG_GAME_OVER and game_state:
+        game_state["game_over"] = True
+        game_state.update(data)
+
+    if msg_type in (protocol.MSG_SNAPSHOT, protocol.MSG_DELTA):
+        view.push(last_tick, game_state)
+
+        # Update our current direction (the server's, or the turn we are predicting)
+        if str(player_id) in game_state["players"]:
+            if current_direction is None:
+                print(f"Starting direction: {game_state['players'][str(player_id)]['direction']}")
+            current_direction = view.direction()
+
+        # On UDP, repeat the registration until the server answers, and each turn on the next few ticks
+        if udp_socket is not None and (not udp_confirmed or input_resends):
+            input_resends = max(0, input_resends - 1)
+            send_datagram()
+
+
+def receive_updates():
+    """
+    Parameters: NULL (Nothing)
+
+    Function for receiving updates from server over TCP.
+
+    Returns: NULL (Nothing)
+    """
+
+    # Decoder for the server's byte stream
+    decoder = protocol.StreamDecoder()
 
     # Loop to constantly receive updates
     while True:
         try:
 
-            # Access socket data via byte stream
-            data = pickle.loads(client.recv(4096)) 
-            
-            # If this is the initial connection data
-            if isinstance(data, dict) and "player_id" in data:
-                player_id = data["player_id"]
-                game_state = data.get("game_state", {})
-                
-                # Get max_players from the initial data
-                if "max_players" in data:
-                    max_players = data["max_players"]
-                    print(f"Connected as Player {player_id + 1}, waiting for {max_players} players")
-
-                # Get current direction from the initial data
-                if str(player_id) in game_state["players"]:
-                    current_direction = game_state["players"][str(player_id)]["direction"]
-                    
-                print(f"Starting direction: {current_direction}")
-
-            # Otherwise, a regular game state update
-            else:
-                game_state = data
-
-                # Update our current direction 
-                if "players" in game_state and str(player_id) in game_state["players"]:
-                    current_direction = game_state["players"][str(player_id)]["direction"]
-
-        # Exception thrown in case of error (ie. too much data)
+            # Access socket data via byte stream (a read may hold several messages or only part of one)
+            chunk = client.recv(65536)
+            if not chunk:
+                print("Disconnected from server")
+                break
+
+            with update_lock:
+                for msg_type, data in decoder.feed(chunk):
+                    handle_message(msg_type, data)
+
+        # Exception thrown in case of error (ie. corrupt data)
         except Exception as e:
             print(f"Error receiving updates: {e}")
             break
 
 
+def receive_datagrams():
+    """
+    Parameters: NULL (Nothing)
+
+    Function for receiving the game state over UDP. A datagram older than the newest one
+    applied is dropped; the frames it repeats are skipped by handle_message.
+
+    Returns: NULL (Nothing)
+    """
+    global udp_confirmed
+
+    # Sequence number of the newest datagram applied
+    last_seq = 0
+
+    while True:
+        try:
+            data = udp_socket.recv(65536)
+            if args.udp_loss and random.random() < args.udp_loss:
+                continue
+            seq, _, messages = protocol.decode_datagram(data)
+        except protocol.ProtocolError as e:
+            print(f"Ignoring datagram: {e}")
+            continue
+        except OSError as e:
+            print(f"Error receiving datagrams: {e}")
+            break
+
+        with update_lock:
+            udp_confirmed = True
+            if seq <= last_seq:
+                continue
+            last_seq = seq
+            for msg_type, message in messages:
+                handle_message(msg_type, message)
+
+
+def window_size():
+    """
+    Parameters: NULL (Nothing)
+
+    Function for finding the window size: the board, or the square a view radius covers if that is smaller.
+
+    Returns: Width, height in pixels
+    """
+    columns, rows = board_size
+    if view_radius:
+        columns = min(columns, 2 * view_radius + 1)
+        rows = min(rows, 2 * view_radius + 1)
+    return columns * SPACE_SIZE, rows * SPACE_SIZE
+
+
+def follow(frame_state):
+    """
+    Parameters: state the frame is drawn from (frame_state)
+
+    Function for moving the camera so the snake we follow is centered, without showing
+    anything past the edges of the board. The camera stays put while there is no snake to follow.
+
+    Returns: Board position of the window's top-left corner
+    """
+    players = frame_state.get("players", {}) if frame_state else {}
+    followed = players.get(str(player_id))
+    if followed is None and player_id == protocol.SPECTATOR_ID and players:
+        scores = game_state.get("scores", {})
+        followed = players[max(players, key=lambda key: scores.get(key, 0))]
+    if followed is None or not followed["body"]:
+        return camera
+
+    head_x, head_y = followed["body"][0]
+    camera_x = min(max(0, head_x + (SPACE_SIZE - GAME_WIDTH) / 2), board_size[0] * SPACE_SIZE - GAME_WIDTH)
+    camera_y = min(max(0, head_y + (SPACE_SIZE - GAME_HEIGHT) / 2), board_size[1] * SPACE_SIZE - GAME_HEIGHT)
+    return round(camera_x), round(camera_y)
+
+
 # Start receiving updates by threading the receive_updates function
 threading.Thread(target=receive_updates, daemon=True).start()
 
@@ -166,6 +361,13 @@ running = True
 
 # While the game is running
 while running:
+
+    # Size the window to the server's board (or our view of it) once it is known
+    if window_size() != (GAME_WIDTH, GAME_HEIGHT):
+        GAME_WIDTH, GAME_HEIGHT = window_size()
+        window = pygame.display.set_mode((GAME_WIDTH, GAME_HEIGHT))
+        screen.resize(window)
+
     for event in pygame.event.get():
 
         # If user has quit or game has ended
@@ -191,97 +393,18 @@ while running:
                 
             # Send updates if direction has changed and snake has not crashed
             if new_direction and player_id is not None:
-                client.send(pickle.dumps({"direction": new_direction, "player_id": player_id}))
+                view.add_input(new_direction, send_input(new_direction))
                 current_direction = new_direction  
 
-    # Draw the background
-    #window.fill(BACKGROUND_COLOR)
-    draw_brick_background()
-
-    # Check if we're in countdown mode (starting game)
-    if game_state and "countdown" in game_state and game_state["countdown"]:
-
-        # Display waiting message and countdown
-        waiting_text = font.render("Game starts in:", True, (255, 255, 255))
-        window.blit(waiting_text, (GAME_WIDTH // 2 - 100, GAME_HEIGHT // 2 - 50))
-        
-        # Make the countdown number larger
-        countdown_font = pygame.font.SysFont('Arial', 50)
-        countdown_text = countdown_font.render(str(game_state["countdown_value"]), True, (255, 0, 0))
-        window.blit(countdown_text, (GAME_WIDTH // 2 - 30, GAME_HEIGHT // 2))
-        
-        # Show how many players are connected 
-        if "players" in game_state:
-            player_count_text = font.render(f"Players connected: {len(game_state['players'])}/{max_players}", True, (255, 255, 255))
-            window.blit(player_count_text, (GAME_WIDTH // 2 - 100, GAME_HEIGHT // 2 + 80))
-    
-    # Render game elements if the game has started
-    elif game_state and "game_started" in game_state and game_state["game_started"]:
-
-        # Draw the food
-        if "food" in game_state:
-            # pygame.draw.ellipse(window, FOOD_COLOR, 
-            #                  (game_state["food"][0], game_state["food"][1], SPACE_SIZE, SPACE_SIZE))
-            food_x, food_y = game_state["food"]
-            pygame.draw.ellipse(window, FOOD_COLOR, (food_x, food_y, SPACE_SIZE, SPACE_SIZE))
-            # Draw stem
-            pygame.draw.rect(window, (100, 70, 0), (food_x + SPACE_SIZE//3, food_y - SPACE_SIZE//4, 2, SPACE_SIZE//4))
-
-        # Draw all snakes
-        if "players" in game_state:
-            for p_id, player_data in game_state["players"].items():
-                p_id = int(p_id)  
-                color = PLAYER_COLORS[p_id % len(PLAYER_COLORS)]
-                
-                # Draw each segment of the snake(s)
-                # for segment in player_data["body"]:
-                #     pygame.draw.rect(window, color, 
-                #                   (segment[0], segment[1], SPACE_SIZE, SPACE_SIZE))
-                draw_snake(p_id, player_data["body"], color)
-        
-        # Draw the scores of all snakes
-        if "scores" in game_state:
-            y_offset = 10
-            for p_id, score in game_state["scores"].items():
-                p_id = int(p_id)
-                color = PLAYER_COLORS[p_id % len(PLAYER_COLORS)]
-                score_text = font.render(f"Player {p_id + 1}: {score}", True, color)
-                window.blit(score_text, (10, y_offset))
-                y_offset += 35
-    
-    # If game hasn't started yet, show waiting message with player count
-    else:
-        if game_state and "players" in game_state:
-            waiting_text = font.render(f"Waiting for players... ({len(game_state['players'])}/{max_players})", True, (255, 255, 255))
-            window.blit(waiting_text, (GAME_WIDTH // 2 - 125, GAME_HEIGHT // 2))
-            
-        # If client is still connecting to server
-        else:
-            waiting_text = font.render("Connecting to server...", True, (255, 255, 255))
-            window.blit(waiting_text, (GAME_WIDTH // 2 - 125, GAME_HEIGHT // 2))
-    
-    # Display the game over when the game has ended
-    if game_state and "game_over" in game_state and game_state["game_over"]:
-        overlay = pygame.Surface((GAME_WIDTH, GAME_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 180))
-        window.blit(overlay, (0, 0))
-        
-        game_over_text = font.render("GAME OVER", True, (255, 0, 0))
-        window.blit(game_over_text, (GAME_WIDTH // 2 - 75, GAME_HEIGHT // 2 - 50))
-        
-        # Display winner if there is one
-        if "winner" in game_state:
-            winner = game_state["winner"]
-            winner_text = font.render(f"Player {int(winner) + 1} Wins!", True, PLAYER_COLORS[int(winner) % len(PLAYER_COLORS)])
-            window.blit(winner_text, (GAME_WIDTH // 2 - 75, GAME_HEIGHT // 2))
-
-        # Display tie game message if head on collision results in tie
-        elif "tie" in game_state and game_state["tie"]:
-            tie_text = font.render("Game Tied - All Players Died!", True, (255, 255, 255))
-            window.blit(tie_text, (GAME_WIDTH // 2 - 140, GAME_HEIGHT // 2))
+    # Snakes where they are at this instant (between server ticks)
+    frame_state = view.sample() if view.current is not None else game_state
 
-    pygame.display.update()
-    clock.tick(10)  # Must keep consistent with server speed
+    # Draw only what changed since the last frame (everything, when the camera moved)
+    camera = follow(frame_state)
+    screen.render(game_state, frame_state, max_players, camera)
+    clock.tick(FPS)  # Drawing is decoupled from the server speed
 
 pygame.quit()
 client.close()
+if udp_socket is not None:
+    udp_socket.close()
@@ -0,0 +1,225 @@
+import asyncio
+import collections
+import socket
+import threading
+import time
+import metrics
+import protocol
+
+
+"""
+Outbound side of the server's client connections.
+Everything sent to a client goes into a queue of its own that is drained apart from the
+game loop: a writer thread per socket in the threaded server, the event loop for asyncio
+streams. A client with a full TCP window therefore only ever holds up itself.
+Queues are bounded. Once a client has MAX_QUEUED_BYTES waiting, new game state frames
+are dropped for it and send() returns False; the room then sends it the newest full
+snapshot (a keyframe) instead of the backlog. Control frames (countdown, the result,
+errors) are queued all the same, since nothing would replace them. A client that stays over the limit for MAX_LAG seconds
+is disconnected.
+
+Connections have send(data), buffered() (bytes not written to the network yet),
+close() (once what is queued has been written) and abort() (at once).
+They count the bytes queued and dropped, the backlog each message joins and how long it
+waits before it is written (see metrics.py): the threaded server times each write of its
+writer thread, asyncio connections time their messages until the transport's buffer has
+been written out (a write buffer limit of 0 makes the transport report exactly that).
+"""
+
+
+# Bytes a client may have waiting before updates are dropped for it
+MAX_QUEUED_BYTES = 256 * 1024
+
+# Seconds a client may stay over the limit before it is disconnected
+# (also how long a closed connection gets to write what it still has queued)
+MAX_LAG = 5
+
+# Metrics
+SENT_BYTES = metrics.counter("snake_sent_bytes_total", "Bytes queued for clients")
+DROPPED_MESSAGES = metrics.counter("snake_dropped_messages_total", "Messages dropped for clients with a full queue")
+LAGGING_DISCONNECTS = metrics.counter("snake_lagging_disconnects_total",
+                                      f"Clients disconnected for staying over the queue limit for {MAX_LAG} s")
+BACKLOG_BYTES = metrics.histogram("snake_send_backlog_bytes", "Bytes a client already had waiting when a message was queued",
+                                  metrics.SIZE_BUCKETS)
+SEND_DELAY_SECONDS = metrics.histogram("snake_send_delay_seconds",
+                                       "Time from queueing a message to writing it to the socket")
+
+
+class SendLimit:
+    """Tracks since when a connection has had more than MAX_QUEUED_BYTES waiting"""
+
+    def __init__(self):
+        self.over_since = None
+        self.dropped = 0
+
+    def admit(self, queued, data):
+        """
+        Parameters: bytes the connection has waiting (queued), frames of the message (data)
+
+        Function for deciding what of a message may be queued for the client: all of it under
+        the limit, only its control frames over it.
+
+        Returns: Bytes to queue, Boolean of whether all of the message is queued (False: state was dropped)
+        """
+        BACKLOG_BYTES.observe(queued)
+        if queued < MAX_QUEUED_BYTES:
+            self.over_since = None
+            SENT_BYTES.inc(len(data))
+            return data, True
+        if self.over_since is None:
+            self.over_since = time.monotonic()
+        self.dropped += 1
+        DROPPED_MESSAGES.inc()
+        data = protocol.control_frames(data)
+        SENT_BYTES.inc(len(data))
+        return data, False
+
+    def lagging(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for checking whether the client has been over the limit for MAX_LAG seconds.
+
+        Returns: Boolean
+        """
+        return self.over_since is not None and time.monotonic() - self.over_since >= MAX_LAG
+
+
+class SocketConnection:
+    """Blocking socket of the threaded server, written by a thread of its own from a bounded queue"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queue = collections.deque()
+        self.queued_bytes = 0
+        self.closing = False
+        self.limit = SendLimit()
+        self.ready = threading.Condition()
+        threading.Thread(target=self._write_queued, daemon=True).start()
+
+    def _write_queued(self):
+        while True:
+            with self.ready:
+                while not self.queue and not self.closing:
+                    self.ready.wait()
+                if not self.queue:
+                    break
+                data, queued_at = self.queue.popleft()
+            try:
+                self.conn.sendall(data)
+            except OSError:
+                break
+            SEND_DELAY_SECONDS.observe(time.monotonic() - queued_at)
+            with self.ready:
+                self.queued_bytes -= len(data)
+        self.abort()
+
+    def send(self, data):
+        with self.ready:
+            if self.closing:
+                return False
+            data, admitted = self.limit.admit(self.queued_bytes, data)
+            if data:
+                self.queue.append((data, time.monotonic()))
+                self.queued_bytes += len(data)
+                self.ready.notify()
+            if admitted:
+                return True
+
+        if self.limit.lagging():
+            print(f"Disconnecting client that stayed {MAX_LAG} s behind")
+            LAGGING_DISCONNECTS.inc()
+            self.abort()
+        return False
+
+    def buffered(self):
+        return self.queued_bytes
+
+    def close(self):
+        with self.ready:
+            self.closing = True
+            self.ready.notify()
+
+        # A client that does not read what is left is cut off
+        if self.queued_bytes:
+            threading.Timer(MAX_LAG, self.abort).start()
+
+    def abort(self):
+        # Shut down first so threads blocked in recv() or sendall() wake up
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class StreamConnection:
+    """
+    asyncio stream writer: its transport buffer is the queue and the event loop drains it.
+    waiting holds the queue times of the messages still in the buffer, timed by _time_drain.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.limit = SendLimit()
+        self.waiting = []
+
+        # Pause (and so wake drain()) only once the buffer is completely written out
+        writer.transport.set_write_buffer_limits(0)
+
+    def send(self, data):
+        if self.writer.is_closing():
+            return False
+        data, admitted = self.limit.admit(self.buffered(), data)
+        if data:
+            queued_at = time.monotonic()
+            self.writer.write(data)
+
+            # Written straight to the socket, or left in the buffer until the event loop drains it
+            if not self.buffered():
+                SEND_DELAY_SECONDS.observe(time.monotonic() - queued_at)
+            else:
+                if not self.waiting:
+                    asyncio.ensure_future(self._time_drain())
+                self.waiting.append(queued_at)
+        if admitted:
+            return True
+
+        if self.limit.lagging():
+            print(f"Disconnecting client {self.writer.get_extra_info('peername')} that stayed {MAX_LAG} s behind")
+            LAGGING_DISCONNECTS.inc()
+            self.abort()
+        return False
+
+    async def _time_drain(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Coroutine for timing the waiting messages once the transport's buffer is empty
+        (messages written while it drains wait for the buffer to empty again).
+
+        Returns: NULL (Nothing)
+        """
+        try:
+            while self.buffered():
+                await self.writer.drain()
+        except OSError:
+            self.waiting.clear()
+            return
+        written = time.monotonic()
+        for queued_at in self.waiting:
+            SEND_DELAY_SECONDS.observe(written - queued_at)
+        self.waiting.clear()
+
+    def buffered(self):
+        return self.writer.transport.get_write_buffer_size()
+
+    def close(self):
+        self.writer.close()
+
+        # A client that does not read what is left is cut off
+        if self.buffered():
+            asyncio.get_running_loop().call_later(MAX_LAG, self.abort)
+
+    def abort(self):
+        self.writer.transport.abort()
@@ -0,0 +1,825 @@
+import random
+import time
+from array import array
+
+
+"""
+Game rules shared by every server mode - contains the board constants and the
+functions that set up, move and collide snakes and spawn food.
+Every function works on the game state dictionary of one match that is passed in,
+so many matches can run side by side in one process.
+A match created as an arena never ends: snakes that die are taken off the board and
+the server puts new ones on it wherever find_spawn finds free space. Every step of a
+tick costs in proportion to the snakes on the board, not to the size of the board.
+"""
+
+
+# Board Constants (defines screen size, snake size, etc.)
+GAME_WIDTH = 800
+GAME_HEIGHT = 800
+SPACE_SIZE = 20
+BODY_PARTS = 3
+
+# Unique starting positions and directions for each player (laid out for a 1000 pixel board, see starting_cell)
+starting_positions = [
+    {"pos": [100, 100], "direction": "RIGHT"},
+    {"pos": [900, 900], "direction": "LEFT"},
+    {"pos": [100, 900], "direction": "RIGHT"},
+    {"pos": [900, 100], "direction": "LEFT"}
+]
+
+# Direction a snake may not turn to from each direction (a 180-degree turn)
+OPPOSITE_DIRECTIONS = {"UP": "DOWN", "DOWN": "UP", "LEFT": "RIGHT", "RIGHT": "LEFT"}
+
+# Segments a new snake has room for before its ring buffer grows
+MIN_SNAKE_CAPACITY = 16
+
+# Board size in cells (the occupancy grid has one entry per cell)
+COLUMNS = GAME_WIDTH // SPACE_SIZE
+ROWS = GAME_HEIGHT // SPACE_SIZE
+
+# Largest board the server accepts in cells (coordinates travel as signed 16-bit pixels)
+MAX_BOARD_CELLS = 1000
+
+# Spawn search: empty cells tried as the head of a new snake, and cells it needs clear in front of it
+SPAWN_CANDIDATES = 16
+SPAWN_CLEARANCE = 5
+
+# Spatial hash: the board is split into square buckets of this many cells a side
+BUCKET_CELLS = 8
+BUCKET_COLUMNS = -(-COLUMNS // BUCKET_CELLS)
+BUCKET_ROWS = -(-ROWS // BUCKET_CELLS)
+
+# Variables for initial food generation (Area around the center of screen)
+CENTER_X = 500  
+CENTER_Y = 500  
+AREA_SIZE = 200  
+
+# Calculate x-boundaries for the food to spawn
+MIN_X = CENTER_X - (AREA_SIZE // 2)  
+MAX_X = CENTER_X + (AREA_SIZE // 2) - SPACE_SIZE  
+
+# Calculate y-boundaries for the food to spawn
+MIN_Y = CENTER_Y - (AREA_SIZE // 2)  
+MAX_Y = CENTER_Y + (AREA_SIZE // 2) - SPACE_SIZE  
+
+
+def configure_board(columns, rows):
+    """
+    Parameters: board width (columns) and height (rows) in cells
+
+    Function for changing the board size of every match this process creates afterwards.
+    The first food keeps its place relative to the board (5/8 across and down on the default board).
+
+    Returns: NULL (Nothing)
+    """
+    global GAME_WIDTH, GAME_HEIGHT, COLUMNS, ROWS, CENTER_X, CENTER_Y, AREA_SIZE, MIN_X, MAX_X, MIN_Y, MAX_Y
+    global BUCKET_COLUMNS, BUCKET_ROWS
+
+    if not (1 <= columns <= MAX_BOARD_CELLS and 1 <= rows <= MAX_BOARD_CELLS):
+        raise ValueError(f"Boards are 1-{MAX_BOARD_CELLS} cells wide and high")
+
+    COLUMNS = columns
+    ROWS = rows
+    GAME_WIDTH = columns * SPACE_SIZE
+    GAME_HEIGHT = rows * SPACE_SIZE
+    BUCKET_COLUMNS = -(-columns // BUCKET_CELLS)
+    BUCKET_ROWS = -(-rows // BUCKET_CELLS)
+
+    # Food area: same relative center, clamped to the board
+    CENTER_X = columns * 5 // 8 * SPACE_SIZE
+    CENTER_Y = rows * 5 // 8 * SPACE_SIZE
+    AREA_SIZE = min(200, GAME_WIDTH, GAME_HEIGHT) // (2 * SPACE_SIZE) * (2 * SPACE_SIZE)
+    MIN_X = max(0, CENTER_X - (AREA_SIZE // 2))
+    MAX_X = max(MIN_X, min(GAME_WIDTH - SPACE_SIZE, CENTER_X + (AREA_SIZE // 2) - SPACE_SIZE))
+    MIN_Y = max(0, CENTER_Y - (AREA_SIZE // 2))
+    MAX_Y = max(MIN_Y, min(GAME_HEIGHT - SPACE_SIZE, CENTER_Y + (AREA_SIZE // 2) - SPACE_SIZE))
+
+
+class Snake:
+    """
+    One player's snake: its direction and its body as a ring buffer of packed pixel
+    coordinates (x0, y0, x1, y1, ... from the head). Adding a head and dropping the
+    tail are O(1) and no object is created per segment; the buffer doubles when full.
+    last_input is the sequence number of the last input the server processed for it.
+    """
+
+    __slots__ = ("buffer", "start", "length", "direction", "last_input")
+
+    def __init__(self, body, direction):
+        capacity = max(MIN_SNAKE_CAPACITY, 2 * len(body))
+        self.buffer = array("h", bytes(4 * capacity))
+        self.start = 0
+        self.length = 0
+        self.direction = direction
+        self.last_input = 0
+
+        # Fill from the tail so the head ends up first
+        for x, y in reversed(body):
+            self.push_head(x, y)
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        values = iter(self.coords())
+        return zip(values, values)
+
+    def head(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for reading the position of the snake's head.
+
+        Returns: Pair of coordinates (x, y)
+        """
+        index = 2 * self.start
+        return self.buffer[index], self.buffer[index + 1]
+
+    def segment(self, position):
+        """
+        Parameters: segment number counted from the head (position)
+
+        Function for reading the position of one segment.
+
+        Returns: Pair of coordinates (x, y)
+        """
+        index = 2 * ((self.start + position) % (len(self.buffer) // 2))
+        return self.buffer[index], self.buffer[index + 1]
+
+    def push_head(self, x, y):
+        """
+        Parameters: position of the new head (x, y)
+
+        Function for adding a segment in front of the head.
+
+        Returns: NULL (Nothing)
+        """
+        capacity = len(self.buffer) // 2
+        if self.length == capacity:
+            self._grow()
+            capacity = len(self.buffer) // 2
+
+        self.start = (self.start - 1) % capacity
+        index = 2 * self.start
+        self.buffer[index] = x
+        self.buffer[index + 1] = y
+        self.length += 1
+
+    def pop_tail(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for removing the last segment.
+
+        Returns: Pair of coordinates (x, y) of the removed segment
+        """
+        self.length -= 1
+        index = 2 * ((self.start + self.length) % (len(self.buffer) // 2))
+        return self.buffer[index], self.buffer[index + 1]
+
+    def _grow(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for doubling the buffer, keeping the segments in order at its end.
+
+        Returns: NULL (Nothing)
+        """
+        coords = self.coords()
+        capacity = 2 * (len(self.buffer) // 2)
+        self.buffer = array("h", bytes(4 * (capacity - self.length))) + coords
+        self.start = capacity - self.length
+
+    def coords(self, count=None):
+        """
+        Parameters: number of segments from the head, None for all of them (count)
+
+        Function for copying segments out of the ring buffer in head-to-tail order.
+        This is the layout of a body on the wire, so encoding a snake is a slice or two.
+
+        Returns: array("h") of x0, y0, x1, y1, ...
+        """
+        if count is None or count > self.length:
+            count = self.length
+        capacity = len(self.buffer) // 2
+        begin = 2 * self.start
+        end = self.start + count
+
+        if end <= capacity:
+            return self.buffer[begin:2 * end]
+        return self.buffer[begin:] + self.buffer[:2 * (end - capacity)]
+
+    def to_dict(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for converting the snake into the player dictionary clients work with.
+
+        Returns: Dictionary with "body" (list of [x, y] segments) and "direction"
+        """
+        return {"body": [[x, y] for x, y in self], "direction": self.direction}
+
+
+def starting_cell(index, columns=None, rows=None):
+    """
+    Parameters: number of the starting position (index),
+                board size in cells, None for the board of this process (columns, rows)
+
+    Function for placing one of starting_positions on a board: it keeps the same fraction
+    of the board's size as on the 1000 pixel board it was laid out for, moved in from the
+    edges far enough for the snake's body to fit.
+
+    Returns: Column, row, direction
+    """
+    columns = columns or COLUMNS
+    rows = rows or ROWS
+    start = starting_positions[index]
+    low = BODY_PARTS - 1
+    return (min(max(start["pos"][0] * columns // 1000, low), columns - 1 - low),
+            min(max(start["pos"][1] * rows // 1000, low), rows - 1 - low),
+            start["direction"])
+
+
+def new_game_state(seed=None, arena=False):
+    """
+    Parameters: seed for the match's random generator, None for a random one (seed),
+                whether the match is an arena that goes on as snakes die (arena)
+
+    Function for creating the game state of a new match (no players yet, food near the center).
+    "players" maps each player key to its Snake.
+    The "grid" entry is the occupancy grid: one owner code per board cell, 0 for an empty
+    cell, otherwise the number of the player whose snake covers it plus one.
+    "free" lists every empty cell and "free_pos" gives each cell's place in that list
+    (-1 when occupied), so a random empty cell can be drawn in constant time.
+    "buckets" is the spatial hash kept alongside the grid: one dictionary per bucket of
+    BUCKET_CELLS x BUCKET_CELLS cells, mapping the owner code of every snake with a
+    cell in it to how many cells it has there (see interest.py).
+    All randomness of the match comes from "rng", so a seed makes it reproducible.
+
+    Returns: Game state dictionary
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    rng = random.Random(seed)
+
+    return {
+        "players": {},
+        "grid": array("H", bytes(2 * COLUMNS * ROWS)),
+        "free": list(range(COLUMNS * ROWS)),
+        "free_pos": array("l", range(COLUMNS * ROWS)),
+        "buckets": [{} for _ in range(BUCKET_COLUMNS * BUCKET_ROWS)],
+        "seed": seed,
+        "rng": rng,
+        "food": [rng.randint(MIN_X // SPACE_SIZE, MAX_X // SPACE_SIZE) * SPACE_SIZE,
+                 rng.randint(MIN_Y // SPACE_SIZE, MAX_Y // SPACE_SIZE) * SPACE_SIZE],
+        "scores": {},
+        "arena": arena,
+        "game_over": False,
+        "countdown": False,
+        "countdown_value": 3,
+        "game_started": False
+    }
+
+
+def reseed(game_state, seed=None):
+    """
+    Parameters: game state of the match (game_state), new seed, None for a random one (seed)
+
+    Function for restarting the match's random generator from a new seed, with the grid, the
+    free-cell list and the buckets laid out again as adding the snakes to an empty board in
+    their order would (food is drawn by its place in the free list, which otherwise depends
+    on the whole match so far). What happens from here on then follows from the seed and the
+    snakes alone, which is how an arena's replay is cut in pieces.
+
+    Returns: NULL (Nothing)
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    game_state["seed"] = seed
+    game_state["rng"] = random.Random(seed)
+
+    game_state["grid"] = grid = array("H", bytes(2 * COLUMNS * ROWS))
+    game_state["free"] = list(range(COLUMNS * ROWS))
+    game_state["free_pos"] = array("l", range(COLUMNS * ROWS))
+    game_state["buckets"] = [{} for _ in range(BUCKET_COLUMNS * BUCKET_ROWS)]
+    for player_id, snake in game_state["players"].items():
+        owner = owner_code(player_id)
+        for x, y in snake:
+            cell = cell_index(x, y)
+            if cell >= 0 and grid[cell] == 0:
+                claim_cell(game_state, cell, owner)
+
+
+def cell_index(x, y):
+    """
+    Parameters: pixel position of a board cell (x, y)
+
+    Function for finding a position's entry in the occupancy grid.
+
+    Returns: Index into the grid, or -1 if the position is off the board
+    """
+    if x < 0 or x >= GAME_WIDTH or y < 0 or y >= GAME_HEIGHT:
+        return -1
+    return (y // SPACE_SIZE) * COLUMNS + x // SPACE_SIZE
+
+
+def owner_code(player_id):
+    """
+    Parameters: player number (player_id)
+
+    Function for finding the value a player's cells hold in the occupancy grid.
+
+    Returns: Owner code (player number plus one)
+    """
+    return int(player_id) + 1
+
+
+def claim_cell(game_state, cell, owner):
+    """
+    Parameters: game state of the match (game_state), empty cell (cell), owner code (owner)
+
+    Function for marking an empty cell as covered, swap-removing it from the free-cell list
+    and counting it in its spatial hash bucket.
+
+    Returns: NULL (Nothing)
+    """
+    free = game_state["free"]
+    free_pos = game_state["free_pos"]
+    game_state["grid"][cell] = owner
+
+    # Count it in the spatial hash bucket it falls in
+    counts = game_state["buckets"][cell // COLUMNS // BUCKET_CELLS * BUCKET_COLUMNS + cell % COLUMNS // BUCKET_CELLS]
+    counts[owner] = counts.get(owner, 0) + 1
+
+    # Move the last free cell into the slot being vacated
+    index = free_pos[cell]
+    last = free.pop()
+    if last != cell:
+        free[index] = last
+        free_pos[last] = index
+    free_pos[cell] = -1
+
+
+def release_cell(game_state, cell):
+    """
+    Parameters: game state of the match (game_state), covered cell (cell)
+
+    Function for marking a covered cell as empty again, adding it to the free-cell list
+    and uncounting it from its spatial hash bucket.
+
+    Returns: NULL (Nothing)
+    """
+    free = game_state["free"]
+    grid = game_state["grid"]
+    counts = game_state["buckets"][cell // COLUMNS // BUCKET_CELLS * BUCKET_COLUMNS + cell % COLUMNS // BUCKET_CELLS]
+    owner = grid[cell]
+    if counts[owner] == 1:
+        del counts[owner]
+    else:
+        counts[owner] -= 1
+    grid[cell] = 0
+    game_state["free_pos"][cell] = len(free)
+    free.append(cell)
+
+
+def add_snake(game_state, player_id, body, direction):
+    """
+    Parameters: game state of the match (game_state), player number (player_id),
+                segments of the new snake (body), direction it faces (direction)
+
+    Function for putting a snake on the board and marking its cells in the occupancy grid.
+
+    Returns: The new Snake
+    """
+    snake = Snake(body, direction)
+    game_state["players"][player_id] = snake
+
+    grid = game_state["grid"]
+    owner = owner_code(player_id)
+    for x, y in snake:
+        cell = cell_index(x, y)
+        if cell >= 0 and grid[cell] == 0:
+            claim_cell(game_state, cell, owner)
+    return snake
+
+
+def remove_snake(game_state, player_id):
+    """
+    Parameters: game state of the match (game_state), player number (player_id)
+
+    Function for taking a snake off the board and clearing its cells in the occupancy grid.
+    Cells another snake has claimed in the same tick are left alone.
+
+    Returns: NULL (Nothing)
+    """
+    snake = game_state["players"].pop(player_id)
+
+    grid = game_state["grid"]
+    owner = owner_code(player_id)
+    for x, y in snake:
+        cell = cell_index(x, y)
+        if cell >= 0 and grid[cell] == owner:
+            release_cell(game_state, cell)
+
+
+def initialize_snake(position, direction):
+    """
+    Parameters: position (x,y) of the snake, direction (left, right, etc.) of the snake)
+
+    Function for initializing snakes using their position and direction.
+    Sets up the head and body of the snake in the direction it's facing.
+
+    Returns: List of positions called 'coordinates' that represents the snake 
+    """
+
+    # Variables 
+    coordinates = []
+    x, y = position
+    
+    # Initialize based on direction
+    if direction == "RIGHT":
+        for i in range(BODY_PARTS):
+            coordinates.append([x - i * SPACE_SIZE, y])
+
+    elif direction == "LEFT":
+        for i in range(BODY_PARTS):
+            coordinates.append([x + i * SPACE_SIZE, y])
+
+    elif direction == "UP":
+        for i in range(BODY_PARTS):
+            coordinates.append([x, y + i * SPACE_SIZE])
+
+    elif direction == "DOWN":
+        for i in range(BODY_PARTS):
+            coordinates.append([x, y - i * SPACE_SIZE])
+    
+    return coordinates
+
+
+def find_spawn(game_state, rng, length=BODY_PARTS):
+    """
+    Parameters: game state of the match (game_state), random generator to draw candidates with (rng),
+                segments of the new snake (length)
+
+    Function for searching free space for a new snake. Candidate heads are drawn from the
+    free-cell list; one fits in a direction when the body behind it and SPAWN_CLEARANCE
+    cells in front of it are empty, on the board and not the food. Of the candidates that
+    fit, the one with the fewest snake cells in the spatial hash buckets around it wins,
+    so snakes appear away from the crowd. The cost depends on SPAWN_CANDIDATES, not on the board.
+
+    Returns: Body (list of [x, y] segments from the head), direction, or None if nothing fits
+    """
+    free = game_state["free"]
+    grid = game_state["grid"]
+    buckets = game_state["buckets"]
+    food = game_state["food"]
+    food_cell = cell_index(*food) if food is not None else -1
+    directions = list(OPPOSITE_DIRECTIONS)
+    best = None
+
+    for _ in range(min(SPAWN_CANDIDATES, len(free))):
+        cell = free[rng.randrange(len(free))]
+        head_x, head_y = (cell % COLUMNS) * SPACE_SIZE, (cell // COLUMNS) * SPACE_SIZE
+        rng.shuffle(directions)
+
+        # Direction with room for the body behind the head and clear cells ahead of it
+        for direction in directions:
+            body = [[head_x, head_y]]
+            for _ in range(length - 1):
+                body.append(list(next_head(*body[-1], OPPOSITE_DIRECTIONS[direction])))
+            ahead = [(head_x, head_y)]
+            for _ in range(SPAWN_CLEARANCE):
+                ahead.append(next_head(*ahead[-1], direction))
+            cells = [cell_index(x, y) for x, y in body + ahead[1:]]
+            if all(other >= 0 and grid[other] == 0 and other != food_cell for other in cells):
+                break
+        else:
+            continue
+
+        # Snake cells in the 3x3 buckets around the head
+        bucket_column = cell % COLUMNS // BUCKET_CELLS
+        bucket_row = cell // COLUMNS // BUCKET_CELLS
+        crowd = sum(sum(buckets[row * BUCKET_COLUMNS + column].values())
+                    for row in range(max(0, bucket_row - 1), min(BUCKET_ROWS, bucket_row + 2))
+                    for column in range(max(0, bucket_column - 1), min(BUCKET_COLUMNS, bucket_column + 2)))
+        if best is None or crowd < best[0]:
+            best = (crowd, body, direction)
+            if crowd == 0:
+                break
+
+    return (best[1], best[2]) if best is not None else None
+
+
+def is_reversal(current_direction, new_direction):
+    """
+    Parameters: direction the snake moves in (current_direction), requested direction (new_direction)
+
+    Function for checking whether a turn would send a snake straight back into itself.
+
+    Returns: Boolean of whether the turn is a 180-degree turn
+    """
+    return OPPOSITE_DIRECTIONS.get(current_direction) == new_direction
+
+
+def next_head(head_x, head_y, direction):
+    """
+    Parameters: position of the head (head_x, head_y), direction of the snake (direction)
+
+    Function for finding where a snake's head goes on its next move.
+    Shared by the server's move_snake and the client's prediction.
+
+    Returns: Pair of coordinates (x, y) of the new head
+    """
+    if direction == "UP":
+        head_y -= SPACE_SIZE
+
+    elif direction == "DOWN":
+        head_y += SPACE_SIZE
+
+    elif direction == "LEFT":
+        head_x -= SPACE_SIZE
+
+    elif direction == "RIGHT":
+        head_x += SPACE_SIZE
+
+    return head_x, head_y
+
+
+def move_snake(game_state, player_id, snake):
+    """
+    Parameters: game state of the match (game_state), player number (player_id), Snake of the player (snake)
+
+    Function that moves the snake in the current direction.
+    If the snake lands on a food tile, update accordingly.
+    
+    Returns: Boolean called food_collision that says whether or not a snake has eaten an apple
+    """
+
+    # Calculate new head position
+    head_x, head_y = next_head(*snake.head(), snake.direction)
+    
+    # Insert new head
+    snake.push_head(head_x, head_y)
+    
+    # Boolean for food collisions
+    food_collision = False
+
+    # If a food collision has occured (there is no food once the board is full)
+    food = game_state["food"]
+    if food is not None and head_x == food[0] and head_y == food[1]:
+
+        # Increase score of the snake that ate it
+        game_state["scores"][player_id] += 1
+
+        # Generate new food (food has been eaten)
+        food_collision = True
+
+    else:
+
+        # Remove tail if no food was eaten (and free its cell before collisions are checked)
+        tail_x, tail_y = snake.pop_tail()
+        cell = cell_index(tail_x, tail_y)
+        if cell >= 0 and game_state["grid"][cell] == owner_code(player_id):
+            release_cell(game_state, cell)
+    
+    return food_collision
+
+
+def check_collision(game_state, player_id, snake):
+    """
+    Parameters: game state of the match (game_state), player number (player_id), Snake of the player (snake)
+
+    Function that implements the collision logic for the snakes.
+    Upon wall collision, snake dies
+    Upon self collision, snake dies
+    Upon collision with other snake's tail, snake dies
+    Upon head-to-head collision, the longer snake survives and a tied length means both die
+
+    The new head is looked up in the occupancy grid, so the check costs the same however
+    long the snakes are. A surviving head claims its cell; a head that dies leaves the
+    cell to its previous owner (overlaps only last until the dead snake is removed).
+    
+    Returns: Boolean of whether or not the snake should die, list of other snakes that should die from this collision
+    """
+
+    # Variables
+    head_x, head_y = snake.head()
+    additional_deaths = []
+    grid = game_state["grid"]
+    cell = cell_index(head_x, head_y)
+    
+    # Check wall collision
+    if cell < 0:
+        print(f"Player {player_id} died by hitting a wall")
+        return True, additional_deaths
+
+    owner = grid[cell]
+    my_owner = owner_code(player_id)
+
+    # Free cell: the head claims it
+    if owner == 0:
+        claim_cell(game_state, cell, my_owner)
+        return False, additional_deaths
+    
+    # Check self collision 
+    if owner == my_owner:
+        print(f"Player {player_id} died by hitting own tail")
+        return True, additional_deaths
+    
+    # Check collision with the snake covering the cell
+    other_id = str(owner - 1)
+    other_snake = game_state["players"][other_id]
+        
+    # Head-to-head collision
+    if (head_x, head_y) == other_snake.head():
+
+        # Compare snake lengths to determine winner
+        my_length = len(snake)
+        other_length = len(other_snake)
+            
+        # This snake wins            
+        if my_length > other_length:
+            print(f"Head collision: Player {player_id} wins against Player {other_id} ({my_length} vs {other_length})")
+            additional_deaths.append(other_id)
+            release_cell(game_state, cell)
+            claim_cell(game_state, cell, my_owner)
+            return False, additional_deaths
+
+        # Other snake wins
+        elif other_length > my_length:
+            print(f"Head collision: Player {player_id} loses to Player {other_id} ({my_length} vs {other_length})")
+            return True, additional_deaths
+        
+        # Tie - both snakes lose            
+        else:
+            print(f"Head collision: Players {player_id} and {other_id} tie and both die ({my_length} segments)")
+            additional_deaths.append(other_id)
+            return True, additional_deaths
+    
+    # Collision with other snake's body (except the head)
+    print(f"Player {player_id} died by hitting Player {other_id}'s tail")
+    return True, additional_deaths
+
+
+def generate_new_food(game_state):
+    """
+    Parameters: game state of the match (game_state)
+
+    Function for finding the new coordinates for the food to generate. 
+    Position cannot be where a snake currently resides on, so it is drawn from the
+    free-cell list with the match's random generator (constant time at any board fill).
+
+    Returns: Pair of coordinates that represents the new spawnpoint for food, or None if the board is full
+    """
+    free = game_state["free"]
+    if not free:
+        return None
+
+    cell = free[game_state["rng"].randrange(len(free))]
+    return [(cell % COLUMNS) * SPACE_SIZE, (cell // COLUMNS) * SPACE_SIZE]
+
+
+def end_abandoned(game_state):
+    """
+    Parameters: game state of the match (game_state)
+
+    Function for ending a match that players left until fewer than 2 snakes remain.
+    The snake still on the board wins; with none left it is a tie.
+
+    Returns: NULL (Nothing)
+    """
+    game_state["countdown"] = False
+    game_state["game_over"] = True
+
+    if game_state["players"]:
+        game_state["winner"] = next(iter(game_state["players"]))
+        print(f"Game over! Player {game_state['winner']} wins, the others left")
+    else:
+        game_state["tie"] = True
+        print("Game over! Every snake left the match - it's a tie!")
+
+
+def end_full_board(game_state):
+    """
+    Parameters: game state of the match (game_state)
+
+    Function for ending a match whose board has no empty cell left for food.
+    The highest score wins; a shared highest score is a tie.
+
+    Returns: NULL (Nothing)
+    """
+    game_state["food"] = None
+    game_state["board_full"] = True
+    game_state["game_over"] = True
+
+    # Compare the scores of the snakes still alive
+    scores = {player_id: game_state["scores"].get(player_id, 0) for player_id in game_state["players"]}
+    best = max(scores.values(), default=0)
+    leaders = [player_id for player_id, score in scores.items() if score == best]
+
+    if len(leaders) == 1:
+        game_state["winner"] = leaders[0]
+        print(f"Game over! Board is full - Player {game_state['winner']} wins with {best} points!")
+    else:
+        game_state["tie"] = True
+        print("Game over! Board is full - it's a tie!")
+
+
+def update_game(game_state, timings=None):
+    """
+    Parameters: game state of the match (game_state),
+                dictionary to add the seconds spent moving, colliding, placing food and
+                removing snakes to, None to not time them (timings)
+
+    Function for playing one tick of the match.
+    Moves every snake, resolves collisions, respawns eaten food, removes dead snakes
+    and decides the winner once 0 or 1 snake remains (an arena goes on, and waits for room
+    to place food when its board is full).
+
+    Returns: List of the players whose snakes were removed
+    """
+
+    # Variables to be updated
+    food_eaten = False
+    players_to_remove = []
+    active_players = len(game_state["players"])
+
+    # Process each player
+    for player_id, snake in list(game_state["players"].items()):
+
+        # Skip already removed players
+        if player_id in players_to_remove:
+            continue
+            
+        # Move snake
+        if timings is not None:
+            started = time.perf_counter()
+        if move_snake(game_state, player_id, snake):
+            food_eaten = True
+        if timings is not None:
+            moved = time.perf_counter()
+            timings["move"] = timings.get("move", 0.0) + moved - started
+
+        # Check collisions 
+        should_die, others_to_kill = check_collision(game_state, player_id, snake)
+        if timings is not None:
+            timings["collision"] = timings.get("collision", 0.0) + time.perf_counter() - moved
+        
+        # If a snake has crashed or should be removed
+        if should_die:
+            players_to_remove.append(player_id)
+        
+        # Add any other players that should die from this collision
+        for other_id in others_to_kill:
+            if other_id not in players_to_remove:
+                players_to_remove.append(other_id)
+    
+    # Generate new food if needed
+    if timings is not None:
+        started = time.perf_counter()
+    if food_eaten:
+        game_state["food"] = generate_new_food(game_state)
+    if timings is not None:
+        placed = time.perf_counter()
+        timings["food"] = timings.get("food", 0.0) + placed - started
+
+    # Remove dead players
+    for player_id in players_to_remove:
+        if player_id in game_state["players"]:
+            print(f"Player {player_id} removed from game")
+            remove_snake(game_state, player_id)
+    if timings is not None:
+        timings["remove"] = timings.get("remove", 0.0) + time.perf_counter() - placed
+    
+    # An arena never ends (food comes back as soon as there is room for it)
+    if game_state.get("arena"):
+        if game_state["food"] is None:
+            game_state["food"] = generate_new_food(game_state)
+        return players_to_remove
+
+    # No room left for food, even after clearing the dead snakes: the match ends
+    if food_eaten and game_state["food"] is None:
+        game_state["food"] = generate_new_food(game_state)
+        if game_state["food"] is None:
+            end_full_board(game_state)
+            return players_to_remove
+
+    # Check game over condition
+    remaining_players = len(game_state["players"])
+    
+    # Game ends when 0 or 1 player remains
+    if remaining_players <= 1 and active_players > 1:
+        game_state["game_over"] = True
+
+        # Last player standing wins
+        if remaining_players == 1:
+            game_state["winner"] = list(game_state["players"].keys())[0]
+            print(f"Game over! Player {game_state['winner']} wins!")
+
+        # Everyone has died - it's a tie
+        else:
+            game_state["tie"] = True
+            print("Game over! All players died - it's a tie!")
+
+    return players_to_remove
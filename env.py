@@ -0,0 +1,260 @@
+import numpy as np
+import batch
+import engine
+
+
+"""
+Headless reinforcement-learning environment for training steering policies, in the style
+of a vectorized Gym environment: reset() returns observations, step(actions) returns
+(observations, rewards, terminated, truncated, info) for every environment at once.
+The games run on batch.BatchEngine, so they follow the server's rules. With players=1 each
+environment is the single-player game (one snake, walls, food); with more players every
+snake on a board is an agent and observes the board from its own point of view.
+Actions are direction codes (protocol.DIRECTIONS: 0 UP, 1 DOWN, 2 LEFT, 3 RIGHT), one per
+agent; a 180-degree turn is ignored as on the server. Environments whose episode ends are
+restarted inside step(), so the observation returned for them is the first of the next episode.
+Observations are written into arrays allocated once and returned on every call (copy them
+to keep them past the next step):
+  "grid"     - (envs, players, 4, rows, columns) uint8 planes: own body, own head,
+               other snakes, food
+  "features" - (envs, players, FEATURES) float32: for each direction, whether the next cell
+               is blocked; the current direction one-hot; the direction of the food one-hot
+               per axis; length over board size
+pygame is only imported when render() is called.
+"""
+
+
+# Rewards
+FOOD_REWARD = 1.0
+DEATH_REWARD = -1.0
+STEP_REWARD = 0.0
+
+# Grid observation planes
+OWN_BODY, OWN_HEAD, OTHER_BODIES, FOOD = range(4)
+PLANES = 4
+
+# Feature vector: 4 blocked flags, 4 direction flags, 4 food direction flags, length
+FEATURES = 13
+
+# Cell size of rendered frames in pixels
+RENDER_CELL = engine.SPACE_SIZE
+
+
+class SnakeEnv:
+    """
+    A batch of num_envs Snake games advanced together. action_count and observation_shape
+    describe the spaces for one agent.
+    """
+
+    def __init__(self, num_envs=1, players=1, columns=20, rows=20, observation="grid",
+                 max_steps=1000, seed=None, render_mode=None):
+        if observation not in ("grid", "features"):
+            raise ValueError(f"Unknown observation type {observation!r}")
+
+        self.num_envs = num_envs
+        self.players = players
+        self.columns = columns
+        self.rows = rows
+        self.observation = observation
+        self.max_steps = max_steps
+        self.render_mode = render_mode
+        self.games = batch.BatchEngine(num_envs, players, columns, rows, seed=seed)
+
+        self.action_count = 4
+        if observation == "grid":
+            self.observation_shape = (PLANES, rows, columns)
+            self.observations = np.zeros((num_envs, players) + self.observation_shape, np.uint8)
+            self._occupied = np.zeros((num_envs, rows, columns), np.uint8)
+        else:
+            self.observation_shape = (FEATURES,)
+            self.observations = np.zeros((num_envs, players, FEATURES), np.float32)
+
+        # Per-step results, reused between steps
+        self.rewards = np.zeros((num_envs, players), np.float32)
+        self.terminated = np.zeros(num_envs, bool)
+        self.truncated = np.zeros(num_envs, bool)
+        self._last_score = np.zeros((num_envs, players), np.int64)
+        self._last_alive = np.zeros((num_envs, players), bool)
+        self._screen = None
+
+    def reset(self, seed=None):
+        """
+        Parameters: new random seed, None to keep the current generator (seed)
+
+        Function for starting a new episode in every environment.
+
+        Returns: Observations
+        """
+        if seed is not None:
+            self.games.rng = np.random.default_rng(seed)
+        self.games.reset()
+        self._last_score[:] = 0
+        self._last_alive[:] = True
+        return self._observe()
+
+    def step(self, actions):
+        """
+        Parameters: (num_envs, players) array of direction codes, or (num_envs,) with one player (actions)
+
+        Function for playing one tick in every environment, scoring it, and restarting the
+        environments whose episode ended.
+
+        Returns: Observations, rewards (num_envs, players), terminated (num_envs,),
+                 truncated (num_envs,), info dictionary
+        """
+        games = self.games
+        actions = np.asarray(actions).reshape(self.num_envs, self.players)
+        games.step(actions)
+
+        # Rewards: food eaten, death, and a constant per step
+        rewards = self.rewards
+        np.subtract(games.score, self._last_score, out=rewards, casting="unsafe")
+        rewards *= FOOD_REWARD
+        rewards += STEP_REWARD
+        rewards[self._last_alive & ~games.alive] += DEATH_REWARD
+
+        np.copyto(self.terminated, games.game_over)
+        np.greater_equal(games.ticks, self.max_steps, out=self.truncated)
+        self.truncated &= ~self.terminated
+        done = self.terminated | self.truncated
+
+        info = {}
+        if done.any():
+            info["episode_score"] = games.score[done].copy()
+            info["episode_length"] = games.ticks[done].copy()
+            info["winner"] = games.winner[done].copy()
+            info["done_envs"] = np.flatnonzero(done)
+            games.reset(done)
+
+        np.copyto(self._last_score, games.score)
+        np.copyto(self._last_alive, games.alive)
+        return self._observe(), rewards, self.terminated, self.truncated, info
+
+    def _observe(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for writing every agent's observation into the observation array.
+
+        Returns: Observations
+        """
+        if self.observation == "grid":
+            self._observe_grid()
+        else:
+            self._observe_features()
+        return self.observations
+
+    def _observe_grid(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for filling the grid planes of every agent.
+
+        Returns: NULL (Nothing)
+        """
+        games = self.games
+        owner = games.owner.reshape(self.num_envs, self.rows, self.columns)
+        observations = self.observations
+        np.not_equal(owner, 0, out=self._occupied, casting="unsafe")
+        envs = np.arange(self.num_envs)
+
+        for slot in range(self.players):
+            planes = observations[:, slot]
+            np.equal(owner, slot + 1, out=planes[:, OWN_BODY], casting="unsafe")
+            np.subtract(self._occupied, planes[:, OWN_BODY], out=planes[:, OTHER_BODIES])
+
+            heads = planes[:, OWN_HEAD].reshape(self.num_envs, -1)
+            heads.fill(0)
+            alive = games.alive[:, slot]
+            heads[envs[alive], games.head[alive, slot]] = 1
+
+        food = observations[:, 0, FOOD].reshape(self.num_envs, -1)
+        food.fill(0)
+        has_food = games.food >= 0
+        food[envs[has_food], games.food[has_food]] = 1
+        observations[:, 1:, FOOD] = observations[:, :1, FOOD]
+
+    def _observe_features(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for filling the feature vector of every agent.
+
+        Returns: NULL (Nothing)
+        """
+        games = self.games
+        columns = self.columns
+        features = self.observations
+        features.fill(0)
+
+        head = np.maximum(games.head, 0)
+        column = head % columns
+        row = head // columns
+
+        # Blocked: the next cell in each direction is off the board or taken by a snake
+        edges = (row == 0, row == self.rows - 1, column == 0, column == columns - 1)
+        for code, offset in enumerate(games.offsets):
+            target = np.clip(head + offset, 0, self.columns * self.rows - 1)
+            taken = np.take_along_axis(games.owner, target, axis=1) != 0
+            features[:, :, code] = edges[code] | taken
+
+        # Current direction
+        np.put_along_axis(features, 4 + games.direction[:, :, None], 1.0, axis=2)
+
+        # Food direction along each axis
+        food = games.food[:, None]
+        food_column = food % columns
+        food_row = food // columns
+        has_food = food >= 0
+        features[:, :, 8 + batch.UP] = has_food & (food_row < row)
+        features[:, :, 8 + batch.DOWN] = has_food & (food_row > row)
+        features[:, :, 8 + batch.LEFT] = has_food & (food_column < column)
+        features[:, :, 8 + batch.RIGHT] = has_food & (food_column > column)
+
+        features[:, :, 12] = games.length / (self.columns * self.rows)
+        features[~games.alive] = 0
+
+    def render(self, env=0):
+        """
+        Parameters: environment to show (env)
+
+        Function for drawing one environment with the client's renderer.
+        With render_mode "human" it is shown in a window; with "rgb_array" the frame is returned
+        (drawn without a visible window unless SDL_VIDEODRIVER says otherwise).
+
+        Returns: (height, width, 3) uint8 array of the frame for "rgb_array", else None
+        """
+        if self.render_mode is None:
+            return None
+
+        import os
+        if self.render_mode == "rgb_array":
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        import pygame
+        import renderer
+
+        if self._screen is None:
+            pygame.init()
+            window = pygame.display.set_mode((self.columns * RENDER_CELL, self.rows * RENDER_CELL))
+            pygame.display.set_caption("Snake environment")
+            self._screen = renderer.Renderer(window, RENDER_CELL)
+
+        pygame.event.pump()
+        game_state = self.games.board_state(env)
+        self._screen.render(game_state, game_state, self.players)
+        if self.render_mode == "rgb_array":
+            return pygame.surfarray.array3d(self._screen.window).transpose(1, 0, 2)
+        return None
+
+    def close(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for closing the render window, if one was opened.
+
+        Returns: NULL (Nothing)
+        """
+        if self._screen is not None:
+            import pygame
+            pygame.quit()
+            self._screen = None
@@ -0,0 +1,125 @@
+import collections
+import engine
+import protocol
+import udp
+
+
+"""
+Area of interest: on a large board each player is only sent what is near its own snake.
+The engine keeps a spatial hash of the snakes next to its occupancy grid (the game
+state's "buckets": for every square of engine.BUCKET_CELLS cells, which snakes cover a
+cell in it), so finding the snakes around a point costs a look at the few buckets that
+overlap it, however large the board and however many snakes it holds.
+A View is one player's window on the match: the square of radius cells around its head
+(rounded out to whole buckets), with every snake that has a cell in it, the food if it
+lies inside and the scores of those snakes. Each View has its own SnapshotEncoder, so
+its deltas are computed against what that player saw last: a snake that enters the view
+arrives as a full body (BODY_FULL) and one that leaves it is listed as removed, exactly
+like a snake that joins or dies. What a player is sent each tick therefore depends on
+how crowded its surroundings are, not on the size of the board or the number of players.
+"""
+
+
+# Largest radius a room accepts in cells
+MAX_VIEW_RADIUS = 200
+
+
+class View:
+    """
+    One player's area of interest: its radius in cells, the cell it is centered on (the
+    snake's head, or where it was last seen), the encoder of its frames and the frames of
+    its last few ticks (repeated in its UDP datagrams).
+    """
+
+    def __init__(self, radius):
+        self.radius = radius
+        self.center = None
+        self.encoder = protocol.SnapshotEncoder()
+        self.recent_frames = collections.deque(maxlen=udp.REDUNDANT_TICKS)
+
+    def visible_keys(self, game_state):
+        """
+        Parameters: server game state dictionary (game_state)
+
+        Function for looking up in the spatial hash which snakes have a cell in the buckets
+        overlapping the view.
+
+        Returns: Set of player keys
+        """
+        column, row = self.center
+        radius = self.radius
+        first_column = max(0, (column - radius) // engine.BUCKET_CELLS)
+        last_column = min(engine.BUCKET_COLUMNS - 1, (column + radius) // engine.BUCKET_CELLS)
+        first_row = max(0, (row - radius) // engine.BUCKET_CELLS)
+        last_row = min(engine.BUCKET_ROWS - 1, (row + radius) // engine.BUCKET_CELLS)
+
+        buckets = game_state["buckets"]
+        owners = set()
+        for bucket_row in range(first_row, last_row + 1):
+            start = bucket_row * engine.BUCKET_COLUMNS
+            for counts in buckets[start + first_column:start + last_column + 1]:
+                owners.update(counts)
+        return {str(owner - 1) for owner in owners}
+
+    def visible_state(self, game_state, player_key):
+        """
+        Parameters: server game state dictionary (game_state), key of the view's player (player_key)
+
+        Function for building the part of the game state the player can see. The player's
+        own snake and score are always part of it. A player that has had no snake yet (an
+        arena player waiting for room) looks at the middle of the board. The status fields
+        are shared with the full state.
+
+        Returns: Game state dictionary (snakes are the server's Snake objects)
+        """
+        players = game_state["players"]
+        snake = players.get(player_key)
+        if snake is not None:
+            x, y = snake.head()
+            self.center = (x // engine.SPACE_SIZE, y // engine.SPACE_SIZE)
+        elif self.center is None:
+            self.center = (engine.COLUMNS // 2, engine.ROWS // 2)
+
+        keys = self.visible_keys(game_state)
+        keys.add(player_key)
+        scores = game_state["scores"]
+
+        state = dict(game_state)
+        state["players"] = {key: players[key] for key in keys if key in players}
+        state["scores"] = {key: scores[key] for key in keys if key in scores}
+
+        # Food only while it is inside the view
+        food = game_state.get("food")
+        if food is not None:
+            column, row = self.center
+            if (abs(food[0] // engine.SPACE_SIZE - column) > self.radius or
+                    abs(food[1] // engine.SPACE_SIZE - row) > self.radius):
+                state["food"] = None
+        return state
+
+    def keyframe(self, game_state, player_key, tick):
+        """
+        Parameters: server game state dictionary (game_state), key of the view's player (player_key),
+                    tick number of the state (tick)
+
+        Function for encoding a full snapshot of the view without changing its delta baseline.
+
+        Returns: Encoded frame
+        """
+        return self.encoder.keyframe(self.visible_state(game_state, player_key), tick)
+
+    def encode(self, game_state, player_key, tick, force_keyframe=False):
+        """
+        Parameters: server game state dictionary (game_state), key of the view's player (player_key),
+                    tick number of the state (tick), whether a keyframe must be sent (force_keyframe)
+
+        Function for encoding this tick's frame of the view and keeping it among the recent frames
+        (from the last keyframe on).
+
+        Returns: Encoded frame, Boolean of whether the frame is a keyframe
+        """
+        frame, is_keyframe = self.encoder.encode(self.visible_state(game_state, player_key), tick, force_keyframe)
+        if is_keyframe:
+            self.recent_frames.clear()
+        self.recent_frames.append(frame)
+        return frame, is_keyframe
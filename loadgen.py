@@ -0,0 +1,203 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import statistics
+import time
+import bot
+
+
+"""
+Load generator for finding how many concurrent matches a server can carry.
+Opens matches x players headless bots (bot.Bot) against a running server, lets them play
+for a while and reports what the clients saw: tick rate achieved, jitter of the time
+between ticks, input-to-effect latency and bytes received. Several match counts can be
+given to step the load up; the point where jitter and latency climb and the achieved
+tick rate drops below the configured one is the capacity of the host.
+Start the server with a board large enough for every starting position, e.g.
+python server.py --board-size 50x50
+Against a server started with --arena, each match is one arena of --players bots, e.g.
+python server.py --arena --board-size 200x200 --view-radius 15
+With --udp the bots take the game state over UDP (the server needs --udp-port), and
+--udp-loss makes them drop that fraction of datagrams in both directions.
+"""
+
+
+def percentile(samples, fraction):
+    """
+    Parameters: list of numbers (samples), fraction of samples below the result, 0 to 1 (fraction)
+
+    Function for reading a percentile (nearest rank).
+
+    Returns: Percentile, or 0.0 for no samples
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def make_policy(name, seed, script, ticks_per_turn):
+    """
+    Parameters: policy name, "random" or "script" (name), random seed (seed),
+                directions of a scripted bot (script), ticks between scripted turns (ticks_per_turn)
+
+    Function for building a steering policy for one bot.
+
+    Returns: Policy object
+    """
+    if name == "script":
+        return bot.Scripted(script, ticks_per_turn)
+    return bot.RandomWalk(rng=random.Random(seed))
+
+
+async def run_bots(options, count, first_seed):
+    """
+    Parameters: load options (options), number of bots to run (count), seed of the first bot (first_seed)
+
+    Function for running bots against the server for the configured duration.
+
+    Returns: List of bot summaries
+    """
+    bots = [bot.Bot(make_policy(options["policy"], first_seed + i, options["script"], options["ticks_per_turn"]),
+                    options["players"], options["tick_rate"], udp=options["udp"], udp_loss=options["udp_loss"])
+            for i in range(count)]
+    tasks = []
+    for player in bots:
+        tasks.append(asyncio.ensure_future(player.run(options["host"], options["port"])))
+
+        # Spread the connections out a little so the joins do not arrive as one burst
+        await asyncio.sleep(options["connect_interval"])
+
+    await asyncio.sleep(options["duration"])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return [player.summary() for player in bots]
+
+
+def run_process(arguments):
+    """
+    Parameters: (load options, number of bots, seed of the first bot) tuple (arguments)
+
+    Function for running a share of the bots in a worker process.
+
+    Returns: List of bot summaries
+    """
+    return asyncio.run(run_bots(*arguments))
+
+
+def run_level(options, matches, processes):
+    """
+    Parameters: load options (options), concurrent matches to open (matches), worker processes (processes)
+
+    Function for running one load level and summarizing what the bots measured.
+
+    Returns: Dictionary of results for the level
+    """
+    clients = matches * options["players"]
+    shares = [clients // processes + (1 if i < clients % processes else 0) for i in range(processes)]
+    work = [(options, share, options["seed"] + sum(shares[:i])) for i, share in enumerate(shares) if share]
+
+    if len(work) == 1:
+        summaries = run_process(work[0])
+    else:
+        with multiprocessing.Pool(len(work)) as pool:
+            summaries = [summary for part in pool.map(run_process, work) for summary in part]
+
+    # Pool every bot's samples
+    jitter, latencies = [], []
+    tick_rates = []
+    for summary in summaries:
+        expected = summary["expected_interval"]
+        if expected:
+            jitter.extend(abs(interval - expected) for interval in summary["intervals"])
+            if summary["play_time"]:
+                tick_rates.append(summary["play_ticks"] / summary["play_time"] * expected)
+        latencies.extend(summary["latencies"])
+
+    duration = options["duration"]
+    total_bytes = sum(summary["bytes_received"] for summary in summaries)
+    return {
+        "matches": matches,
+        "clients": clients,
+        "tick_rate_ratio": statistics.median(tick_rates) if tick_rates else 0.0,
+        "jitter_p50_ms": percentile(jitter, 0.5) * 1000,
+        "jitter_p99_ms": percentile(jitter, 0.99) * 1000,
+        "latency_p50_ms": percentile(latencies, 0.5) * 1000,
+        "latency_p99_ms": percentile(latencies, 0.99) * 1000,
+        "bytes_per_client_s": total_bytes / clients / duration,
+        "bytes_total_s": total_bytes / duration,
+        "ticks": sum(len(summary["intervals"]) for summary in summaries),
+        "inputs_sent": sum(summary["inputs_sent"] for summary in summaries),
+        "inputs_lost": sum(summary["inputs_lost"] for summary in summaries),
+        "keyframe_requests": sum(summary["keyframe_requests"] for summary in summaries),
+        "datagrams": sum(summary["datagrams"] for summary in summaries),
+        "games": sum(summary["games"] for summary in summaries),
+        "errors": sum(summary["errors"] for summary in summaries)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1", help="server address")
+    parser.add_argument("--port", type=int, default=5555, help="server port")
+    parser.add_argument("--matches", type=int, nargs="+", default=[1, 5, 10, 20],
+                        help="concurrent matches of each load level, run one after another")
+    parser.add_argument("--players", type=int, default=2, help="players per match (2-4), or per arena (up to 255)")
+    parser.add_argument("--tick-rate", type=int, default=0, help="ticks per second to ask for (0: server default)")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds each load level runs")
+    parser.add_argument("--policy", choices=("random", "script"), default="random", help="how the bots steer")
+    parser.add_argument("--script", default="RIGHT,DOWN,LEFT,UP", help="directions a scripted bot cycles through")
+    parser.add_argument("--ticks-per-turn", type=int, default=5, help="ticks between a scripted bot's turns")
+    parser.add_argument("--processes", type=int, default=1, help="processes to spread the bots over")
+    parser.add_argument("--connect-interval", type=float, default=0.005, help="seconds between two bot connections")
+    parser.add_argument("--seed", type=int, default=1, help="seed of the random-walk policies")
+    parser.add_argument("--max-jitter-ms", type=float, default=0.0,
+                        help="stop stepping up once the p99 jitter exceeds this (0: run every level)")
+    parser.add_argument("--udp", action="store_true", help="ask for the game state over UDP")
+    parser.add_argument("--udp-loss", type=float, default=0.0,
+                        help="fraction of datagrams the bots drop at random in each direction")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    options = {
+        "host": args.host,
+        "port": args.port,
+        "players": args.players,
+        "tick_rate": args.tick_rate,
+        "duration": args.duration,
+        "policy": args.policy,
+        "script": args.script.split(","),
+        "ticks_per_turn": args.ticks_per_turn,
+        "connect_interval": args.connect_interval,
+        "seed": args.seed,
+        "udp": args.udp,
+        "udp_loss": args.udp_loss
+    }
+
+    print(f"{'matches':>8}{'clients':>9}{'tick rate':>10}{'jitter p50/p99 ms':>19}"
+          f"{'input p50/p99 ms':>18}{'KB/s/client':>12}{'games':>7}{'errors':>7}")
+    results = []
+    for matches in args.matches:
+        started = time.monotonic()
+        result = run_level(options, matches, max(1, args.processes))
+        result["wall_time"] = time.monotonic() - started
+        results.append(result)
+        print(f"{matches:>8}{result['clients']:>9}{result['tick_rate_ratio']:>9.0%} "
+              f"{result['jitter_p50_ms']:>8.1f} /{result['jitter_p99_ms']:>7.1f}   "
+              f"{result['latency_p50_ms']:>7.1f} /{result['latency_p99_ms']:>7.1f}"
+              f"{result['bytes_per_client_s'] / 1024:>12.2f}{result['games']:>7}{result['errors']:>7}")
+
+        if args.max_jitter_ms and result["jitter_p99_ms"] > args.max_jitter_ms:
+            print(f"p99 jitter above {args.max_jitter_ms} ms at {matches} matches, stopping")
+            break
+
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump({"options": options, "levels": results}, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
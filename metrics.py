@@ -0,0 +1,258 @@
+import bisect
+import http.server
+import threading
+
+
+"""
+Metrics the server keeps about itself: counters, gauges and histograms in a registry
+that renders them in the Prometheus text format, served over HTTP by serve().
+Metrics are always collected; recording one is a lock and an addition (plus a bisect
+for a histogram), so they can stay on in production. Modules create the metrics they
+update once, at import, with counter(), gauge() and histogram().
+Metrics with label names are families: labels(*values) returns the child for one
+combination of values (children are created on first use and kept, so callers on a hot
+path should look them up once).
+"""
+
+
+# Upper bounds of the histogram buckets for durations (seconds) and sizes (bytes)
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Counter:
+    """Total that only goes up (events, bytes)"""
+
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def samples(self):
+        return [("", (), self.value)]
+
+
+class Gauge:
+    """Value that goes up and down; with set_function it is read from a function when rendered"""
+
+    kind = "gauge"
+
+    def __init__(self):
+        self.value = 0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+
+    def set_function(self, function):
+        self.function = function
+
+    def samples(self):
+        return [("", (), self.function() if self.function is not None else self.value)]
+
+
+class Histogram:
+    """Distribution of observed values: a count per bucket, their sum and their number"""
+
+    kind = "histogram"
+
+    def __init__(self, buckets=TIME_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for listing the cumulative bucket counts, the sum and the count.
+
+        Returns: List of (name suffix, extra labels, value)
+        """
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        samples = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            samples.append(("_bucket", (("le", _format_value(bound)),), cumulative))
+        samples.append(("_sum", (), total))
+        samples.append(("_count", (), cumulative))
+        return samples
+
+
+class Family:
+    """A named metric with label names, and its children (one per combination of label values)"""
+
+    def __init__(self, name, help_text, metric_class, labelnames=(), options=None):
+        self.name = name
+        self.help_text = help_text
+        self.metric_class = metric_class
+        self.labelnames = tuple(labelnames)
+        self.options = options or {}
+        self.children = {}
+        self.lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Parameters: one value per label name (values)
+
+        Function for finding the metric of one combination of label values.
+
+        Returns: Counter, Gauge or Histogram
+        """
+        values = tuple(str(value) for value in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}")
+        with self.lock:
+            child = self.children.get(values)
+            if child is None:
+                child = self.children[values] = self.metric_class(**self.options)
+        return child
+
+    def render(self, lines):
+        """
+        Parameters: list to add the text lines to (lines)
+
+        Function for writing the family in the Prometheus text format.
+
+        Returns: NULL (Nothing)
+        """
+        lines.append(f"# HELP {self.name} {self.help_text}")
+        lines.append(f"# TYPE {self.name} {self.metric_class.kind}")
+        with self.lock:
+            children = sorted(self.children.items())
+        for values, child in children:
+            for suffix, extra_labels, value in child.samples():
+                labels = tuple(zip(self.labelnames, values)) + extra_labels
+                label_text = ",".join(f'{name}="{_escape(text)}"' for name, text in labels)
+                lines.append(f"{self.name}{suffix}{{{label_text}}} {_format_value(value)}" if labels
+                             else f"{self.name}{suffix} {_format_value(value)}")
+
+
+class Registry:
+    """Every metric of a process, by name"""
+
+    def __init__(self):
+        self.families = {}
+        self.lock = threading.Lock()
+
+    def _add(self, name, help_text, metric_class, labelnames, options=None):
+        """
+        Parameters: metric name (name), description (help_text), Counter, Gauge or Histogram (metric_class),
+                    label names (labelnames), arguments of the metric class (options)
+
+        Function for registering a metric.
+
+        Returns: The metric itself without label names, its Family otherwise
+        """
+        family = Family(name, help_text, metric_class, labelnames, options)
+        with self.lock:
+            if name in self.families:
+                raise ValueError(f"Metric {name} already registered")
+            self.families[name] = family
+        return family if labelnames else family.labels()
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._add(name, help_text, Counter, labelnames)
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._add(name, help_text, Gauge, labelnames)
+
+    def histogram(self, name, help_text, buckets=TIME_BUCKETS, labelnames=()):
+        return self._add(name, help_text, Histogram, labelnames, {"buckets": buckets})
+
+    def render(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for writing every metric in the Prometheus text format.
+
+        Returns: String
+        """
+        lines = []
+        with self.lock:
+            families = list(self.families.values())
+        for family in families:
+            family.render(lines)
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value):
+    """
+    Parameters: number or "+Inf" (value)
+
+    Function for writing a sample value the way Prometheus reads it.
+
+    Returns: String
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# Registry of this process and shortcuts to register metrics in it
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def serve(host, port, registry=REGISTRY):
+    """
+    Parameters: address to listen on (host, port), metrics to expose (registry)
+
+    Function for serving the metrics at http://host:port/metrics from a thread of its own.
+
+    Returns: The HTTP server
+    """
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        # Scrapes are not worth a line of output each
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
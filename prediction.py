@@ -0,0 +1,229 @@
+import threading
+import time
+import engine
+
+
+"""
+Client-side smoothing of the authoritative game state, so the client can draw at the
+display's frame rate instead of the server's tick rate.
+Other snakes are interpolated between the last two snapshots the server sent (they are
+drawn up to one tick in the past). The local snake is predicted: it moves towards the
+cell the server's movement rules (engine.next_head) will put it in on the next tick,
+using the direction the player pressed rather than waiting for the server to echo it.
+The server applies queued turns one per tick and acknowledges each input it processed,
+so the prediction steers with the oldest turn not acknowledged yet. When the next
+snapshot disagrees with the prediction the snapshot wins.
+"""
+
+
+# Inputs the server still has not applied after this many seconds stop steering the prediction
+INPUT_TIMEOUT = 1.0
+
+
+def interpolate_body(previous, current, alpha):
+    """
+    Parameters: body at the previous tick (previous), body at the current tick (current),
+                fraction of the way from previous to current, 0 to 1 (alpha)
+
+    Function for blending two bodies of the same snake one tick apart. Segment i slides
+    from its old cell to its new one; a segment that did not exist before (growth) stays put.
+
+    Returns: List of [x, y] segments (floats)
+    """
+    blended = []
+    for i, (x, y) in enumerate(current):
+        if i < len(previous):
+            old_x, old_y = previous[i]
+            blended.append([old_x + (x - old_x) * alpha, old_y + (y - old_y) * alpha])
+        else:
+            blended.append([x, y])
+    return blended
+
+
+def is_one_move(previous, current):
+    """
+    Parameters: body at the previous tick (previous), body at the current tick (current)
+
+    Function for checking that a body changed by at most one move, so blending the two
+    looks like motion (a keyframe after a gap or a respawn should snap instead).
+
+    Returns: Boolean
+    """
+    if not previous or not current:
+        return False
+    distance = abs(current[0][0] - previous[0][0]) + abs(current[0][1] - previous[0][1])
+    return distance <= engine.SPACE_SIZE
+
+
+def predict_body(body, direction, food):
+    """
+    Parameters: current body (body), direction the snake will move in (direction), food position (food)
+
+    Function for moving a body one tick ahead with the server's movement rules:
+    the head moves one cell and the tail follows unless the new head eats the food.
+
+    Returns: List of [x, y] segments
+    """
+    head_x, head_y = engine.next_head(body[0][0], body[0][1], direction)
+    grows = food is not None and head_x == food[0] and head_y == food[1]
+    return [[head_x, head_y]] + (body if grows else body[:-1])
+
+
+class ClientView:
+    """
+    What the client draws: the authoritative snapshots it received, interpolated for the
+    other snakes and predicted for its own. The network thread calls push() and the render
+    loop calls sample(), so all state is guarded by a lock.
+    """
+
+    def __init__(self, tick_rate=10, player_key=None):
+        self.lock = threading.Lock()
+        self.player_key = player_key
+        self.set_tick_rate(tick_rate)
+
+        # (tick, game state, arrival time) of the last two authoritative states
+        self.previous = None
+        self.current = None
+
+        # Direction changes sent to the server and not acknowledged yet: [sequence number, direction, time sent]
+        self.pending = []
+
+        # Where the prediction put the local head for the next tick, and how often it was wrong
+        self.predicted_head = None
+        self.predictions = 0
+        self.mispredictions = 0
+
+    def set_tick_rate(self, tick_rate):
+        """
+        Parameters: ticks per second of the match (tick_rate)
+
+        Function for setting how long the interpolation between two snapshots lasts.
+
+        Returns: NULL (Nothing)
+        """
+        self.interval = 1 / tick_rate if tick_rate else 0.1
+
+    def push(self, tick, game_state, now=None):
+        """
+        Parameters: tick of the state (tick), authoritative game state (game_state),
+                    time it arrived, None to read the clock (now)
+
+        Function for adding a state received from the server and reconciling the prediction with it.
+
+        Returns: NULL (Nothing)
+        """
+        if now is None:
+            now = time.monotonic()
+
+        with self.lock:
+
+            # A resent state for the same tick replaces the current one
+            if self.current is not None and self.current[0] == tick:
+                self.current = (tick, game_state, self.current[2])
+            else:
+                self.previous = self.current
+                self.current = (tick, game_state, now)
+
+            snake = game_state["players"].get(self.player_key)
+            if snake is None:
+                self.pending.clear()
+                self.predicted_head = None
+                return
+
+            # Compare the authoritative head with the head we predicted for this tick
+            head = tuple(snake["body"][0])
+            if self.predicted_head is not None:
+                self.predictions += 1
+                if head != self.predicted_head:
+                    self.mispredictions += 1
+
+            # Inputs up to the one the server acknowledged have been processed
+            ack = snake.get("ack", 0)
+            self.pending = [entry for entry in self.pending if entry[0] > ack and now - entry[2] < INPUT_TIMEOUT]
+
+            self.predicted_head = tuple(engine.next_head(head[0], head[1], self._next_direction(snake)))
+
+    def add_input(self, direction, seq, now=None):
+        """
+        Parameters: direction the player just sent (direction), sequence number it was sent with (seq),
+                    time it was sent, None to read the clock (now)
+
+        Function for steering the local prediction before the server confirms the turn.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            self.pending.append([seq, direction, time.monotonic() if now is None else now])
+
+            snake = self.current and self.current[1]["players"].get(self.player_key)
+            if snake is not None:
+                head = snake["body"][0]
+                self.predicted_head = tuple(engine.next_head(head[0], head[1], self._next_direction(snake)))
+
+    def _next_direction(self, snake):
+        """
+        Parameters: authoritative local snake (snake)
+
+        Function for finding the direction the local snake is predicted to move in on the next tick
+        (the server applies one queued turn per tick, oldest first).
+
+        Returns: Direction name
+        """
+        return self.pending[0][1] if self.pending else snake["direction"]
+
+    def direction(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for reading the direction the local snake ends up in once every turn
+        sent has been applied (the one a new turn is checked against).
+
+        Returns: Direction name, or None before the snake exists
+        """
+        with self.lock:
+            snake = self.current and self.current[1]["players"].get(self.player_key)
+            if snake is None:
+                return None
+            return self.pending[-1][1] if self.pending else snake["direction"]
+
+    def sample(self, now=None):
+        """
+        Parameters: time of the frame being drawn, None to read the clock (now)
+
+        Function for building the state to draw this frame.
+        Only the "players" entry is replaced; everything else is the latest server state.
+
+        Returns: Game state dictionary, or None before the first snapshot
+        """
+        if now is None:
+            now = time.monotonic()
+
+        with self.lock:
+            if self.current is None:
+                return None
+
+            _, game_state, arrived = self.current
+            if not game_state.get("game_started") or game_state.get("game_over"):
+                return game_state
+
+            alpha = min(1.0, max(0.0, (now - arrived) / self.interval))
+            previous_players = self.previous[1]["players"] if self.previous is not None else {}
+            players = {}
+
+            for player_key, player_data in game_state["players"].items():
+                body = player_data["body"]
+
+                # Local snake: from where the server has it towards the predicted next cell
+                if player_key == self.player_key:
+                    predicted = predict_body(body, self._next_direction(player_data), game_state.get("food"))
+                    body = interpolate_body(body, predicted, alpha)
+
+                # Other snakes: between the last two server states
+                else:
+                    old_body = previous_players.get(player_key, {}).get("body")
+                    if is_one_move(old_body, body):
+                        body = interpolate_body(old_body, body, alpha)
+
+                players[player_key] = dict(player_data, body=body)
+
+        return dict(game_state, players=players)
@@ -0,0 +1,151 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import metrics
+
+
+"""
+Profiling of the server's tick, for finding where a sluggish match spends its time.
+The coarse phases of every tick (simulate, encode, send) always go to the
+snake_tick_phase_seconds histogram. Finer phase timing is off by default. Turned on,
+the simulation is split into the steps below (engine.update_game times its own), they
+are added to the same histogram and ticks slower than a threshold are printed with
+their breakdown. Turned off, the hooks cost one check of a module variable per tick
+and one of an argument per snake.
+A capture runs cProfile over the next ticks of every room and writes the pstats dump
+to a file while the server keeps running; operators trigger it with SIGUSR1 (see server.py).
+The finished capture is written and summarized by a thread of its own, so no tick waits on it.
+"""
+
+
+# Phases of a tick of play, in order ("move" to "remove" are engine.update_game's own)
+PHASES = ("lock_wait", "inputs", "move", "collision", "food", "remove", "encode", "send")
+
+# Phases only timed while phase timing is on (the others are always measured)
+FINE_PHASES = ("inputs", "move", "collision", "food", "remove")
+
+# Whether ticks are timed by phase, and the tick time above which a tick is printed (0: never)
+phase_timing = False
+slow_tick_seconds = 0.0
+
+# Time per phase of a tick (children are created on first use, so fine phases only show once timed)
+PHASE_SECONDS = metrics.histogram("snake_tick_phase_seconds",
+                                  "Time spent in each phase of a tick of play", labelnames=("phase",))
+
+
+def configure(phases=False, slow_tick_ms=0.0):
+    """
+    Parameters: whether to time every tick by phase (phases),
+                tick time in milliseconds above which a tick is printed, 0 for never (slow_tick_ms)
+
+    Function for turning the phase hooks on or off (logging slow ticks needs them on).
+
+    Returns: NULL (Nothing)
+    """
+    global phase_timing, slow_tick_seconds
+    slow_tick_seconds = slow_tick_ms / 1000
+    phase_timing = bool(phases or slow_tick_seconds)
+
+
+def finish_tick(room, timings, total):
+    """
+    Parameters: room that played the tick (room), seconds spent in each phase (timings),
+                seconds the whole tick took (total)
+
+    Function for recording the fine phases of a timed tick and printing it if it was slow.
+
+    Returns: NULL (Nothing)
+    """
+    for phase in FINE_PHASES:
+        if phase in timings:
+            PHASE_SECONDS.labels(phase).observe(timings[phase])
+
+    if slow_tick_seconds and total >= slow_tick_seconds:
+        breakdown = ", ".join(f"{phase} {timings[phase] * 1000:.2f}" for phase in PHASES if phase in timings)
+        print(f"Room {room.room_id}: slow tick {room.tick} took {total * 1000:.1f} ms ({breakdown} ms)")
+
+
+class Capture:
+    """
+    cProfile run over the next ticks of every room. A single profiler serves all rooms,
+    so while a capture runs the ticks of different rooms take turns.
+    """
+
+    def __init__(self, directory="."):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.profile = None
+        self.ticks_left = 0
+        self.ticks = 0
+
+    def request(self, ticks):
+        """
+        Parameters: number of ticks to profile (ticks)
+
+        Function for starting a capture with the next tick (safe to call from a signal handler:
+        it only sets two attributes).
+
+        Returns: NULL (Nothing)
+        """
+        self.ticks = ticks
+        self.ticks_left = ticks
+
+    def run(self, function, *args):
+        """
+        Parameters: function playing one tick (function) and its arguments (args)
+
+        Function for calling function under the profiler while a capture runs,
+        and handing the capture to a writer thread once its last tick is done.
+
+        Returns: What function returned
+        """
+        if not self.ticks_left:
+            return function(*args)
+
+        with self.lock:
+
+            # Another room may have played the last tick while this one waited
+            if self.ticks_left:
+                if self.profile is None:
+                    print(f"Profiling the next {self.ticks} ticks...")
+                    self.profile = cProfile.Profile()
+                self.profile.enable()
+                try:
+                    return function(*args)
+                finally:
+                    self.profile.disable()
+                    self.ticks_left -= 1
+                    if self.ticks_left <= 0:
+                        self.ticks_left = 0
+                        profile, self.profile = self.profile, None
+                        threading.Thread(target=self._write, args=(profile, self.ticks), daemon=True).start()
+
+        return function(*args)
+
+    def _write(self, profile, ticks):
+        """
+        Parameters: finished profiler (profile), ticks it covers (ticks)
+
+        Function for saving a finished capture and printing its top entries (outside any tick).
+
+        Returns: NULL (Nothing)
+        """
+        path = os.path.join(self.directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.pstats")
+        try:
+            profile.dump_stats(path)
+        except OSError as e:
+            print(f"Could not save the profile: {e}")
+            path = None
+
+        summary = io.StringIO()
+        pstats.Stats(profile, stream=summary).sort_stats("cumulative").print_stats(15)
+        print(summary.getvalue())
+        if path is not None:
+            print(f"Profile of {ticks} ticks saved to {path} (python -m pstats {path})")
+
+
+# Capture of this process (server.py sets its directory)
+capture = Capture()
@@ -0,0 +1,797 @@
+import struct
+import sys
+from array import array
+
+
+"""
+Wire protocol shared by the server and the clients.
+Every message is a length-prefixed binary frame: a fixed header carrying the
+payload length, the protocol version and the message type, followed by a
+struct-packed payload. Frames can be split or coalesced by TCP, so receivers
+feed raw socket bytes into a StreamDecoder which yields whole messages only.
+Inputs carry a sequence number and the tick they are meant for; every snake in a
+snapshot or delta carries the sequence number of its player's last processed input.
+Players that opt into UDP get the per-tick state in datagrams instead: each carries a
+sequence number, the newest tick and the frames of the last few ticks, and their own
+datagrams repeat their last few inputs, so one lost datagram loses nothing.
+In a room with a view radius a player's frames only hold the snakes near its own (see
+interest.py): a snake entering the view arrives as a full body in a delta and one
+leaving it is listed as removed, like a snake that joined or died.
+"""
+
+
+# Protocol version (bumped on any incompatible change to the frame layout)
+PROTOCOL_VERSION = 7
+
+# Message types
+MSG_HELLO = 1
+MSG_INPUT = 2
+MSG_SNAPSHOT = 3
+MSG_COUNTDOWN = 4
+MSG_GAME_OVER = 5
+MSG_DELTA = 6
+MSG_KEYFRAME_REQUEST = 7
+MSG_JOIN = 8
+MSG_ERROR = 9
+MSG_UDP_OFFER = 10
+
+# Game state messages: a newer one (or a keyframe) replaces one that was never sent
+STATE_MESSAGES = (MSG_SNAPSHOT, MSG_DELTA)
+
+# Room number a client sends to be matched into any open room
+ANY_ROOM = 0xFFFF
+
+# Player number sent to spectators (never a real player)
+SPECTATOR_ID = 0xFFFF
+
+# Flags of a join request
+JOIN_CREATE = 1
+JOIN_SPECTATE = 2
+JOIN_UDP = 4
+
+# Inputs repeated in every datagram a client sends
+REDUNDANT_INPUTS = 4
+
+# Largest datagram payload sent (bigger state goes over TCP)
+MAX_DATAGRAM_SIZE = 60000
+
+# Refuse frames larger than this (a corrupt length would otherwise make us buffer forever)
+MAX_FRAME_SIZE = 1 << 22
+
+# A full snapshot is sent every KEYFRAME_INTERVAL ticks, deltas in between
+KEYFRAME_INTERVAL = 50
+
+# Longest head run a delta describes before falling back to a full body
+MAX_DELTA_HEADS = 4
+
+# Directions travel as a single byte
+DIRECTIONS = ("UP", "DOWN", "LEFT", "RIGHT")
+DIRECTION_CODES = {name: code for code, name in enumerate(DIRECTIONS)}
+
+# Snapshot flags
+FLAG_COUNTDOWN = 1
+FLAG_STARTED = 2
+FLAG_GAME_OVER = 4
+FLAG_TIE = 8
+FLAG_WINNER = 16
+FLAG_FOOD = 32
+
+# Body encodings inside a delta
+BODY_DELTA = 0
+BODY_FULL = 1
+
+# Struct layouts (little-endian so coordinate arrays can be copied without byte swapping)
+FRAME_HEADER = struct.Struct("<IBB")
+HELLO = struct.Struct("<HBHBHHH")
+JOIN = struct.Struct("<HBBB")
+INPUT = struct.Struct("<HBII")
+SNAPSHOT_HEADER = struct.Struct("<IBBHhhHH")
+PLAYER_HEADER = struct.Struct("<HBII")
+SCORE = struct.Struct("<HI")
+DELTA_HEADER = struct.Struct("<IIBBHhhHHHH")
+DELTA_PLAYER = struct.Struct("<HBBHII")
+KEYFRAME_REQUEST = struct.Struct("<I")
+COUNTDOWN = struct.Struct("<B")
+GAME_OVER = struct.Struct("<BH")
+UDP_OFFER = struct.Struct("<HQ")
+DATAGRAM_HEADER = struct.Struct("<BII")
+CLIENT_DATAGRAM_HEADER = struct.Struct("<BQB")
+DATAGRAM_INPUT = struct.Struct("<IBI")
+
+# Coordinates are signed 16-bit pixels
+COORD_TYPE = "h"
+ID_TYPE = "H"
+_SWAP = sys.byteorder != "little"
+
+
+class ProtocolError(Exception):
+    """Raised when a peer sends a frame that cannot be decoded"""
+
+
+def _frame(msg_type, payload):
+    """
+    Parameters: message type (msg_type), packed message body (payload)
+
+    Function for wrapping a payload into a length-prefixed frame.
+
+    Returns: Bytes ready to be written to a socket
+    """
+    return FRAME_HEADER.pack(len(payload), PROTOCOL_VERSION, msg_type) + payload
+
+
+def control_frames(data):
+    """
+    Parameters: whole frames as queued for a client (data)
+
+    Function for keeping only the frames that are not game state (countdown, result, errors, ...),
+    for a client whose state frames are being dropped.
+
+    Returns: Bytes of the remaining frames
+    """
+    kept = []
+    offset = 0
+    while offset < len(data):
+        length, _, msg_type = FRAME_HEADER.unpack_from(data, offset)
+        end = offset + FRAME_HEADER.size + length
+        if msg_type not in STATE_MESSAGES:
+            kept.append(data[offset:end])
+        offset = end
+    return b"".join(kept)
+
+
+def _pack_snake(snake, count=None):
+    """
+    Parameters: server Snake (snake), number of segments from the head, None for all (count)
+
+    Function for packing a snake's segments straight from its coordinate buffer.
+
+    Returns: Bytes holding x0, y0, x1, y1, ...
+    """
+    coords = snake.coords(count)
+    if _SWAP:
+        coords.byteswap()
+    return coords.tobytes()
+
+
+def _unpack_coords(data, offset, count):
+    """
+    Parameters: frame payload (data), start of the coordinates (offset), number of segments (count)
+
+    Function for rebuilding a snake body from a packed coordinate array.
+
+    Returns: List of [x, y] segments, offset just past the coordinates
+    """
+    end = offset + count * 4
+    coords = array(COORD_TYPE)
+    coords.frombytes(data[offset:end])
+    if _SWAP:
+        coords.byteswap()
+    values = iter(coords.tolist())
+    return list(map(list, zip(values, values))), end
+
+
+def encode_hello(player_id, max_players, room_id=0, tick_rate=0, columns=0, rows=0, view_radius=0):
+    """
+    Parameters: player number (player_id), players needed to start (max_players), room joined (room_id),
+                ticks per second of the room's match (tick_rate), board size in cells (columns, rows),
+                radius in cells of the area players are sent, 0 for the whole board (view_radius)
+
+    Function for building the first message a client receives after joining a room.
+
+    Returns: Encoded frame
+    """
+    return _frame(MSG_HELLO, HELLO.pack(player_id, max_players, room_id, tick_rate, columns, rows,
+                                         view_radius))
+
+
+def encode_join(room_id=None, max_players=0, create=False, tick_rate=0, spectate=False, udp=False):
+    """
+    Parameters: room to join or None for any open room (room_id), 
+                preferred room size or 0 for the server default (max_players), 
+                whether to open a new room instead of joining one (create),
+                preferred ticks per second or 0 for the server default (tick_rate),
+                whether to watch the room instead of playing (spectate),
+                whether to receive the game state over UDP if the server offers it (udp)
+
+    Function for building the first message a client sends after connecting.
+
+    Returns: Encoded frame
+    """
+    flags = (JOIN_CREATE if create else 0) | (JOIN_SPECTATE if spectate else 0) | (JOIN_UDP if udp else 0)
+    return _frame(MSG_JOIN, JOIN.pack(ANY_ROOM if room_id is None else room_id, max_players, flags, tick_rate))
+
+
+def encode_error(reason):
+    """
+    Parameters: human readable reason (reason)
+
+    Function for building the message sent before the server closes a connection it refused.
+
+    Returns: Encoded frame
+    """
+    return _frame(MSG_ERROR, reason.encode("utf-8"))
+
+
+def encode_input(player_id, direction, seq=0, tick=0):
+    """
+    Parameters: player number (player_id), new direction name (direction),
+                sequence number of the input, counting from 1 (seq),
+                tick the turn is meant for, 0 for as soon as possible (tick)
+
+    Function for building a direction change sent from client to server.
+
+    Returns: Encoded frame
+    """
+    return _frame(MSG_INPUT, INPUT.pack(player_id, DIRECTION_CODES[direction], seq, tick))
+
+
+def encode_countdown(countdown_value):
+    """
+    Parameters: seconds left before the game starts (countdown_value)
+
+    Function for building a countdown tick message.
+
+    Returns: Encoded frame
+    """
+    return _frame(MSG_COUNTDOWN, COUNTDOWN.pack(countdown_value))
+
+
+def encode_game_over(winner=None):
+    """
+    Parameters: winning player key, or None for a tie (winner)
+
+    Function for building the end-of-game message.
+
+    Returns: Encoded frame
+    """
+    if winner is None:
+        return _frame(MSG_GAME_OVER, GAME_OVER.pack(1, 0))
+    return _frame(MSG_GAME_OVER, GAME_OVER.pack(0, int(winner)))
+
+
+def _pack_ids(ids):
+    """
+    Parameters: player keys (ids)
+
+    Function for packing a list of player keys as 16-bit integers.
+
+    Returns: Packed bytes
+    """
+    packed = array(ID_TYPE, map(int, ids))
+    if _SWAP:
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _unpack_ids(data, offset, count):
+    """
+    Parameters: frame payload (data), start of the ids (offset), number of ids (count)
+
+    Function for reading a list of player keys packed by _pack_ids.
+
+    Returns: List of player keys, offset just past the ids
+    """
+    end = offset + count * 2
+    ids = array(ID_TYPE)
+    ids.frombytes(data[offset:end])
+    if _SWAP:
+        ids.byteswap()
+    return [str(player_id) for player_id in ids], end
+
+
+def _status_fields(game_state):
+    """
+    Parameters: server game state dictionary (game_state)
+
+    Function for collecting the match status carried in every snapshot and delta.
+
+    Returns: Flags, countdown value, winner number, food x, food y
+    """
+
+    # Game flags
+    flags = 0
+    if game_state.get("countdown"):
+        flags |= FLAG_COUNTDOWN
+    if game_state.get("game_started"):
+        flags |= FLAG_STARTED
+    if game_state.get("game_over"):
+        flags |= FLAG_GAME_OVER
+    if game_state.get("tie"):
+        flags |= FLAG_TIE
+
+    winner = game_state.get("winner")
+    if winner is not None:
+        flags |= FLAG_WINNER
+
+    food = game_state.get("food")
+    if food is not None:
+        flags |= FLAG_FOOD
+        food_x, food_y = food
+    else:
+        food_x = food_y = 0
+
+    return flags, game_state.get("countdown_value", 0), int(winner) if winner is not None else 0, food_x, food_y
+
+
+def _apply_status(game_state, flags, countdown_value, winner, food_x, food_y):
+    """
+    Parameters: client game state dictionary (game_state), fields written by _status_fields
+
+    Function for writing a decoded match status into a game state dictionary.
+
+    Returns: NULL (Nothing)
+    """
+    game_state["food"] = [food_x, food_y] if flags & FLAG_FOOD else None
+    game_state["game_over"] = bool(flags & FLAG_GAME_OVER)
+    game_state["countdown"] = bool(flags & FLAG_COUNTDOWN)
+    game_state["countdown_value"] = countdown_value
+    game_state["game_started"] = bool(flags & FLAG_STARTED)
+
+    if flags & FLAG_TIE:
+        game_state["tie"] = True
+    if flags & FLAG_WINNER:
+        game_state["winner"] = str(winner)
+
+
+def encode_snapshot(game_state, tick=0):
+    """
+    Parameters: server game state dictionary (game_state), tick number of the state (tick)
+
+    Function for serializing the full game state (every snake, the food, scores and flags).
+    Players are the server's engine.Snake objects.
+
+    Returns: Encoded frame
+    """
+    players = game_state["players"]
+    scores = game_state["scores"]
+    parts = [SNAPSHOT_HEADER.pack(tick, *_status_fields(game_state), len(players), len(scores))]
+
+    # Snakes
+    for player_id, snake in players.items():
+        parts.append(PLAYER_HEADER.pack(int(player_id), DIRECTION_CODES[snake.direction], len(snake),
+                                        snake.last_input))
+        parts.append(_pack_snake(snake))
+
+    # Scores (kept separately because dead snakes keep their score)
+    for player_id, score in scores.items():
+        parts.append(SCORE.pack(int(player_id), score))
+
+    return _frame(MSG_SNAPSHOT, b"".join(parts))
+
+
+def decode_snapshot(data):
+    """
+    Parameters: snapshot payload (data)
+
+    Function for rebuilding a game state dictionary from a snapshot payload.
+    The result has the server's game_state layout, with every snake as a dictionary
+    holding "body" (list of [x, y] segments), "direction" and "ack" (last input processed).
+
+    Returns: Tick number, game state dictionary
+    """
+    tick, flags, countdown_value, winner, food_x, food_y, player_count, score_count = \
+        SNAPSHOT_HEADER.unpack_from(data, 0)
+    offset = SNAPSHOT_HEADER.size
+
+    game_state = {"players": {}, "scores": {}}
+    _apply_status(game_state, flags, countdown_value, winner, food_x, food_y)
+
+    # Snakes
+    for _ in range(player_count):
+        player_id, direction, length, ack = PLAYER_HEADER.unpack_from(data, offset)
+        body, offset = _unpack_coords(data, offset + PLAYER_HEADER.size, length)
+        game_state["players"][str(player_id)] = {
+            "body": body,
+            "direction": DIRECTIONS[direction],
+            "ack": ack
+        }
+
+    # Scores
+    for _ in range(score_count):
+        player_id, score = SCORE.unpack_from(data, offset)
+        offset += SCORE.size
+        game_state["scores"][str(player_id)] = score
+
+    return tick, game_state
+
+
+class SnapshotEncoder:
+    """
+    Server-side encoder that turns each tick's game state into a keyframe or a delta.
+    A delta only describes what changed since the previous tick: new head cells, the
+    number of tail cells popped, direction, input ack and score changes, removed snakes
+    and the match status. Keyframes are sent every keyframe_interval ticks and on request.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.last_tick = None
+        self.last_keyframe_tick = None
+        self.last_players = {}
+        self.last_scores = {}
+
+    def _remember(self, game_state, tick):
+        """
+        Parameters: server game state dictionary (game_state), tick number of the state (tick)
+
+        Function for storing what the next delta is computed against.
+        Only the head, length, direction and input ack of each snake are needed, and the
+        Snake itself: a new snake under a reused player number is always sent in full.
+
+        Returns: NULL (Nothing)
+        """
+        self.last_tick = tick
+        self.last_players = {
+            player_id: (snake, snake.head(), len(snake), snake.direction, snake.last_input)
+            for player_id, snake in game_state["players"].items()
+        }
+        self.last_scores = dict(game_state["scores"])
+
+    def keyframe(self, game_state, tick):
+        """
+        Parameters: server game state dictionary (game_state), tick number of the state (tick)
+
+        Function for encoding a full snapshot without changing the delta baseline.
+        Used to resynchronize a single client that reported a gap.
+
+        Returns: Encoded frame
+        """
+        return encode_snapshot(game_state, tick)
+
+    def encode(self, game_state, tick, force_keyframe=False):
+        """
+        Parameters: server game state dictionary (game_state), tick number of the state (tick), 
+                    whether a keyframe must be sent (force_keyframe)
+
+        Function for encoding the state broadcast for this tick.
+
+        Returns: Encoded frame, Boolean of whether the frame is a keyframe
+        """
+        if (force_keyframe or self.last_tick is None or
+                tick - self.last_keyframe_tick >= self.keyframe_interval):
+            frame = encode_snapshot(game_state, tick)
+            self.last_keyframe_tick = tick
+            self._remember(game_state, tick)
+            return frame, True
+
+        frame = self._encode_delta(game_state, tick)
+        self._remember(game_state, tick)
+        return frame, False
+
+    def _encode_delta(self, game_state, tick):
+        """
+        Parameters: server game state dictionary (game_state), tick number of the state (tick)
+
+        Function for encoding the changes between the remembered state and this one.
+
+        Returns: Encoded frame
+        """
+        players = game_state["players"]
+        scores = game_state["scores"]
+        last_players = self.last_players
+        last_scores = self.last_scores
+        parts = []
+        player_count = 0
+
+        # Snakes that moved, turned, grew or appeared
+        for player_id, snake in players.items():
+            length = len(snake)
+            direction = snake.direction
+            ack = snake.last_input
+            previous = last_players.get(player_id)
+            heads = -1
+
+            # Find the old head in the new body: everything in front of it is new
+            if previous is not None and previous[0] is snake:
+                _, old_head, old_length, old_direction, old_ack = previous
+                for i in range(min(length, MAX_DELTA_HEADS + 1)):
+                    if snake.segment(i) == old_head:
+                        heads = i
+                        break
+
+            if heads >= 0:
+                pops = old_length + heads - length
+
+            # Unknown snake or a body we cannot describe incrementally
+            if heads < 0 or not 0 <= pops <= old_length:
+                parts.append(DELTA_PLAYER.pack(int(player_id), DIRECTION_CODES[direction], BODY_FULL, 0, length, ack))
+                parts.append(_pack_snake(snake))
+
+            # Nothing changed for this snake
+            elif heads == 0 and pops == 0 and direction == old_direction and ack == old_ack:
+                continue
+
+            else:
+                parts.append(DELTA_PLAYER.pack(int(player_id), DIRECTION_CODES[direction], BODY_DELTA, pops, heads,
+                                               ack))
+                parts.append(_pack_snake(snake, heads))
+
+            player_count += 1
+
+        # Dead or disconnected snakes
+        removed_players = [player_id for player_id in last_players if player_id not in players]
+        parts.append(_pack_ids(removed_players))
+
+        # Changed scores
+        changed_scores = [(player_id, score) for player_id, score in scores.items()
+                          if last_scores.get(player_id) != score]
+        for player_id, score in changed_scores:
+            parts.append(SCORE.pack(int(player_id), score))
+
+        removed_scores = [player_id for player_id in last_scores if player_id not in scores]
+        parts.append(_pack_ids(removed_scores))
+
+        header = DELTA_HEADER.pack(tick, self.last_tick, *_status_fields(game_state), player_count,
+                                   len(removed_players), len(changed_scores), len(removed_scores))
+        return _frame(MSG_DELTA, header + b"".join(parts))
+
+
+def decode_delta(data):
+    """
+    Parameters: delta payload (data)
+
+    Function for parsing a delta into a structure apply_delta understands.
+
+    Returns: Tick number, tick the delta is based on, delta dictionary
+    """
+    (tick, base_tick, flags, countdown_value, winner, food_x, food_y,
+     player_count, removed_player_count, score_count, removed_score_count) = DELTA_HEADER.unpack_from(data, 0)
+    offset = DELTA_HEADER.size
+
+    # Snake changes
+    players = []
+    for _ in range(player_count):
+        player_id, direction, kind, pops, count, ack = DELTA_PLAYER.unpack_from(data, offset)
+        cells, offset = _unpack_coords(data, offset + DELTA_PLAYER.size, count)
+        players.append((str(player_id), DIRECTIONS[direction], kind, pops, cells, ack))
+
+    removed_players, offset = _unpack_ids(data, offset, removed_player_count)
+
+    # Score changes
+    scores = []
+    for _ in range(score_count):
+        player_id, score = SCORE.unpack_from(data, offset)
+        offset += SCORE.size
+        scores.append((str(player_id), score))
+
+    removed_scores, offset = _unpack_ids(data, offset, removed_score_count)
+
+    delta = {
+        "status": (flags, countdown_value, winner, food_x, food_y),
+        "players": players,
+        "removed_players": removed_players,
+        "scores": scores,
+        "removed_scores": removed_scores
+    }
+    return tick, base_tick, delta
+
+
+def apply_delta(game_state, delta):
+    """
+    Parameters: client game state dictionary at the delta's base tick (game_state), decoded delta (delta)
+
+    Function for advancing a game state by one delta.
+    A new dictionary is returned (changed bodies are rebuilt, untouched ones shared) so a
+    renderer reading the old state from another thread never sees a half-applied update.
+
+    Returns: Updated game state dictionary
+    """
+    players = dict(game_state["players"])
+    scores = dict(game_state["scores"])
+
+    # Snake changes
+    for player_id, direction, kind, pops, cells, ack in delta["players"]:
+        if kind == BODY_FULL:
+            body = cells
+        else:
+            old_body = players[player_id]["body"]
+            body = cells + old_body[:len(old_body) - pops]
+        players[player_id] = {"body": body, "direction": direction, "ack": ack}
+
+    for player_id in delta["removed_players"]:
+        players.pop(player_id, None)
+
+    # Score changes
+    for player_id, score in delta["scores"]:
+        scores[player_id] = score
+
+    for player_id in delta["removed_scores"]:
+        scores.pop(player_id, None)
+
+    new_state = {"players": players, "scores": scores}
+    _apply_status(new_state, *delta["status"])
+    return new_state
+
+
+def encode_keyframe_request(tick):
+    """
+    Parameters: last tick the client applied (tick)
+
+    Function for asking the server for a full snapshot after a gap in the delta stream.
+
+    Returns: Encoded frame
+    """
+    return _frame(MSG_KEYFRAME_REQUEST, KEYFRAME_REQUEST.pack(tick))
+
+
+def encode_udp_offer(port, token):
+    """
+    Parameters: UDP port of the server (port), number identifying the player's datagrams (token)
+
+    Function for building the message that invites a player to switch the game state to UDP.
+
+    Returns: Encoded frame
+    """
+    return _frame(MSG_UDP_OFFER, UDP_OFFER.pack(port, token))
+
+
+def encode_datagram(seq, tick, frames=b""):
+    """
+    Parameters: sequence number of the datagram (seq), newest tick it carries (tick),
+                encoded frames (frames)
+
+    Function for building a server datagram.
+
+    Returns: Datagram bytes
+    """
+    return DATAGRAM_HEADER.pack(PROTOCOL_VERSION, seq, tick) + frames
+
+
+def decode_datagram(data):
+    """
+    Parameters: datagram received from the server (data)
+
+    Function for reading a server datagram.
+
+    Returns: Sequence number, newest tick, list of (message type, decoded message) tuples
+    """
+    try:
+        version, seq, tick = DATAGRAM_HEADER.unpack_from(data)
+    except struct.error as e:
+        raise ProtocolError(f"Malformed datagram: {e}")
+    if version != PROTOCOL_VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+
+    decoder = StreamDecoder()
+    messages = decoder.feed(data[DATAGRAM_HEADER.size:])
+    if decoder.buffer:
+        raise ProtocolError("Truncated frame in datagram")
+    return seq, tick, messages
+
+
+def encode_client_datagram(token, inputs=()):
+    """
+    Parameters: token from the server's UDP offer (token),
+                (input sequence number, direction, tick it is meant for) of the latest inputs, oldest first (inputs)
+
+    Function for building a client datagram. One without inputs registers the client's address.
+
+    Returns: Datagram bytes
+    """
+    inputs = list(inputs)[-REDUNDANT_INPUTS:]
+    parts = [CLIENT_DATAGRAM_HEADER.pack(PROTOCOL_VERSION, token, len(inputs))]
+    parts.extend(DATAGRAM_INPUT.pack(seq, DIRECTION_CODES[direction], tick) for seq, direction, tick in inputs)
+    return b"".join(parts)
+
+
+def decode_client_datagram(data):
+    """
+    Parameters: datagram received from a client (data)
+
+    Function for reading a client datagram.
+
+    Returns: Token, list of (input sequence number, direction, tick it is meant for)
+    """
+    try:
+        version, token, count = CLIENT_DATAGRAM_HEADER.unpack_from(data)
+        if version != PROTOCOL_VERSION:
+            raise ProtocolError(f"Unsupported protocol version {version}")
+        inputs = []
+        for i in range(count):
+            seq, direction, tick = DATAGRAM_INPUT.unpack_from(data, CLIENT_DATAGRAM_HEADER.size + i * DATAGRAM_INPUT.size)
+            inputs.append((seq, DIRECTIONS[direction], tick))
+    except (struct.error, IndexError) as e:
+        raise ProtocolError(f"Malformed datagram: {e}")
+    return token, inputs
+
+
+def decode_message(msg_type, data):
+    """
+    Parameters: message type (msg_type), message payload (data)
+
+    Function for turning a payload into a plain Python value.
+    Snapshots decode to (tick, game_state), deltas to (tick, base_tick, delta),
+    every other message to a dictionary.
+
+    Returns: Decoded message body
+    """
+    try:
+        if msg_type == MSG_DELTA:
+            return decode_delta(data)
+
+        elif msg_type == MSG_SNAPSHOT:
+            return decode_snapshot(data)
+
+        elif msg_type == MSG_INPUT:
+            player_id, direction, seq, tick = INPUT.unpack(data)
+            return {"player_id": player_id, "direction": DIRECTIONS[direction], "seq": seq, "tick": tick}
+
+        elif msg_type == MSG_HELLO:
+            player_id, max_players, room_id, tick_rate, columns, rows, view_radius = HELLO.unpack(data)
+            return {"player_id": player_id, "max_players": max_players, "room_id": room_id,
+                    "tick_rate": tick_rate, "columns": columns, "rows": rows, "view_radius": view_radius}
+
+        elif msg_type == MSG_JOIN:
+            room_id, max_players, flags, tick_rate = JOIN.unpack(data)
+            return {"room_id": None if room_id == ANY_ROOM else room_id, "max_players": max_players,
+                    "create": bool(flags & JOIN_CREATE), "spectate": bool(flags & JOIN_SPECTATE),
+                    "udp": bool(flags & JOIN_UDP), "tick_rate": tick_rate}
+
+        elif msg_type == MSG_UDP_OFFER:
+            port, token = UDP_OFFER.unpack(data)
+            return {"port": port, "token": token}
+
+        elif msg_type == MSG_ERROR:
+            return {"reason": data.decode("utf-8", "replace")}
+
+        elif msg_type == MSG_KEYFRAME_REQUEST:
+            return {"tick": KEYFRAME_REQUEST.unpack(data)[0]}
+
+        elif msg_type == MSG_COUNTDOWN:
+            return {"countdown_value": COUNTDOWN.unpack(data)[0]}
+
+        elif msg_type == MSG_GAME_OVER:
+            tie, winner = GAME_OVER.unpack(data)
+            return {"tie": True} if tie else {"winner": str(winner)}
+
+    # Exception for truncated or malformed payloads
+    except (struct.error, IndexError) as e:
+        raise ProtocolError(f"Malformed message of type {msg_type}: {e}")
+
+    raise ProtocolError(f"Unknown message type {msg_type}")
+
+
+class StreamDecoder:
+    """
+    Incremental decoder for a byte stream of frames.
+    Bytes are fed in as they arrive; only complete frames are returned, so partial
+    reads and several messages arriving in one recv() are both handled.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Parameters: bytes read from the socket (data)
+
+        Function for appending new bytes and extracting every complete message.
+
+        Returns: List of (message type, decoded message) tuples
+        """
+        buffer = self.buffer
+        buffer += data
+        messages = []
+        offset = 0
+
+        # Pull out frames while a whole one is available
+        while len(buffer) - offset >= FRAME_HEADER.size:
+            length, version, msg_type = FRAME_HEADER.unpack_from(buffer, offset)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Unsupported protocol version {version}")
+            if length > MAX_FRAME_SIZE:
+                raise ProtocolError(f"Frame of {length} bytes exceeds limit")
+
+            start = offset + FRAME_HEADER.size
+            end = start + length
+            if end > len(buffer):
+                break
+
+            messages.append((msg_type, decode_message(msg_type, bytes(buffer[start:end]))))
+            offset = end
+
+        # Drop consumed bytes
+        if offset:
+            del buffer[:offset]
+
+        return messages
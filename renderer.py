@@ -0,0 +1,293 @@
+import pygame
+
+
+"""
+Drawing for the pygame client.
+Everything that looks the same from frame to frame is rendered once and reused: the
+brick background, one surface per (segment size, color), one head per (color, direction),
+the food, and every piece of text keyed by (text, color, font size). Each frame is a
+list of blits; only the rectangles that changed since the previous frame are erased
+(by copying the background back) and pushed to the screen with pygame.display.update(rects).
+When the window only shows part of the board, a camera gives the board position of its
+top-left corner: everything on the board is drawn shifted by it (the text stays put) and
+the background scrolls with it, so a frame whose camera moved is redrawn in full.
+"""
+
+
+# Colors and brick pattern
+PLAYER_COLORS = [
+    (50, 200, 50),   # Green
+    (50, 50, 200),   # Blue
+    (200, 200, 50),  # Yellow
+    (200, 100, 50)   # Orange
+]
+FOOD_COLOR = (255, 50, 50)
+STEM_COLOR = (100, 70, 0)
+BRICK_COLOR = (40, 40, 40)
+MORTAR_COLOR = (30, 30, 30)
+TEXT_COLOR = (255, 255, 255)
+BRICK_WIDTH = 50
+BRICK_HEIGHT = 25
+
+# Above this many changed rectangles a single full-screen update is cheaper
+MAX_DIRTY_RECTS = 400
+
+# Text surfaces kept before the cache is emptied (scores keep producing new strings)
+MAX_CACHED_TEXT = 256
+
+# Scores listed in the corner (the best ones, so an arena's list fits the window)
+MAX_SCORES_SHOWN = 10
+
+
+class Renderer:
+    """
+    Draws game states onto a window, keeping every reusable surface in a cache and
+    remembering what was drawn last frame so it can be erased.
+    """
+
+    def __init__(self, window, space_size=20):
+        self.window = window
+        self.space_size = space_size
+        self.fonts = {}
+        self.segments = {}
+        self.heads = {}
+        self.texts = {}
+        self.food = None
+        self.camera = (0, 0)
+        self.resize(window)
+
+    def resize(self, window):
+        """
+        Parameters: window surface, possibly with a new size (window)
+
+        Function for rebuilding the size-dependent surfaces and forcing a full redraw.
+
+        Returns: NULL (Nothing)
+        """
+        self.window = window
+        width, height = window.get_size()
+
+        # Brick wall, drawn once (one pattern repeat larger than the window, so it can scroll)
+        self.background = pygame.Surface((width + BRICK_WIDTH, height + 2 * BRICK_HEIGHT)).convert()
+        self.background.fill(MORTAR_COLOR)
+        for y in range(0, height + 2 * BRICK_HEIGHT, BRICK_HEIGHT):
+            offset = BRICK_WIDTH // 2 if (y // BRICK_HEIGHT) % 2 else 0
+            for x in range(-offset, width + BRICK_WIDTH, BRICK_WIDTH):
+                pygame.draw.rect(self.background, BRICK_COLOR, (x, y, BRICK_WIDTH - 2, BRICK_HEIGHT - 2))
+
+        # Darkening layer shown over the board once the game is over
+        self.overlay = pygame.Surface((width, height), pygame.SRCALPHA)
+        self.overlay.fill((0, 0, 0, 180))
+
+        self.last_blits = None
+        self.last_rects = []
+
+    def font(self, size):
+        """
+        Parameters: point size (size)
+
+        Function for loading a font once per size.
+
+        Returns: pygame Font
+        """
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.SysFont('Arial', size)
+        return self.fonts[size]
+
+    def text(self, text, color=TEXT_COLOR, size=20):
+        """
+        Parameters: string to show (text), its color (color), font size (size)
+
+        Function for rendering a piece of text, reusing the surface if it was rendered before.
+
+        Returns: Surface with the text
+        """
+        key = (text, color, size)
+        surface = self.texts.get(key)
+        if surface is None:
+            if len(self.texts) >= MAX_CACHED_TEXT:
+                self.texts.clear()
+            surface = self.texts[key] = self.font(size).render(text, True, color)
+        return surface
+
+    def segment(self, size, color):
+        """
+        Parameters: edge length of the segment (size), snake color (color)
+
+        Function for getting the rounded square of one body segment.
+
+        Returns: Surface of the segment
+        """
+        key = (size, color)
+        surface = self.segments.get(key)
+        if surface is None:
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.rect(surface, color, (0, 0, size, size), border_radius=size // 4)
+            self.segments[key] = surface
+        return surface
+
+    def head(self, color, direction):
+        """
+        Parameters: snake color (color), direction the snake looks in (direction)
+
+        Function for getting a snake head with its eyes looking in its direction.
+
+        Returns: Surface of the head
+        """
+        key = (color, direction)
+        surface = self.heads.get(key)
+        if surface is None:
+            size = self.space_size
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            pygame.draw.ellipse(surface, color, (0, 0, size, size))
+
+            # Calculate eye positions (looking in movement direction)
+            if direction == "RIGHT":
+                eye_positions = [(size // 1.5, size // 4), (size // 1.5, size // 1.5)]
+            elif direction == "LEFT":
+                eye_positions = [(size // 4, size // 4), (size // 4, size // 1.5)]
+            elif direction == "UP":
+                eye_positions = [(size // 4, size // 4), (size // 1.5, size // 4)]
+            else:  # DOWN
+                eye_positions = [(size // 4, size // 1.5), (size // 1.5, size // 1.5)]
+
+            for eye in eye_positions:
+                pygame.draw.circle(surface, (255, 255, 255), (int(eye[0]), int(eye[1])), size // 8)
+                pygame.draw.circle(surface, (0, 0, 0), (int(eye[0]), int(eye[1])), size // 12)
+            self.heads[key] = surface
+        return surface
+
+    def food_surface(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for getting the food (apple and its stem, which sticks out above the cell).
+
+        Returns: Surface of the food
+        """
+        if self.food is None:
+            size = self.space_size
+            stem = size // 4
+            self.food = pygame.Surface((size, size + stem), pygame.SRCALPHA)
+            pygame.draw.ellipse(self.food, FOOD_COLOR, (0, stem, size, size))
+            pygame.draw.rect(self.food, STEM_COLOR, (size // 3, 0, 2, stem))
+        return self.food
+
+    def snake_blits(self, blits, body, color, direction, camera=(0, 0)):
+        """
+        Parameters: list to add to (blits), segments of the snake (body), its color (color),
+                    its direction (direction), board position of the window's corner (camera)
+
+        Function for adding a snake to the frame: a head, then body segments that taper towards the tail.
+
+        Returns: NULL (Nothing)
+        """
+        camera_x, camera_y = camera
+        space_size = self.space_size
+        length = len(body)
+        for i, (x, y) in enumerate(body):
+            if i == 0:
+                surface = self.head(color, direction)
+            else:
+                surface = self.segment(max(space_size - (length - i) // 3, space_size // 2), color)
+            blits.append((surface, (round(x - camera_x), round(y - camera_y))))
+
+    def frame_blits(self, game_state, frame_state, max_players, camera=(0, 0)):
+        """
+        Parameters: latest server state (game_state), interpolated state to draw the snakes from
+                    (frame_state), players needed to start (max_players),
+                    board position of the window's corner (camera)
+
+        Function for listing everything drawn this frame, back to front.
+
+        Returns: List of (surface, position)
+        """
+        width, height = self.window.get_size()
+        blits = []
+
+        # Countdown before the game starts
+        if game_state and game_state.get("countdown"):
+            blits.append((self.text("Game starts in:"), (width // 2 - 100, height // 2 - 50)))
+            blits.append((self.text(str(game_state["countdown_value"]), (255, 0, 0), 50),
+                          (width // 2 - 30, height // 2)))
+            if "players" in game_state:
+                blits.append((self.text(f"Players connected: {len(game_state['players'])}/{max_players}"),
+                              (width // 2 - 100, height // 2 + 80)))
+
+        # Game running: food, snakes and scores
+        elif game_state and game_state.get("game_started"):
+            if game_state.get("food") is not None:
+                food_x, food_y = game_state["food"]
+                blits.append((self.food_surface(), (food_x - camera[0], food_y - self.space_size // 4 - camera[1])))
+
+            for player_key, player_data in frame_state["players"].items():
+                color = PLAYER_COLORS[int(player_key) % len(PLAYER_COLORS)]
+                self.snake_blits(blits, player_data["body"], color, player_data["direction"], camera)
+
+            y_offset = 10
+            scores = sorted(game_state.get("scores", {}).items(), key=lambda item: -item[1])
+            for player_key, score in scores[:MAX_SCORES_SHOWN]:
+                color = PLAYER_COLORS[int(player_key) % len(PLAYER_COLORS)]
+                blits.append((self.text(f"Player {int(player_key) + 1}: {score}", color), (10, y_offset)))
+                y_offset += 35
+
+        # Waiting for players or for the server
+        elif game_state and "players" in game_state:
+            blits.append((self.text(f"Waiting for players... ({len(game_state['players'])}/{max_players})"),
+                          (width // 2 - 125, height // 2)))
+        else:
+            blits.append((self.text("Connecting to server..."), (width // 2 - 125, height // 2)))
+
+        # Result on top of the final board
+        if game_state and game_state.get("game_over"):
+            blits.append((self.overlay, (0, 0)))
+            blits.append((self.text("GAME OVER", (255, 0, 0)), (width // 2 - 75, height // 2 - 50)))
+            if "winner" in game_state:
+                winner = int(game_state["winner"])
+                blits.append((self.text(f"Player {winner + 1} Wins!", PLAYER_COLORS[winner % len(PLAYER_COLORS)]),
+                              (width // 2 - 75, height // 2)))
+            elif game_state.get("tie"):
+                blits.append((self.text("Game Tied - All Players Died!"), (width // 2 - 140, height // 2)))
+
+        return blits
+
+    def render(self, game_state, frame_state, max_players, camera=(0, 0)):
+        """
+        Parameters: latest server state (game_state), interpolated state to draw the snakes from
+                    (frame_state), players needed to start (max_players),
+                    board position of the window's corner (camera)
+
+        Function for drawing one frame and pushing the changed parts of it to the screen.
+        Nothing is drawn when the frame is identical to the previous one.
+
+        Returns: Number of rectangles updated (0 for an unchanged frame, 1 for a full update)
+        """
+        blits = self.frame_blits(game_state, frame_state, max_players, camera)
+        if blits == self.last_blits and camera == self.camera:
+            return 0
+
+        window = self.window
+        first_frame = self.last_blits is None or camera != self.camera
+        self.last_blits = blits
+        self.camera = camera
+
+        # Part of the background under the window's corner
+        scroll_x = camera[0] % BRICK_WIDTH
+        scroll_y = camera[1] % (2 * BRICK_HEIGHT)
+
+        # Many changes (or the first frame, or a moved camera): redraw and push the whole window
+        if first_frame or len(blits) + len(self.last_rects) > MAX_DIRTY_RECTS:
+            window.blit(self.background, (0, 0), (scroll_x, scroll_y) + window.get_size())
+            self.last_rects = window.blits(blits)
+            pygame.display.update()
+            return 1
+
+        # Few changes: erase last frame's rectangles, draw, push old and new rectangles
+        background = self.background
+        for rect in self.last_rects:
+            window.blit(background, rect, rect.move(scroll_x, scroll_y))
+        rects = window.blits(blits)
+        changed = self.last_rects + rects
+        pygame.display.update(changed)
+        self.last_rects = rects
+        return len(changed)
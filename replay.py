@@ -0,0 +1,448 @@
+import argparse
+import contextlib
+import io
+import os
+import struct
+import sys
+import time
+import zlib
+import engine
+import protocol
+
+
+"""
+Deterministic match replays.
+While a match is played the server's Recorder keeps a compact log of it: the seed of the
+match's random generator, the board and the snakes as the game started, every direction
+change, every snake put on the board later (an arena's joins and respawns, with its body)
+and every player leaving (stamped with the tick after which it happened), and a
+checksum of the game state every CHECKSUM_INTERVAL ticks. Since all randomness of a match
+comes from its seeded generator, replaying the same inputs through engine.update_game
+rebuilds every tick exactly, with no snapshots stored; a match is a few KB.
+Run this file to inspect a replay: it plays the match back at full speed (no sockets, no
+sleeping), prints every death with its tick, checks the stored checksums and can show the
+board at any tick.
+An arena never ends, so its room cuts the recording every ARENA_REPLAY_TICKS ticks (see
+rooms.py): each piece is a replay of its own (FLAG_CONTINUED) that starts from the board
+as it stood, with the generator reseeded at the cut, and counts its ticks from there.
+"""
+
+
+# Replay files start with this, followed by the format version and the zlib-compressed log
+MAGIC = b"SNKR"
+REPLAY_VERSION = 3
+FILE_HEADER = struct.Struct("<4sB")
+
+# Versions this file can still read (version 2 has no continued recordings)
+READABLE_VERSIONS = (2, REPLAY_VERSION)
+
+# Match header: seed, start time (Unix seconds), board columns and rows, tick rate, room number,
+# food position, number of snakes, flags
+MATCH_HEADER = struct.Struct("<QIHHBHhhHB")
+
+# Match flags
+FLAG_ARENA = 1
+FLAG_CONTINUED = 2
+
+# Snake at the start: player number, direction code, score, length (its coordinates follow);
+# a length of 0 is a score kept by a player without a snake (an arena player waiting to respawn)
+SNAKE_HEADER = struct.Struct("<HBIH")
+
+# Event kinds (the low three bits of an event's kind byte; a turn or spawn keeps its direction in the next two)
+EVENT_TURN = 0
+EVENT_LEAVE = 1
+EVENT_CHECKSUM = 2
+EVENT_END = 3
+EVENT_SPAWN = 4
+
+# Ticks between two state checksums
+CHECKSUM_INTERVAL = 10
+
+CHECKSUM = struct.Struct("<I")
+
+
+def state_checksum(game_state):
+    """
+    Parameters: server game state (game_state)
+
+    Function for summarizing everything a tick decides: every snake's body and direction,
+    the food and the scores.
+
+    Returns: CRC32 of the state
+    """
+    checksum = 0
+    for player_id, snake in game_state["players"].items():
+        checksum = zlib.crc32(struct.pack("<HBH", int(player_id), protocol.DIRECTION_CODES[snake.direction],
+                                          len(snake)), checksum)
+        checksum = zlib.crc32(_pack_coords(snake.coords()), checksum)
+
+    food = game_state["food"]
+    checksum = zlib.crc32(struct.pack("<hh", *food) if food is not None else b"-", checksum)
+    for player_id, score in sorted(game_state["scores"].items()):
+        checksum = zlib.crc32(struct.pack("<HI", int(player_id), score), checksum)
+    return checksum
+
+
+def _pack_coords(coords):
+    """
+    Parameters: array("h") of x0, y0, x1, y1, ... (coords)
+
+    Function for packing coordinates as little-endian 16-bit values.
+
+    Returns: Bytes
+    """
+    return struct.pack(f"<{len(coords)}h", *coords)
+
+
+def _pack_varint(value):
+    """
+    Parameters: non-negative integer (value)
+
+    Function for packing an integer in as few bytes as it needs (7 bits per byte).
+
+    Returns: Bytes
+    """
+    data = bytearray()
+    while value >= 0x80:
+        data.append(value & 0x7F | 0x80)
+        value >>= 7
+    data.append(value)
+    return bytes(data)
+
+
+def _unpack_varint(data, offset):
+    """
+    Parameters: buffer (data), position of the integer (offset)
+
+    Function for reading an integer packed by _pack_varint.
+
+    Returns: Integer, position after it
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+class Recorder:
+    """
+    Log of one match, filled in by the room as the match is played.
+    Events are stored as the tick since the previous event, a kind byte and the player number.
+    A recording that continues an arena from first_tick on starts from the board as it
+    stands, and the room must reseed the match's generator with engine.reseed() first.
+    """
+
+    def __init__(self, game_state, room_id, tick_rate, first_tick=0):
+        self.first_tick = self.last_tick = first_tick
+        self.events = bytearray()
+        waiting = [player_id for player_id in game_state["scores"] if player_id not in game_state["players"]]
+        flags = (FLAG_ARENA if game_state.get("arena") else 0) | (FLAG_CONTINUED if first_tick else 0)
+        self.header = bytearray(MATCH_HEADER.pack(
+            game_state["seed"], int(time.time()), engine.COLUMNS, engine.ROWS, tick_rate, room_id,
+            *(game_state["food"] or (-1, -1)), len(game_state["players"]) + len(waiting), flags))
+
+        # Snakes in the order the game state holds them (the order they move in)
+        for player_id, snake in game_state["players"].items():
+            self.header += SNAKE_HEADER.pack(int(player_id), protocol.DIRECTION_CODES[snake.direction],
+                                             game_state["scores"].get(player_id, 0), len(snake))
+            self.header += _pack_coords(snake.coords())
+
+        # Scores of players without a snake
+        for player_id in waiting:
+            self.header += SNAKE_HEADER.pack(int(player_id), 0, game_state["scores"][player_id], 0)
+
+    def _event(self, tick, kind, player_id=None):
+        """
+        Parameters: ticks played when it happened (tick), kind byte (kind), player number if any (player_id)
+
+        Function for appending an event to the log.
+
+        Returns: NULL (Nothing)
+        """
+        self.events += _pack_varint(tick - self.last_tick)
+        self.events.append(kind)
+        if player_id is not None:
+            self.events += _pack_varint(int(player_id))
+        self.last_tick = tick
+
+    def turn(self, tick, player_id, direction):
+        """
+        Parameters: ticks played so far (tick), player number (player_id), new direction (direction)
+
+        Function for recording a direction change the room accepted.
+
+        Returns: NULL (Nothing)
+        """
+        self._event(tick, EVENT_TURN | protocol.DIRECTION_CODES[direction] << 3, player_id)
+
+    def spawn(self, tick, player_id, snake):
+        """
+        Parameters: ticks played so far (tick), player number (player_id), Snake put on the board (snake)
+
+        Function for recording a snake that joined the match or respawned (with a score of 0).
+
+        Returns: NULL (Nothing)
+        """
+        self._event(tick, EVENT_SPAWN | protocol.DIRECTION_CODES[snake.direction] << 3, player_id)
+        self.events += _pack_varint(len(snake))
+        self.events += _pack_coords(snake.coords())
+
+    def leave(self, tick, player_id):
+        """
+        Parameters: ticks played so far (tick), player number (player_id)
+
+        Function for recording a player whose snake was taken off the board when they disconnected.
+
+        Returns: NULL (Nothing)
+        """
+        self._event(tick, EVENT_LEAVE, player_id)
+
+    def tick(self, game_state, tick):
+        """
+        Parameters: state after the tick (game_state), tick just played (tick)
+
+        Function for recording a checksum every CHECKSUM_INTERVAL ticks.
+
+        Returns: NULL (Nothing)
+        """
+        if (tick - self.first_tick) % CHECKSUM_INTERVAL == 0:
+            self._event(tick, EVENT_CHECKSUM)
+            self.events += CHECKSUM.pack(state_checksum(game_state))
+
+    def finish(self, game_state, tick):
+        """
+        Parameters: final state (game_state), last tick played (tick)
+
+        Function for closing the log with a checksum of the final state.
+
+        Returns: Bytes of the replay file
+        """
+        if (tick - self.first_tick) % CHECKSUM_INTERVAL:
+            self._event(tick, EVENT_CHECKSUM)
+            self.events += CHECKSUM.pack(state_checksum(game_state))
+        self._event(tick, EVENT_END)
+        return FILE_HEADER.pack(MAGIC, REPLAY_VERSION) + zlib.compress(bytes(self.header + self.events), 9)
+
+
+def save(directory, room_id, data):
+    """
+    Parameters: directory for replays (directory), room the match was played in (room_id),
+                bytes of the replay file (data)
+
+    Function for writing a finished match's replay to its own file.
+
+    Returns: Path of the file
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"match-{time.strftime('%Y%m%d-%H%M%S')}-room{room_id}-{zlib.crc32(data):08x}.replay")
+    with open(path, "wb") as replay_file:
+        replay_file.write(data)
+    return path
+
+
+class Replay:
+    """
+    A decoded replay file: the match header, the snakes at the start and the list of
+    (tick, kind, player number, value) events. Ticks count from the start of the recording.
+    """
+
+    def __init__(self, data):
+        magic, version = FILE_HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("Not a replay file")
+        if version not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported replay version {version}")
+        body = zlib.decompress(data[FILE_HEADER.size:])
+
+        (self.seed, self.started, self.columns, self.rows, self.tick_rate, self.room_id,
+         food_x, food_y, snake_count, flags) = MATCH_HEADER.unpack_from(body)
+        self.arena = bool(flags & FLAG_ARENA)
+        self.continued = bool(flags & FLAG_CONTINUED)
+        self.food = None if food_x < 0 else [food_x, food_y]
+        offset = MATCH_HEADER.size
+
+        # Snakes at the start: (player key, direction, score, body)
+        self.snakes = []
+        for _ in range(snake_count):
+            player_id, direction, score, length = SNAKE_HEADER.unpack_from(body, offset)
+            offset += SNAKE_HEADER.size
+            values = struct.unpack_from(f"<{2 * length}h", body, offset)
+            offset += 4 * length
+            self.snakes.append((str(player_id), protocol.DIRECTIONS[direction], score,
+                                [list(values[i:i + 2]) for i in range(0, len(values), 2)]))
+
+        # Events
+        self.events = []
+        tick = 0
+        while offset < len(body):
+            delta, offset = _unpack_varint(body, offset)
+            tick += delta
+            kind = body[offset]
+            offset += 1
+            event = kind & 7
+            if event in (EVENT_TURN, EVENT_LEAVE):
+                player_id, offset = _unpack_varint(body, offset)
+                self.events.append((tick, event, str(player_id), protocol.DIRECTIONS[kind >> 3]))
+            elif event == EVENT_SPAWN:
+                player_id, offset = _unpack_varint(body, offset)
+                length, offset = _unpack_varint(body, offset)
+                values = struct.unpack_from(f"<{2 * length}h", body, offset)
+                offset += 4 * length
+                spawned = [list(values[i:i + 2]) for i in range(0, len(values), 2)]
+                self.events.append((tick, event, str(player_id), (protocol.DIRECTIONS[kind >> 3], spawned)))
+            elif event == EVENT_CHECKSUM:
+                self.events.append((tick, event, None, CHECKSUM.unpack_from(body, offset)[0]))
+                offset += CHECKSUM.size
+            else:
+                self.events.append((tick, event, None, None))
+        self.last_tick = tick
+
+    @classmethod
+    def load(cls, path):
+        """
+        Parameters: replay file (path)
+
+        Function for reading a replay file.
+
+        Returns: Replay
+        """
+        with open(path, "rb") as replay_file:
+            return cls(replay_file.read())
+
+    def initial_state(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for rebuilding the game state the match (or the piece of an arena) started from.
+        Sets the board size of this process to the match's board.
+
+        Returns: Game state dictionary
+        """
+        engine.configure_board(self.columns, self.rows)
+        game_state = engine.new_game_state(self.seed, self.arena)
+        if self.continued:
+            game_state["food"] = self.food
+        elif game_state["food"] != self.food:
+            raise ValueError(f"Seed {self.seed} does not give the recorded first food {self.food}")
+
+        for player_id, direction, score, body in self.snakes:
+            if body:
+                engine.add_snake(game_state, player_id, body, direction)
+            game_state["scores"][player_id] = score
+        if self.continued:
+            engine.reseed(game_state, self.seed)
+        game_state["game_started"] = True
+        return game_state
+
+    def play(self, until=None, verify=True, log=None):
+        """
+        Parameters: tick to stop at, None for the end of the match (until),
+                    whether to compare the stored checksums (verify),
+                    function called with (tick, text) for what the engine prints, None to discard it (log)
+
+        Function for playing the match back as fast as possible.
+
+        Returns: Game state, tick reached, list of ticks whose checksum did not match
+        """
+        game_state = self.initial_state()
+        until = self.last_tick if until is None else min(until, self.last_tick)
+        mismatches = []
+        tick = 0
+
+        for event_tick, event, player_id, value in self.events:
+            if event_tick > until:
+                break
+
+            # Play up to the tick the event happened after
+            while tick < event_tick:
+                output = io.StringIO()
+                with contextlib.redirect_stdout(output):
+                    engine.update_game(game_state)
+                tick += 1
+                if log is not None and output.getvalue():
+                    log(tick, output.getvalue())
+
+            if event == EVENT_TURN:
+                game_state["players"][player_id].direction = value
+
+            elif event == EVENT_SPAWN:
+                direction, body = value
+                engine.add_snake(game_state, player_id, body, direction)
+                game_state["scores"][player_id] = 0
+                if log is not None:
+                    log(tick, f"Player {player_id} spawned at {body[0]}\n")
+
+            elif event == EVENT_LEAVE:
+                if player_id in game_state["players"]:
+                    engine.remove_snake(game_state, player_id)
+                game_state["scores"].pop(player_id, None)
+                if log is not None:
+                    log(tick, f"Player {player_id} left the match\n")
+
+            elif event == EVENT_CHECKSUM and verify and state_checksum(game_state) != value:
+                mismatches.append(tick)
+
+        return game_state, tick, mismatches
+
+
+def show_state(game_state, tick):
+    """
+    Parameters: game state (game_state), its tick (tick)
+
+    Function for printing the board at one tick.
+
+    Returns: NULL (Nothing)
+    """
+    print(f"Tick {tick}: food at {game_state['food']}, scores {game_state['scores']}")
+    for player_id, snake in game_state["players"].items():
+        body = [list(segment) for segment in snake]
+        shown = body if len(body) <= 12 else body[:12] + ["..."]
+        print(f"  Player {player_id}: {snake.direction}, {len(snake)} segments {shown}")
+    if game_state["game_over"]:
+        print(f"  Game over: {'winner Player ' + game_state['winner'] if 'winner' in game_state else 'tie'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("replay", help="replay file written by the server (--replay-dir)")
+    parser.add_argument("--tick", type=int, help="show the board at this tick")
+    parser.add_argument("--quiet", action="store_true", help="do not list what happened during the match")
+    args = parser.parse_args()
+
+    replay = Replay.load(args.replay)
+    turns = sum(1 for event in replay.events if event[1] == EVENT_TURN)
+    print(f"Room {replay.room_id}, {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(replay.started))}, "
+          f"{replay.columns}x{replay.rows} {'arena' if replay.arena else 'board'} at {replay.tick_rate} ticks/s, "
+          f"seed {replay.seed}{', continuing an earlier recording' if replay.continued else ''}")
+    print(f"{sum(1 for snake in replay.snakes if snake[3])} snakes, {replay.last_tick} ticks, {turns} turns, "
+          f"{os.path.getsize(args.replay)} bytes")
+
+    # Whole match at full speed, checking every stored checksum
+    log = None if args.quiet else lambda tick, text: sys.stdout.write(
+        "".join(f"  tick {tick}: {line}\n" for line in text.splitlines()))
+    started = time.perf_counter()
+    game_state, tick, mismatches = replay.play(log=log)
+    elapsed = time.perf_counter() - started
+    checks = sum(1 for event in replay.events if event[1] == EVENT_CHECKSUM)
+
+    print(f"Replayed {tick} ticks in {elapsed * 1000:.1f} ms ({tick / elapsed if elapsed else 0:,.0f} ticks/s)")
+    if mismatches:
+        print(f"Checksum MISMATCH at tick(s) {mismatches} ({len(mismatches)} of {checks} checks)")
+    else:
+        print(f"All {checks} checksums match")
+
+    if args.tick is not None:
+        game_state, tick, _ = replay.play(args.tick, verify=False)
+        show_state(game_state, tick)
+    else:
+        show_state(game_state, tick)
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
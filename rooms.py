@@ -0,0 +1,791 @@
+import collections
+import random
+import threading
+import time
+import engine
+import interest
+import metrics
+import profiling
+import protocol
+import replay
+import scheduler
+import spectators
+import udp
+
+
+"""
+Rooms let one server process host many matches at once.
+Each room owns its own game state, countdown, tick schedule and connections, and is
+advanced independently by the server (one thread or asyncio task per room) at the
+tick rate of its match.
+The room manager matches connecting clients into rooms and recycles finished
+rooms so they can host a new match without restarting the server.
+
+Connections stored in a room only need two methods: send(data) and close().
+Rooms given a replay directory record every match they play there (see replay.py).
+Any number of spectators can watch a room (see spectators.py); they stay attached when
+the room is recycled and watch its next match.
+Players that switched to UDP (see udp.py) get the game state as datagrams.
+Turns are queued per player and applied one per tick, in the order they were sent,
+so two quick key presses within one tick both take effect.
+Rooms report how long they wait for their lock, simulate and encode each tick, and the
+size of the frames they broadcast, to the metrics registry (see metrics.py); with phase
+timing on (see profiling.py) they also time each step of the simulation.
+Rooms given a view radius send each player only the part of the board around its
+snake, from a view of its own (see interest.py); spectators still get the whole board.
+An arena room holds up to MAX_ARENA_SIZE players on one board and never ends: it starts
+with its first player, players join and leave while it runs, each new snake is placed
+wherever engine.find_spawn finds free space, and a snake that dies comes back
+RESPAWN_TICKS ticks later. It is recycled once its last player has left. Its replay is
+saved and a new one started every ARENA_REPLAY_TICKS ticks, so a recording stays small.
+"""
+
+
+# Room sizes (an arena is not limited to the starting positions, but player counts travel as a byte)
+MIN_ROOM_SIZE = 2
+MAX_ROOM_SIZE = len(engine.starting_positions)
+MAX_ARENA_SIZE = 255
+
+# Ticks an arena player waits between its snake dying and a new one being placed
+RESPAWN_TICKS = 20
+
+# Ticks an arena records before its replay is saved and a new one begins
+ARENA_REPLAY_TICKS = 3000
+
+# Ticks per second of a match (the player opening a room may pick another rate)
+DEFAULT_TICK_RATE = 10
+MIN_TICK_RATE = 1
+MAX_TICK_RATE = 60
+
+# Seconds a finished room keeps showing the result before it is recycled
+RECYCLE_DELAY = 5
+
+# Turns a player may have waiting (older ones are dropped when more arrive)
+MAX_QUEUED_INPUTS = 8
+
+# Ticks ahead an input may be meant for (one further ahead is applied as soon as possible)
+MAX_INPUT_LEAD = 10
+
+# Metrics (the server adds the "send" phase once a tick's messages are queued)
+LOCK_WAIT_SECONDS = metrics.histogram("snake_room_lock_wait_seconds",
+                                      "Time spent waiting for a room's lock", labelnames=("site",))
+TICK_LOCK_WAIT = LOCK_WAIT_SECONDS.labels("tick")
+INPUT_LOCK_WAIT = LOCK_WAIT_SECONDS.labels("input")
+SIMULATE_PHASE = profiling.PHASE_SECONDS.labels("simulate")
+ENCODE_PHASE = profiling.PHASE_SECONDS.labels("encode")
+FRAME_BYTES = metrics.histogram("snake_frame_bytes", "Size of the state frame broadcast each tick",
+                                metrics.SIZE_BUCKETS, labelnames=("kind",))
+KEYFRAME_BYTES = FRAME_BYTES.labels("keyframe")
+DELTA_BYTES = FRAME_BYTES.labels("delta")
+VIEW_FRAME_BYTES = metrics.histogram("snake_view_frame_bytes", "Size of the frame of each player's view each tick",
+                                     metrics.SIZE_BUCKETS, labelnames=("kind",))
+VIEW_KEYFRAME_BYTES = VIEW_FRAME_BYTES.labels("keyframe")
+VIEW_DELTA_BYTES = VIEW_FRAME_BYTES.labels("delta")
+
+
+class RoomError(Exception):
+    """Raised when a client cannot be placed in the requested room"""
+
+
+class Room:
+    """
+    A single match: game state, the connected players and the countdown/tick progress.
+    All state is guarded by the room's lock. The room's scheduler decides when the
+    server calls advance(); tick counts the ticks of play stamped on snapshots.
+    With a replay_dir, recorder logs the match from its first tick and the replay is
+    written there when the match ends. Broadcasts are published to the spectator feed
+    only while someone is watching. With a view_radius (in cells), views maps each
+    player number to its interest.View. In an arena, respawns maps the key of each player
+    waiting for a snake to the tick from which one may be placed, drawn with spawn_rng.
+    """
+
+    def __init__(self, room_id, max_players, tick_rate=DEFAULT_TICK_RATE, replay_dir=None, view_radius=0,
+                 arena=False):
+        self.room_id = room_id
+        self.replay_dir = replay_dir
+        self.view_radius = view_radius
+        self.arena = arena
+        self.spawn_rng = random.Random()
+        self.lock = threading.Lock()
+        self.spectators = spectators.SpectatorFeed()
+        self.scheduler = scheduler.TickScheduler(tick_rate)
+        self.reset(max_players, tick_rate)
+
+    def reset(self, max_players=None, tick_rate=None):
+        """
+        Parameters: room size for the next match, or None to keep the current one (max_players),
+                    ticks per second for the next match, or None to keep the current rate (tick_rate)
+
+        Function for clearing the room so it can host a new match.
+
+        Returns: NULL (Nothing)
+        """
+        if max_players is not None:
+            self.max_players = max_players
+        if tick_rate is not None and tick_rate != self.scheduler.tick_rate:
+            self.scheduler.set_rate(tick_rate)
+        self.tick_rate = self.scheduler.tick_rate
+        self.game_state = engine.new_game_state(arena=self.arena)
+        self.clients = {}
+        self.encoder = protocol.SnapshotEncoder()
+        self.keyframe_requests = set()
+        self.input_queues = {}
+        self.countdown_started = False
+        self.next_countdown_time = 0
+        self.finished_time = None
+        self.tick = 0
+        self.recorder = None
+        self.timings = None
+        self.datagram_clients = {}
+        self.recent_frames = collections.deque(maxlen=udp.REDUNDANT_TICKS)
+        self.views = {}
+        self.respawns = {}
+
+    def is_empty(self):
+        return not self.clients
+
+    def is_joinable(self):
+        return (self.arena or not self.countdown_started) and len(self.clients) < self.max_players
+
+    def add_player(self, connection, max_players=0, tick_rate=0):
+        """
+        Parameters: connection of the new player (connection),
+                    room size requested by the player, 0 for no preference (max_players),
+                    tick rate requested by the player, 0 for no preference (tick_rate)
+
+        Function for placing a newly connected player's snake on the board.
+        Uses engine.initialize_snake(position, direction) to set up the snake at its starting
+        position, or in an arena engine.find_spawn (the first player starts the arena).
+        An empty room takes on the size and tick rate requested by its first player.
+
+        Returns: Player number, encoded initial data (player info, max_players and game state)
+        """
+        with self.lock:
+            if not self.is_joinable():
+                raise RoomError(f"Room {self.room_id} is not accepting players")
+
+            if self.is_empty():
+                if max_players:
+                    self.max_players = max_players
+                if tick_rate and tick_rate != self.tick_rate:
+                    self.scheduler.set_rate(tick_rate)
+                    self.tick_rate = tick_rate
+
+            # Lowest free player number (also picks the starting position)
+            player_id = min(set(range(self.max_players)) - set(self.clients))
+            self.clients[player_id] = connection
+            if self.arena:
+                self._spawn(str(player_id))
+            else:
+                column, row, direction = engine.starting_cell(player_id)
+                initial_body = engine.initialize_snake([column * engine.SPACE_SIZE, row * engine.SPACE_SIZE], direction)
+                engine.add_snake(self.game_state, str(player_id), initial_body, direction)
+                self.game_state["scores"][str(player_id)] = 0
+            if self.view_radius:
+                self.views[player_id] = interest.View(self.view_radius)
+
+            # Encode initial player info, max_players and game state (only its view's part with a view radius)
+            hello = protocol.encode_hello(player_id, self.max_players, self.room_id, self.tick_rate,
+                                          engine.COLUMNS, engine.ROWS, self.view_radius)
+            if self.view_radius:
+                initial_data = hello + self.views[player_id].keyframe(self.game_state, str(player_id), self.tick)
+            else:
+                initial_data = hello + protocol.encode_snapshot(self.game_state, self.tick)
+
+        print(f"Room {self.room_id}: {len(self.clients)}/{self.max_players} players connected")
+        return player_id, initial_data
+
+    def _spawn(self, player_key):
+        """
+        Parameters: key of an arena player without a snake (player_key)
+
+        Function for putting a new snake for the player where the arena has free space, starting
+        the arena if it is the first, or trying again on the next pass if nothing fits.
+        Must be called with the room's lock held.
+
+        Returns: NULL (Nothing)
+        """
+        game_state = self.game_state
+        spawn = engine.find_spawn(game_state, self.spawn_rng)
+        if spawn is None:
+            self.respawns[player_key] = self.tick
+            return
+
+        body, direction = spawn
+        snake = engine.add_snake(game_state, player_key, body, direction)
+        game_state["scores"][player_key] = 0
+        self.respawns.pop(player_key, None)
+
+        # The first snake starts the arena (no countdown); later ones are logged as they come
+        if not game_state["game_started"]:
+            game_state["game_started"] = True
+            self.countdown_started = True
+            print(f"Room {self.room_id}: arena started!")
+            if self.replay_dir is not None:
+                self.recorder = replay.Recorder(game_state, self.room_id, self.tick_rate)
+        elif self.recorder is not None:
+            self.recorder.spawn(self.tick, player_key, snake)
+
+    def _spectator_hello(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for encoding the room info and full game state a spectator starts from.
+
+        Returns: Encoded frames
+        """
+        return (protocol.encode_hello(protocol.SPECTATOR_ID, self.max_players, self.room_id, self.tick_rate,
+                                      engine.COLUMNS, engine.ROWS, self.view_radius) +
+                self.encoder.keyframe(self.game_state, self.tick))
+
+    def add_spectator(self, connection):
+        """
+        Parameters: connection of the spectator (connection)
+
+        Function for letting a client watch the room, whatever stage its match is at.
+        The room info and current game state are queued as the first data the feed sends it.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            self.spectators.add(connection, self._spectator_hello())
+        print(f"Room {self.room_id}: {len(self.spectators)} spectators")
+
+    def watch(self, conn_id):
+        """
+        Parameters: connection number of a spectator served by the supervisor front-end (conn_id)
+
+        Function for counting a remote spectator and encoding what it starts from.
+
+        Returns: Encoded room info and game state, sequence number of the first feed entry it needs
+        """
+        with self.lock:
+            self.spectators.remote.add(conn_id)
+            if len(self.spectators.remote) == 1:
+                self.spectators.forwarded = self.spectators.next_seq
+            return self._spectator_hello(), self.spectators.next_seq
+
+    def remove_spectator(self, connection):
+        """
+        Parameters: connection of the spectator, or its number for a remote one (connection)
+
+        Function for detaching a spectator that disconnected.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            self.spectators.remove(connection)
+            self.spectators.remote.discard(connection)
+
+    def attach_datagrams(self, player_id, endpoint):
+        """
+        Parameters: player number (player_id), UDP endpoint its datagrams came from (endpoint)
+
+        Function for sending a player's game state over UDP from the next tick on.
+        The first datagram repeats the last few ticks, so it continues the TCP stream.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            if player_id in self.clients:
+                self.datagram_clients[player_id] = endpoint
+
+    def request_keyframe(self, connection):
+        """
+        Parameters: connection of a player that had an update dropped (connection)
+
+        Function for sending that player a full snapshot on the next tick instead of a delta.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            for player_id, client in self.clients.items():
+                if client is connection:
+                    self.keyframe_requests.add(player_id)
+
+    def handle_spectator_message(self, connection, msg_type, data):
+        """
+        Parameters: connection of the spectator (connection), message type (msg_type), decoded message (data)
+
+        Function for applying a message received from a spectator (only keyframe requests matter).
+
+        Returns: NULL (Nothing)
+        """
+        if msg_type == protocol.MSG_KEYFRAME_REQUEST:
+            self.spectators.resync(connection)
+
+    def handle_message(self, player_id, msg_type, data):
+        """
+        Parameters: player number of the sender (player_id), message type (msg_type), decoded message (data)
+
+        Function for applying a message received from a client.
+        Turns are queued for _apply_inputs; an input whose sequence number was already
+        queued (a repeat from a UDP datagram) is ignored.
+
+        Returns: NULL (Nothing)
+        """
+
+        # Client missed a delta and needs a full snapshot on the next tick
+        if msg_type == protocol.MSG_KEYFRAME_REQUEST:
+            with self.lock:
+                self.keyframe_requests.add(player_id)
+            return
+
+        # Queue the turn for the tick it is meant for
+        if msg_type != protocol.MSG_INPUT:
+            return
+
+        started = time.perf_counter()
+        with self.lock:
+            INPUT_LOCK_WAIT.observe(time.perf_counter() - started)
+            player_key = str(player_id)
+
+            # Ensure the player exists
+            if player_key not in self.game_state["players"]:
+                return
+
+            queue = self.input_queues.get(player_key)
+            if queue is None:
+                queue = self.input_queues[player_key] = [collections.deque(maxlen=MAX_QUEUED_INPUTS), 0]
+            if data["seq"] and data["seq"] <= queue[1]:
+                return
+            queue[0].append((data["seq"], data["tick"], data["direction"]))
+            queue[1] = max(queue[1], data["seq"])
+
+    def _apply_inputs(self, game_state):
+        """
+        Parameters: game state of the match (game_state)
+
+        Function for applying each player's next queued turn before a tick is played.
+        A turn waits for the tick it was meant for; one that is no longer valid when its
+        turn comes (a 180-degree turn or no change of direction) is skipped for the next.
+        Every input taken off the queue is acknowledged in the snake's last_input.
+        Must be called with the room's lock held.
+
+        Returns: NULL (Nothing)
+        """
+        next_tick = self.tick + 1
+        for player_key, (inputs, _) in self.input_queues.items():
+            snake = game_state["players"].get(player_key)
+            if snake is None:
+                inputs.clear()
+                continue
+
+            while inputs:
+                seq, tick, direction = inputs[0]
+                if next_tick < tick <= next_tick + MAX_INPUT_LEAD:
+                    break
+                inputs.popleft()
+                snake.last_input = max(snake.last_input, seq)
+
+                # Server-side validation to prevent 180-degree turns
+                if not engine.is_reversal(snake.direction, direction) and direction != snake.direction:
+                    snake.direction = direction
+                    if self.recorder is not None:
+                        self.recorder.turn(self.tick, player_key, direction)
+                    break
+
+    def remove_player(self, player_id, connection):
+        """
+        Parameters: player number (player_id), connection that is going away (connection)
+
+        Function for removing a disconnected player's snake, score and connection.
+        Does nothing if the slot already belongs to someone else (the room was recycled).
+        A match left with fewer than 2 snakes ends (advance() sends the result), and an arena
+        whose last player leaves has its replay written before it is recycled.
+
+        Returns: NULL (Nothing)
+        """
+        replay_data = None
+        with self.lock:
+            if self.clients.get(player_id) is not connection:
+                return
+
+            player_key = str(player_id)
+            del self.clients[player_id]
+            self.keyframe_requests.discard(player_id)
+            self.datagram_clients.pop(player_id, None)
+            self.views.pop(player_id, None)
+            self.input_queues.pop(player_key, None)
+            self.respawns.pop(player_key, None)
+
+            # A replay drops the score of a dead snake's player too
+            if player_key in self.game_state["players"] or player_key in self.game_state["scores"]:
+                if player_key in self.game_state["players"]:
+                    engine.remove_snake(self.game_state, player_key)
+                if self.recorder is not None:
+                    self.recorder.leave(self.tick, player_key)
+                self.game_state["scores"].pop(player_key, None)
+
+            # Nobody left to play a running match
+            if self.is_empty() and self.countdown_started:
+                print(f"Room {self.room_id}: all players left, recycling")
+                if self.arena and self.recorder is not None:
+                    replay_data = self.recorder.finish(self.game_state, self.tick)
+                self.reset()
+
+            # The players still there cannot play on alone
+            elif (self.countdown_started and not self.arena and not self.game_state["game_over"] and
+                  len(self.game_state["players"]) < 2):
+                print(f"Room {self.room_id}: too few players left, ending the match")
+                engine.end_abandoned(self.game_state)
+                if self.recorder is not None:
+                    replay_data = self.recorder.finish(self.game_state, self.tick)
+                    self.recorder = None
+
+        if replay_data is not None:
+            self._save_replay(replay_data)
+
+    def _queue_broadcast(self, outgoing, data, spectator_data=None):
+        """
+        Parameters: per-connection outgoing data (outgoing), encoded message for every client (data),
+                    message for spectators if it differs (spectator_data)
+
+        Function for adding a message to what each connected client is sent after this pass,
+        and publishing it to spectators. Every message queued here is one a spectator can start from.
+
+        Returns: NULL (Nothing)
+        """
+        for connection in self.clients.values():
+            outgoing[connection] = outgoing.get(connection, b"") + data
+        if len(self.spectators):
+            spectator_data = spectator_data or data
+            self.spectators.publish(spectator_data, spectator_data)
+
+    def _queue_keyframes(self, outgoing, game_state, spectator_data=None):
+        """
+        Parameters: per-connection outgoing data (outgoing), game state of the match (game_state),
+                    message for spectators if it differs (spectator_data)
+
+        Function for queueing a full snapshot for every client (of its view, for players that
+        have one) and publishing the full one to spectators. The shared delta baseline starts over.
+
+        Returns: NULL (Nothing)
+        """
+        broadcast_data, _ = self.encoder.encode(game_state, self.tick, force_keyframe=True)
+        for player_id, connection in self.clients.items():
+            view = self.views.get(player_id)
+            data = view.keyframe(game_state, str(player_id), self.tick) if view is not None else broadcast_data
+            outgoing[connection] = outgoing.get(connection, b"") + data
+        if len(self.spectators):
+            spectator_data = spectator_data or broadcast_data
+            self.spectators.publish(spectator_data, spectator_data)
+
+    def advance(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for running one scheduled pass of the match (waiting, countdown or one tick of play).
+        The server calls it on every tick of the room's scheduler.
+        Messages are only encoded here; the caller sends them after the lock is released,
+        so a slow client can never hold up the game state. Nothing is written to a connection
+        while the lock is held. With phase timing on, the phases of a tick of play are left
+        in timings for the caller to complete.
+
+        Returns: Dictionary of connection -> bytes to send, Boolean of whether a tick of play ran
+        """
+        outgoing = {}
+        replay_data = None
+
+        # Recycle a finished room once its players have seen the result
+        with self.lock:
+            finished = self.finished_time is not None
+            finished_clients = []
+            if finished and time.monotonic() - self.finished_time >= RECYCLE_DELAY:
+                print(f"Room {self.room_id}: recycling finished room")
+                finished_clients = list(self.clients.values())
+                self.reset()
+
+        if finished:
+            for connection in finished_clients:
+                connection.close()
+            return outgoing, False
+
+        started = time.perf_counter()
+        with self.lock:
+            locked = time.perf_counter()
+            TICK_LOCK_WAIT.observe(locked - started)
+            game_state = self.game_state
+
+            # Match ended by players leaving (see remove_player): only the result is left to send
+            if game_state["game_over"]:
+                self._queue_broadcast(outgoing, protocol.encode_game_over(game_state.get("winner")))
+                self.finished_time = time.monotonic()
+                return outgoing, False
+
+            # Check if all players have connected
+            if len(game_state["players"]) == self.max_players and not game_state["game_started"] and not self.countdown_started:
+                print(f"Room {self.room_id}: all players connected. Starting countdown...")
+                game_state["countdown"] = True
+                self.countdown_started = True
+                self.next_countdown_time = time.monotonic() + 1
+                game_state["countdown_value"] = 3
+
+                # Broadcast countdown start (spectators also get the room info of the new match)
+                spectator_data = self._spectator_hello() if len(self.spectators) else None
+                self._queue_keyframes(outgoing, game_state, spectator_data)
+
+            # Handle countdown
+            if self.countdown_started and not game_state["game_started"]:
+
+                # Count down once per second (against fixed deadlines, so the steps do not drift)
+                if time.monotonic() >= self.next_countdown_time:
+                    game_state["countdown_value"] -= 1
+                    self.next_countdown_time += 1
+                    print(f"Room {self.room_id}: countdown {game_state['countdown_value']}")
+
+                    # Broadcast updated countdown
+                    self._queue_broadcast(outgoing, protocol.encode_countdown(game_state["countdown_value"]))
+
+                    # Start the game when countdown reaches 0
+                    if game_state["countdown_value"] <= 0:
+                        game_state["countdown"] = False
+                        game_state["game_started"] = True
+                        print(f"Room {self.room_id}: game started!")
+
+                        # Start recording the match as it stands now
+                        if self.replay_dir is not None:
+                            self.recorder = replay.Recorder(game_state, self.room_id, self.tick_rate)
+
+                        # Broadcast game start
+                        self._queue_keyframes(outgoing, game_state)
+
+                # Skip the rest of the game logic until countdown finishes
+                if not game_state["game_started"]:
+                    return outgoing, False
+
+            # Arena players whose wait is over get a new snake (the first one placed starts the arena)
+            for player_key, due in list(self.respawns.items()):
+                if due <= self.tick:
+                    self._spawn(player_key)
+
+            # Only proceed if the game has started and there are at least 2 players (an arena runs for one)
+            if not game_state["game_started"] or (len(game_state["players"]) < 2 and not self.arena):
+                return outgoing, False
+
+            # Play one tick (timing each phase when profiling asks for it)
+            timings = self.timings = {"lock_wait": locked - started} if profiling.phase_timing else None
+            self._apply_inputs(game_state)
+            if timings is not None:
+                timings["inputs"] = time.perf_counter() - locked
+            self.tick += 1
+            removed = engine.update_game(game_state, timings)
+            if self.recorder is not None:
+                self.recorder.tick(game_state, self.tick)
+
+                # An arena's recording is cut so it never grows without bound
+                if self.arena and self.tick - self.recorder.first_tick >= ARENA_REPLAY_TICKS:
+                    replay_data = self.recorder.finish(game_state, self.tick)
+                    engine.reseed(game_state)
+                    self.recorder = replay.Recorder(game_state, self.room_id, self.tick_rate, self.tick)
+
+            # Arena players whose snake died wait a moment for the next one
+            if self.arena:
+                for player_key in removed:
+                    if int(player_key) in self.clients:
+                        self.respawns[player_key] = self.tick + RESPAWN_TICKS
+            simulated = time.perf_counter()
+
+            # Broadcast updated game state to all clients (followed by the result once the game ends)
+            broadcast_data, is_keyframe = self.encoder.encode(game_state, self.tick)
+            (KEYFRAME_BYTES if is_keyframe else DELTA_BYTES).observe(len(broadcast_data))
+            keyframe_data = None
+            game_over_data = b""
+            if game_state["game_over"]:
+                game_over_data = protocol.encode_game_over(game_state.get("winner"))
+                self.finished_time = time.monotonic()
+                if self.recorder is not None:
+                    replay_data = self.recorder.finish(game_state, self.tick)
+                    self.recorder = None
+
+            # Frames of the last few ticks, repeated in every datagram (from the last keyframe on)
+            if is_keyframe:
+                self.recent_frames.clear()
+            self.recent_frames.append(broadcast_data)
+            recent_data = b"".join(self.recent_frames) if self.datagram_clients else None
+
+            for player_id, connection in self.clients.items():
+                view = self.views.get(player_id)
+
+                # Players with a view get its frame (a keyframe if they reported a gap)
+                if view is not None:
+                    data, view_keyframe = view.encode(game_state, str(player_id), self.tick,
+                                                      player_id in self.keyframe_requests)
+                    (VIEW_KEYFRAME_BYTES if view_keyframe else VIEW_DELTA_BYTES).observe(len(data))
+                    datagram_data = b"".join(view.recent_frames)
+
+                # Clients that reported a gap get a full snapshot instead of the delta
+                elif player_id in self.keyframe_requests:
+                    if keyframe_data is None:
+                        keyframe_data = self.encoder.keyframe(game_state, self.tick)
+                    data = datagram_data = keyframe_data
+                else:
+                    data, datagram_data = broadcast_data, recent_data
+
+                # Players on UDP get it as a datagram (the result still goes over TCP)
+                endpoint = self.datagram_clients.get(player_id)
+                if endpoint is not None and len(datagram_data) <= protocol.MAX_DATAGRAM_SIZE:
+                    endpoint.seq += 1
+                    outgoing[endpoint] = protocol.encode_datagram(endpoint.seq, self.tick, datagram_data)
+                    if game_over_data:
+                        outgoing[connection] = game_over_data
+                else:
+                    outgoing[connection] = data + game_over_data
+
+            self.keyframe_requests.clear()
+
+            # Same bytes for every spectator; a keyframe is added when one has to start over
+            if len(self.spectators):
+                spectator_data = broadcast_data + game_over_data
+                resync_data = spectator_data if is_keyframe else None
+                if resync_data is None and self.spectators.wants_keyframe:
+                    if keyframe_data is None:
+                        keyframe_data = self.encoder.keyframe(game_state, self.tick)
+                    resync_data = keyframe_data + game_over_data
+                self.spectators.publish(spectator_data, resync_data)
+
+        encoded = time.perf_counter()
+        SIMULATE_PHASE.observe(simulated - locked)
+        ENCODE_PHASE.observe(encoded - simulated)
+        if timings is not None:
+            timings["encode"] = encoded - simulated
+
+        # Write the finished match's replay outside the lock
+        if replay_data is not None:
+            self._save_replay(replay_data)
+
+        return outgoing, True
+
+    def _save_replay(self, replay_data):
+        """
+        Parameters: encoded replay of a finished match (replay_data)
+
+        Function for writing a replay to the room's replay directory (without holding the lock).
+
+        Returns: NULL (Nothing)
+        """
+        try:
+            path = replay.save(self.replay_dir, self.room_id, replay_data)
+            print(f"Room {self.room_id}: replay saved to {path} ({len(replay_data)} bytes)")
+        except OSError as e:
+            print(f"Room {self.room_id}: could not save replay: {e}")
+
+
+class RoomManager:
+    """
+    Matches connecting clients into rooms and keeps finished rooms for reuse.
+    on_create(room) is called once for every new room so the server can start
+    advancing it (a thread or an asyncio task). Room numbers start at first_room_id
+    and go up by room_id_step, so several managers can share one number space.
+    Matches run at default_tick_rate unless the player opening a room asks for another rate.
+    Rooms record their matches to replay_dir when one is given, and send each player only
+    its surroundings when view_radius (in cells) is not 0. With arena, every room is an arena.
+    """
+
+    def __init__(self, default_size, on_create, first_room_id=0, room_id_step=1,
+                 default_tick_rate=DEFAULT_TICK_RATE, replay_dir=None, view_radius=0, arena=False):
+        self.default_size = default_size
+        self.replay_dir = replay_dir
+        self.view_radius = view_radius
+        self.arena = arena
+        self.max_size = MAX_ARENA_SIZE if arena else MAX_ROOM_SIZE
+        self.default_tick_rate = default_tick_rate
+        self.on_create = on_create
+        self.rooms = {}
+        self.next_room_id = first_room_id
+        self.room_id_step = room_id_step
+        self.lock = threading.Lock()
+
+    def _create_room(self, size, tick_rate):
+        """
+        Parameters: number of players for the room (size), ticks per second of its matches (tick_rate)
+
+        Function for opening a new room and handing it to the server to be advanced.
+
+        Returns: The new room
+        """
+        room = Room(self.next_room_id, size, tick_rate, self.replay_dir, self.view_radius, self.arena)
+        self.rooms[room.room_id] = room
+        self.next_room_id += self.room_id_step
+        print(f"{'Arena' if self.arena else 'Room'} {room.room_id} created for {size} players at {tick_rate} ticks/s")
+        self.on_create(room)
+        return room
+
+    def _find_room(self, size, tick_rate):
+        """
+        Parameters: number of players wanted (size), ticks per second wanted (tick_rate)
+
+        Function for picking a room for quick matching: a waiting room of that size and
+        tick rate that already has players, otherwise any empty room, otherwise a new one.
+
+        Returns: Room to join
+        """
+        idle_room = None
+        for room in self.rooms.values():
+            if not room.is_joinable():
+                continue
+            if room.is_empty():
+                idle_room = idle_room or room
+            elif room.max_players == size and room.tick_rate == tick_rate:
+                return room
+        return idle_room or self._create_room(size, tick_rate)
+
+    def spectate(self, connection, room_id=None):
+        """
+        Parameters: connection of the spectator (connection), room to watch or None for the busiest (room_id)
+
+        Function for attaching a spectator to a room.
+
+        Returns: Room watched
+        """
+        with self.lock:
+            if room_id is None:
+                room = max(self.rooms.values(), key=lambda room: (room.countdown_started, len(room.clients)), default=None)
+            else:
+                room = self.rooms.get(room_id)
+            if room is None:
+                raise RoomError("No room to watch" if room_id is None else f"Room {room_id} does not exist")
+
+        room.add_spectator(connection)
+        return room
+
+    def join(self, connection, room_id=None, max_players=0, create=False, tick_rate=0):
+        """
+        Parameters: connection of the new player (connection), room to join or None for any (room_id),
+                    preferred room size, 0 for the server default (max_players),
+                    whether to open a fresh room (create),
+                    preferred ticks per second, 0 for the server default (tick_rate)
+
+        Function for placing a connecting client into a room.
+
+        Returns: Room joined, player number, encoded initial data for the client
+        """
+        size = max_players or self.default_size
+        if not MIN_ROOM_SIZE <= size <= self.max_size:
+            raise RoomError(f"Rooms hold {MIN_ROOM_SIZE}-{self.max_size} players")
+
+        tick_rate = tick_rate or self.default_tick_rate
+        if not MIN_TICK_RATE <= tick_rate <= MAX_TICK_RATE:
+            raise RoomError(f"Matches run at {MIN_TICK_RATE}-{MAX_TICK_RATE} ticks per second")
+
+        with self.lock:
+
+            # Open a new room (reusing an empty one if possible)
+            if create:
+                room = next((room for room in self.rooms.values() if room.is_empty() and room.is_joinable()), None)
+                room = room or self._create_room(size, tick_rate)
+
+            # Join a specific room
+            elif room_id is not None:
+                room = self.rooms.get(room_id)
+                if room is None:
+                    raise RoomError(f"Room {room_id} does not exist")
+                size = tick_rate = 0
+
+            # Quick match
+            else:
+                room = self._find_room(size, tick_rate)
+
+            player_id, initial_data = room.add_player(connection, size, tick_rate)
+
+        return room, player_id, initial_data
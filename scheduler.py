@@ -0,0 +1,165 @@
+import time
+
+
+"""
+Fixed-timestep tick scheduling for the game loops.
+Tick n of a schedule is due at a fixed point on the monotonic clock (start + n / rate),
+so the time spent running a tick, sending its messages or oversleeping never pushes the
+later deadlines back and the real tick rate does not drift with load. Each tick records
+how late it started. A loop that falls behind runs a bounded number of ticks back to back
+to catch up and then skips the rest of the missed deadlines instead of spiralling.
+"""
+
+
+# Most ticks run back to back when a loop has fallen behind (older deadlines are skipped)
+MAX_CATCH_UP = 3
+
+
+class TickScheduler:
+    """
+    Absolute-deadline tick schedule for one match. Loops call due() to learn how many
+    ticks to run now, next_tick() before each of them, and wait delay() seconds after.
+    The tick attribute is the number of ticks started so far.
+    """
+
+    def __init__(self, tick_rate, max_catch_up=MAX_CATCH_UP, clock=time.monotonic):
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        self.tick = 0
+        self.anchor_time = None
+        self.anchor_tick = 0
+        self.set_rate(tick_rate)
+        self.reset_stats()
+
+    def reset_stats(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for clearing the lateness statistics.
+
+        Returns: NULL (Nothing)
+        """
+        self.ticks = 0
+        self.late_ticks = 0
+        self.skipped_ticks = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+        self.last_lateness = 0.0
+
+    def set_rate(self, tick_rate):
+        """
+        Parameters: ticks per second (tick_rate)
+
+        Function for changing the tick rate. The next deadline stays where it is and the
+        following ones are spaced at the new interval.
+
+        Returns: NULL (Nothing)
+        """
+        if self.anchor_time is not None:
+            self.anchor_time = self.deadline()
+            self.anchor_tick = self.tick
+        self.tick_rate = tick_rate
+        self.interval = 1 / tick_rate
+
+    def start(self, now=None):
+        """
+        Parameters: current monotonic time, None to read the clock (now)
+
+        Function for (re)starting the schedule: the next tick is due immediately.
+        Used when a loop first picks up the match or after it was paused or moved.
+
+        Returns: NULL (Nothing)
+        """
+        self.anchor_time = self.clock() if now is None else now
+        self.anchor_tick = self.tick
+
+    def deadline(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for finding when the next tick is due.
+
+        Returns: Monotonic time of the next deadline
+        """
+        return self.anchor_time + (self.tick - self.anchor_tick) * self.interval
+
+    def due(self, now=None):
+        """
+        Parameters: current monotonic time, None to read the clock (now)
+
+        Function for counting the ticks whose deadline has passed. When more than
+        max_catch_up are missed, the schedule is moved forward by whole intervals
+        so only max_catch_up of them are run.
+
+        Returns: Number of ticks to run now
+        """
+        if now is None:
+            now = self.clock()
+        if self.anchor_time is None:
+            self.start(now)
+
+        late = now - self.deadline()
+        if late < 0:
+            return 0
+
+        missed = int(late / self.interval) + 1
+        if missed > self.max_catch_up:
+            skipped = missed - self.max_catch_up
+            self.anchor_time += skipped * self.interval
+            self.skipped_ticks += skipped
+            missed = self.max_catch_up
+        return missed
+
+    def next_tick(self, now=None):
+        """
+        Parameters: current monotonic time, None to read the clock (now)
+
+        Function for starting the next tick and recording how late it started.
+
+        Returns: Number of the tick (counting from 1)
+        """
+        if now is None:
+            now = self.clock()
+        if self.anchor_time is None:
+            self.start(now)
+
+        lateness = max(0.0, now - self.deadline())
+        self.last_lateness = lateness
+        self.total_lateness += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        if lateness >= self.interval:
+            self.late_ticks += 1
+
+        self.ticks += 1
+        self.tick += 1
+        return self.tick
+
+    def delay(self, now=None):
+        """
+        Parameters: current monotonic time, None to read the clock (now)
+
+        Function for finding how long a loop may sleep before the next tick is due.
+
+        Returns: Seconds until the next deadline (0 if it has passed)
+        """
+        if self.anchor_time is None:
+            return 0.0
+        if now is None:
+            now = self.clock()
+        return max(0.0, self.deadline() - now)
+
+    def stats(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for summarizing the lateness statistics since the last reset.
+
+        Returns: Dictionary of ticks, late ticks, skipped ticks, mean and max lateness (seconds)
+        """
+        return {
+            "ticks": self.ticks,
+            "late_ticks": self.late_ticks,
+            "skipped_ticks": self.skipped_ticks,
+            "lateness_mean": self.total_lateness / self.ticks if self.ticks else 0.0,
+            "lateness_max": self.max_lateness
+        }
@@ -1,629 +1,608 @@
-import pygame
 import socket
-import pickle
 import threading
-import random
+import argparse
+import asyncio
+import json
+import signal
 import time
+import connections
+import engine
+import interest
+import metrics
+import profiling
+import protocol
+import rooms
+import udp
 
 
 """
-Server side of the game - contains code to initialize and run the game.
-The server-side game state contains information about the position and direction of 
-all the snakes. Information is received and broadcasted to all clients via sockets.
-The server is also responsible for handling game logic and determining winners.
-Logic includes movement, food generation, various collisions, etc.
+Server side of the game - contains code to accept players and run the matches.
+Players connect to one port and are placed into rooms; every room holds the game state
+of one match (position and direction of all its snakes). Information is received and
+broadcasted to the clients of each room via sockets.
+The game logic itself (movement, food generation, various collisions, etc.) lives in engine.py.
+The server is headless (it never imports pygame) and is configured with command-line
+flags or a JSON config file.
+Nothing is written to a client while a room's lock is held, and every client has its
+own bounded send queue (see connections.py), so a slow client only ever delays itself.
+Clients can also join a room as spectators: they receive the room's broadcasts from a
+shared feed served apart from the game loop, and never get a snake.
+With --udp-port, players that ask for it get the game state over UDP (see udp.py).
+The server keeps metrics on its ticks, traffic and clients (see metrics.py); with
+--metrics-port they are served in the Prometheus text format at /metrics.
+Ticks can be timed by phase (--profile-phases, --slow-tick-ms), and sending the server
+SIGUSR1 writes a cProfile dump of its next --profile-ticks ticks (see profiling.py).
+With --view-radius, players on a large board are only sent the snakes and food near
+their own snake (see interest.py).
 """
 
 
-# Server Constants (defines screen size, ports, etc.)
+# Server Constants (defines ports, speed, etc.)
 HOST = '0.0.0.0'
 PORT = 5555
-GAME_WIDTH = 800
-GAME_HEIGHT = 800
-SPACE_SIZE = 20
-BODY_PARTS = 3
 SPEED = 10
 
-# Unique starting positions and directions for each player
-starting_positions = [
-    {"pos": [100, 100], "direction": "RIGHT"},
-    {"pos": [900, 900], "direction": "LEFT"},
-    {"pos": [100, 900], "direction": "RIGHT"},
-    {"pos": [900, 100], "direction": "LEFT"}
-]
-
-# Initialize clients and max_player count
-clients = {}
-max_players = 0
-
-# Get user input to decide player count
-# try:
-#     max_players = min(4, max(2, int(input("Enter number of players (2-4): "))))
-
-# # At minimum, 2 players are required to proceed
-# except: 
-#     max_players = 2
-#     print("Invalid input. Using 2 players.")
-
-# Get user input to decide player count (2-4)
-while True:
+# Room manager (created in main once the default room size is known)
+room_manager = None
+
+# UDP sessions (created in main when --udp-port is given)
+udp_sessions = None
+
+# Defaults for the rest of the configuration
+DEFAULT_PLAYERS = 2
+DEFAULT_ARENA_PLAYERS = 100
+DEFAULT_BOARD_SIZE = f"{engine.COLUMNS}x{engine.ROWS}"
+METRICS_HOST = "127.0.0.1"
+PROFILE_TICKS = 100
+
+# Metrics (rooms.py and connections.py keep their own)
+TICK_SECONDS = metrics.histogram("snake_tick_seconds", "Time to play and send one tick of a room")
+SEND_PHASE = profiling.PHASE_SECONDS.labels("send")
+TICK_LATENESS_SECONDS = metrics.histogram("snake_tick_lateness_seconds",
+                                          "How late each tick started after its deadline")
+RECEIVED_BYTES = metrics.counter("snake_received_bytes_total", "Bytes received from clients")
+RECEIVED_MESSAGES = metrics.counter("snake_received_messages_total", "Messages received from clients",
+                                    labelnames=("type",))
+CONNECTIONS = metrics.gauge("snake_connections", "Open client connections")
+ROOMS = metrics.gauge("snake_rooms", "Rooms open")
+PLAYERS = metrics.gauge("snake_players", "Players in a room")
+SPECTATORS = metrics.gauge("snake_spectators", "Spectators watching a room")
+
+# Received message counters by message type
+MESSAGE_COUNTERS = {msg_type: RECEIVED_MESSAGES.labels(name) for msg_type, name in (
+    (protocol.MSG_JOIN, "join"), (protocol.MSG_INPUT, "input"), (protocol.MSG_KEYFRAME_REQUEST, "keyframe_request"))}
+OTHER_MESSAGES = RECEIVED_MESSAGES.labels("other")
+
+
+def parse_board_size(text):
+    """
+    Parameters: board size written as COLUMNSxROWS, e.g. 40x40 (text)
+
+    Function for reading the board size option.
+
+    Returns: Columns, rows
+    """
     try:
-        max_players = int(input("Enter number of players (2-4): "))
-        if 2 <= max_players <= 4:
-            break
-        else:
-            print("Please enter a number between 2 and 4.")
+        columns, rows = (int(part) for part in text.lower().split("x"))
     except ValueError:
-        print("Invalid input. Please enter a number (2-4).")
-print(f"Starting game with {max_players} players.")
+        raise argparse.ArgumentTypeError(f"Board size must look like 40x40, not {text!r}")
+    return columns, rows
+
+
+def load_config(argv=None):
+    """
+    Parameters: command-line arguments, None for sys.argv (argv)
 
-# Variables for initial food generation (Area around the center of screen)
-CENTER_X = 500  
-CENTER_Y = 500  
-AREA_SIZE = 200  
+    Function for reading the server configuration. Values come from the command line,
+    then from the JSON file given with --config (keys named like the long options,
+    e.g. {"port": 5555, "players": 3, "board_size": "60x40", "speed": 15}), then from the defaults.
 
-# Calculate x-boundaries for the food to spawn
-MIN_X = CENTER_X - (AREA_SIZE // 2)  
-MAX_X = CENTER_X + (AREA_SIZE // 2) - SPACE_SIZE  
+    Returns: argparse namespace with host, port, players, board_size, speed, threaded, workers, replay_dir,
+             udp_port, udp_loss, metrics_host, metrics_port, profile_phases, slow_tick_ms,
+             profile_ticks, profile_dir, view_radius and arena
+    """
+    parser = argparse.ArgumentParser(description="Multiplayer Snake server")
+    parser.add_argument("--config", help="JSON file with default values for the options below")
+    parser.add_argument("--host", default=HOST, help="address to listen on")
+    parser.add_argument("--port", type=int, default=PORT, help="port to listen on")
+    parser.add_argument("--players", type=int,
+                        help=f"players per quick-match room ({rooms.MIN_ROOM_SIZE}-{rooms.MAX_ROOM_SIZE}, "
+                             f"default {DEFAULT_PLAYERS}) or arena (up to {rooms.MAX_ARENA_SIZE}, "
+                             f"default {DEFAULT_ARENA_PLAYERS})")
+    parser.add_argument("--board-size", type=parse_board_size, default=DEFAULT_BOARD_SIZE,
+                        help="board size in cells, COLUMNSxROWS")
+    parser.add_argument("--speed", type=int, default=SPEED,
+                        help="default ticks per second of a match (a room's first player may pick another)")
+    parser.add_argument("--threaded", action="store_true",
+                        help="use one thread per client instead of the asyncio event loop")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="spread rooms across this many worker processes (supervisor mode)")
+    parser.add_argument("--replay-dir",
+                        help="record every match to a replay file in this directory (see replay.py)")
+    parser.add_argument("--udp-port", type=int,
+                        help="also send the game state over UDP on this port to players that ask for it")
+    parser.add_argument("--udp-loss", type=float, default=0.0,
+                        help="fraction of UDP datagrams to drop at random, for testing")
+    parser.add_argument("--metrics-host", default=METRICS_HOST, help="address of the metrics endpoint")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve metrics in the Prometheus text format on this port (path /metrics)")
+    parser.add_argument("--profile-phases", action="store_true",
+                        help="time every tick by phase (movement, collisions, food, ...) into the metrics")
+    parser.add_argument("--slow-tick-ms", type=float, default=0.0,
+                        help="print ticks slower than this with their phase breakdown (0: off)")
+    parser.add_argument("--profile-ticks", type=int, default=PROFILE_TICKS,
+                        help="ticks profiled with cProfile when the server receives SIGUSR1")
+    parser.add_argument("--profile-dir", default=".", help="directory the SIGUSR1 profiles are written to")
+    parser.add_argument("--view-radius", type=int, default=0,
+                        help="send each player only the cells within this many of its head (0: the whole board)")
+    parser.add_argument("--arena", action="store_true",
+                        help="run arenas that players join and leave at any time, respawning when they die")
+
+    # Values from the config file replace the defaults; flags given on the command line still win
+    args, _ = parser.parse_known_args(argv)
+    if args.config:
+        with open(args.config) as config_file:
+            config = json.load(config_file)
+        options = {action.dest for action in parser._actions}
+        unknown = set(config) - options
+        if unknown:
+            parser.error(f"Unknown option(s) in {args.config}: {', '.join(sorted(unknown))}")
+        if isinstance(config.get("board_size"), str):
+            config["board_size"] = parse_board_size(config["board_size"])
+        parser.set_defaults(**config)
+    args = parser.parse_args(argv)
+
+    if args.players is None:
+        args.players = DEFAULT_ARENA_PLAYERS if args.arena else DEFAULT_PLAYERS
+    max_size = rooms.MAX_ARENA_SIZE if args.arena else rooms.MAX_ROOM_SIZE
+    if not rooms.MIN_ROOM_SIZE <= args.players <= max_size:
+        parser.error(f"--players must be between {rooms.MIN_ROOM_SIZE} and {max_size}")
+
+    # A new arena snake needs a straight run of free cells, in a row or column the food cannot fill
+    spawn_cells = engine.BODY_PARTS + engine.SPAWN_CLEARANCE
+    if args.arena and (min(args.board_size) < 2 or max(args.board_size) < spawn_cells):
+        parser.error(f"--arena needs a board at least {spawn_cells}x2 cells for a snake to spawn")
+    if not rooms.MIN_TICK_RATE <= args.speed <= rooms.MAX_TICK_RATE:
+        parser.error(f"--speed must be between {rooms.MIN_TICK_RATE} and {rooms.MAX_TICK_RATE}")
+    if args.udp_port is not None and args.workers:
+        parser.error("--udp-port cannot be combined with --workers")
+    if not 0 <= args.udp_loss < 1:
+        parser.error("--udp-loss must be between 0 and 1")
+    if not 0 <= args.view_radius <= interest.MAX_VIEW_RADIUS:
+        parser.error(f"--view-radius must be between 0 and {interest.MAX_VIEW_RADIUS}")
+    return args
+
+
+def handle_messages(connection, messages, room, player_id):
+    """
+    Parameters: connection the messages came from (connection), decoded messages (messages),
+                room the client is in or None before it joined (room), its player number (player_id)
 
-# Calculate y-boundaries for the food to spawn
-MIN_Y = CENTER_Y - (AREA_SIZE // 2)  
-MAX_Y = CENTER_Y + (AREA_SIZE // 2) - SPACE_SIZE  
+    Function for applying the messages received from a client.
+    The first message must be a join request; it places the client in a room
+    and sends back the initial player info and game state. Spectators get
+    protocol.SPECTATOR_ID as their player number; players that asked for UDP
+    are also sent an offer when the server has a UDP port.
 
-# Game state (server side that is updated with each client message)
-game_state = {
-    "players": {},
-    "food": [random.randint(MIN_X // SPACE_SIZE, MAX_X // SPACE_SIZE) * SPACE_SIZE,
-             random.randint(MIN_Y // SPACE_SIZE, MAX_Y // SPACE_SIZE) * SPACE_SIZE],
-    "scores": {},
-    "game_over": False,
-    "countdown": False,
-    "countdown_value": 3,
-    "game_started": False
-}
+    Returns: Room of the client, player number of the client
+    """
+    for msg_type, data in messages:
+        MESSAGE_COUNTERS.get(msg_type, OTHER_MESSAGES).inc()
+
+        # Not in a room yet: only a join request is accepted
+        if room is None:
+            if msg_type != protocol.MSG_JOIN:
+                raise rooms.RoomError("Expected a join request")
+
+            # Spectators are written to by the room's feed instead of the game loop
+            if data["spectate"]:
+                room = room_manager.spectate(connection, data["room_id"])
+                player_id = protocol.SPECTATOR_ID
+                print(f"Spectator joined room {room.room_id}")
+                continue
+
+            room, player_id, initial_data = room_manager.join(connection, data["room_id"], data["max_players"],
+                                                              data["create"], data["tick_rate"])
+            if data["udp"] and udp_sessions is not None:
+                initial_data += udp_sessions.offer(connection, room, player_id)
+            connection.send(initial_data)
+            print(f"Player {player_id} joined room {room.room_id}")
 
+        elif player_id == protocol.SPECTATOR_ID:
+            room.handle_spectator_message(connection, msg_type, data)
 
-# Lock for thread-safe game state updates
-game_state_lock = threading.Lock()
+        else:
+            room.handle_message(player_id, msg_type, data)
 
+    return room, player_id
 
-def initialize_snake(position, direction):
+
+def leave_room(connection, room, player_id):
     """
-    Parameters: position (x,y) of the snake, direction (left, right, etc.) of the snake)
+    Parameters: connection that is going away (connection), room of the client (room),
+                its player number (player_id)
 
-    Function for initializing snakes using their position and direction.
-    Sets up the head and body of the snake in the direction it's facing.
+    Function for taking a disconnected player or spectator out of its room.
 
-    Returns: List of positions called 'coordinates' that represents the snake 
+    Returns: NULL (Nothing)
     """
+    if player_id == protocol.SPECTATOR_ID:
+        room.remove_spectator(connection)
+    else:
+        room.remove_player(player_id, connection)
+        if udp_sessions is not None:
+            udp_sessions.forget(connection)
 
-    # Variables 
-    coordinates = []
-    x, y = position
-    
-    # Initialize based on direction
-    if direction == "RIGHT":
-        for i in range(BODY_PARTS):
-            coordinates.append([x - i * SPACE_SIZE, y])
 
-    elif direction == "LEFT":
-        for i in range(BODY_PARTS):
-            coordinates.append([x + i * SPACE_SIZE, y])
+def watch_rooms(manager):
+    """
+    Parameters: room manager of the server (manager)
 
-    elif direction == "UP":
-        for i in range(BODY_PARTS):
-            coordinates.append([x, y + i * SPACE_SIZE])
+    Function for having the room, player and spectator gauges read from the rooms whenever
+    the metrics are rendered (nothing is updated on the game's path).
 
-    elif direction == "DOWN":
-        for i in range(BODY_PARTS):
-            coordinates.append([x, y - i * SPACE_SIZE])
-    
-    return coordinates
+    Returns: NULL (Nothing)
+    """
+    ROOMS.set_function(lambda: len(manager.rooms))
+    PLAYERS.set_function(lambda: sum(len(room.clients) for room in list(manager.rooms.values())))
+    SPECTATORS.set_function(lambda: sum(len(room.spectators) for room in list(manager.rooms.values())))
 
 
-def handle_client(conn, addr, player_id):
+def handle_client(conn, addr):
     """
-    Parameters: socket connection object (conn), address of client (addr), player number (player_id)  
+    Parameters: socket connection object (conn), address of client (addr)
+
+    Function for handling the different snakes (threaded server, one thread per client).
+    Places the client in a room, then applies its messages until it disconnects.
 
-    Function for handling the different snakes.
-    Uses initialize_snake(position, direction) to set up the snakes and sends the information to clients.
-    Handles movements and ensures snakes don't 180-degree collide on themselves.
-    
     Returns: NULL (Nothing)
     """
+    connection = connections.SocketConnection(conn)
+    room = None
+    player_id = None
+    CONNECTIONS.inc()
+
+    # Decoder for the client's byte stream
+    decoder = protocol.StreamDecoder()
 
-    # Global server game state
-    global game_state
     try:
 
-        # Initialize player in game state
-        with game_state_lock:
-            start_data = starting_positions[player_id]
-            initial_body = initialize_snake(start_data["pos"], start_data["direction"])
-            
-            game_state["players"][str(player_id)] = {
-                "body": initial_body,
-                "direction": start_data["direction"]
-            }
-            game_state["scores"][str(player_id)] = 0
-        
-        # Send initial player info, game state, and max_players
-        initial_data = {
-            "player_id": player_id,
-            "game_state": game_state,
-            "max_players": max_players  
-        }
-        conn.send(pickle.dumps(initial_data))
-        
-        # While snake is active 
+        # While snake is active
         while True:
-            try:
 
-                # Load data from clients
-                data = pickle.loads(conn.recv(1024))
-
-                # Validate and update player direction 
-                if "direction" in data and "player_id" in data:
-                    with game_state_lock:
-                        player_key = str(data["player_id"])
-
-                        # Ensure the player exists
-                        if player_key in game_state["players"]:
-                            current_direction = game_state["players"][player_key]["direction"]
-                            new_direction = data["direction"]
-                            
-                            # Server-side validation to prevent 180-degree turns
-                            valid_change = True
-                            if (current_direction == 'UP' and new_direction == 'DOWN') or \
-                               (current_direction == 'DOWN' and new_direction == 'UP') or \
-                               (current_direction == 'LEFT' and new_direction == 'RIGHT') or \
-                               (current_direction == 'RIGHT' and new_direction == 'LEFT'):
-                                valid_change = False
-                                
-                            # Apply new direction 
-                            if valid_change:
-                                game_state["players"][player_key]["direction"] = new_direction
-
-            # Exception for errors during data processing
-            except Exception as e:
-                print(f"Error processing client {player_id} data: {e}")
+            # Load data from clients (a read may hold several messages or only part of one)
+            chunk = conn.recv(1024)
+            if not chunk:
+                print(f"Client {addr} disconnected")
                 break
+            RECEIVED_BYTES.inc(len(chunk))
+
+            room, player_id = handle_messages(connection, decoder.feed(chunk), room, player_id)
 
-    # Exception for errors during connection
+    # Exception for clients that could not be placed in a room
+    except rooms.RoomError as e:
+        print(f"Refused client {addr}: {e}")
+        connection.send(protocol.encode_error(str(e)))
+
+    # Exception for errors during data processing
     except Exception as e:
-        print(f"Initial connection error with player {player_id}: {e}")
+        print(f"Error processing client {addr} data: {e}")
 
     # Clean up remaining resources
     finally:
-        with game_state_lock:
-            if str(player_id) in game_state["players"]:
-                del game_state["players"][str(player_id)]
+        if room is not None:
+            leave_room(connection, room, player_id)
+        CONNECTIONS.dec()
 
-            if str(player_id) in game_state["scores"]:
-                del game_state["scores"][str(player_id)]
+        # Close connection
+        connection.close()
 
-        if player_id in clients:
-            del clients[player_id]
 
-        # Close connection
-        conn.close()
+async def handle_client_async(reader, writer):
+    """
+    Parameters: asyncio stream reader (reader) and writer (writer) of a new connection
+
+    Coroutine for handling the different snakes (asyncio server, one task per client).
+    Behaves like handle_client without blocking the event loop.
+
+    Returns: NULL (Nothing)
+    """
+    connection = connections.StreamConnection(writer)
+    addr = writer.get_extra_info("peername")
+    room = None
+    player_id = None
+    print(f"Client connected from {addr}")
+    CONNECTIONS.inc()
+
+    # Decoder for the client's byte stream
+    decoder = protocol.StreamDecoder()
+
+    try:
+
+        # While snake is active
+        while True:
+            chunk = await reader.read(1024)
+            if not chunk:
+                print(f"Client {addr} disconnected")
+                break
+            RECEIVED_BYTES.inc(len(chunk))
+
+            room, player_id = handle_messages(connection, decoder.feed(chunk), room, player_id)
+
+    # Exception for clients that could not be placed in a room
+    except rooms.RoomError as e:
+        print(f"Refused client {addr}: {e}")
+        connection.send(protocol.encode_error(str(e)))
 
+    # Exception for errors during data processing
+    except Exception as e:
+        print(f"Error processing client {addr} data: {e}")
+
+    # Clean up remaining resources
+    finally:
+        if room is not None:
+            leave_room(connection, room, player_id)
+        CONNECTIONS.dec()
+        connection.close()
 
-def move_snake(player_id, player_data):
+
+def send_outgoing(room, outgoing):
     """
-    Parameters: player number (player_id), dictionary of a player that contains position coordinates direction (player_data)
+    Parameters: room the data comes from (room), dictionary of connection -> bytes to send (outgoing)
+
+    Function for queueing a pass's messages on each client's connection.
+    A client whose queue is full has the message dropped and gets a keyframe on the next tick.
 
-    Function that moves the snake in the current direction.
-    If the snake lands on a food tile, update accordingly.
-    
-    Returns: Boolean called food_collision that says whether or not a snake has eaten an apple
+    Returns: NULL (Nothing)
     """
+    for connection, data in outgoing.items():
+        if not connection.send(data):
+            room.request_keyframe(connection)
 
-    # Variables
-    direction = player_data["direction"]
-    body = player_data["body"]
-    head_x, head_y = body[0]
-    
-    # Calculate new head position
-    if direction == "UP":
-        new_head = [head_x, head_y - SPACE_SIZE]
 
-    elif direction == "DOWN":
-        new_head = [head_x, head_y + SPACE_SIZE]
+def advance_room(room):
+    """
+    Parameters: room to advance (room)
 
-    elif direction == "LEFT":
-        new_head = [head_x - SPACE_SIZE, head_y]
+    Function for running one pass of a room and queueing its messages (outside the lock).
 
-    elif direction == "RIGHT":
-        new_head = [head_x + SPACE_SIZE, head_y]
-    
-    # Insert new head
-    body.insert(0, new_head)
-    
-    # Boolean for food collisions
-    food_collision = False
+    Returns: Boolean of whether a tick of play ran, seconds spent queueing the messages
+    """
+    outgoing, played = room.advance()
 
-    # If a food collision has occured
-    if new_head[0] == game_state["food"][0] and new_head[1] == game_state["food"][1]:
+    # Broadcast to all clients (outside the lock)
+    sending = time.perf_counter()
+    send_outgoing(room, outgoing)
+    return played, time.perf_counter() - sending
 
-        # Increase score of the snake that ate it
-        game_state["scores"][player_id] += 1
 
-        # Generate new food (food has been eaten)
-        food_collision = True
+def run_tick(room):
+    """
+    Parameters: room to advance (room)
 
-    else:
+    Function for running one pass of a room and recording the tick's timing
+    (under cProfile while a capture runs, by phase while phase timing is on).
 
-        # Remove tail if no food was eaten
-        body.pop()
-    
-    return food_collision
-
-
-# def check_collision(player_id, player_data):
-#     """
-#     Parameters: player number (player_id), dictionary of a player that contains position coordinates direction (player_data)
-
-#     *** TESTING FUNCTION ***
-#     Used to run the game without any collision logic.
-
-#     Returns: Boolean (False) so that snake never dies
-#     """
-
-#     # Variables
-#     head_x, head_y = player_data["body"][0]
-#     collision_occurred = False
-#     collision_type = ""
-    
-#     # Check wall collision (wrap around instead of dying)
-#     if head_x < 0:
-
-#         # Wrap to right side
-#         player_data["body"][0][0] = GAME_WIDTH - SPACE_SIZE
-#         collision_occurred = True
-#         collision_type = "wall (left)"
-
-#     elif head_x >= GAME_WIDTH:
-
-#         # Wrap to left side
-#         player_data["body"][0][0] = 0
-#         collision_occurred = True
-#         collision_type = "wall (right)"
-    
-#     if head_y < 0:
-
-#         # Wrap to bottom
-#         player_data["body"][0][1] = GAME_HEIGHT - SPACE_SIZE
-#         collision_occurred = True
-#         collision_type = "wall (top)"
-
-#     elif head_y >= GAME_HEIGHT:
-
-#         # Wrap to top
-#         player_data["body"][0][1] = 0
-#         collision_occurred = True
-#         collision_type = "wall (bottom)"
-    
-#     # Check self collision (log it for debugging)
-#     for segment in player_data["body"][1:]:
-#         if head_x == segment[0] and head_y == segment[1]:
-#             collision_occurred = True
-#             collision_type = "self"
-#             break
-    
-#     # Check collision with other snakes (log it for debugging)
-#     for other_id, other_data in game_state["players"].items():
-#         if other_id == player_id:
-#             continue
-        
-#         for segment in other_data["body"]:
-#             if head_x == segment[0] and head_y == segment[1]:
-#                 collision_occurred = True
-#                 collision_type = f"player {other_id}"
-#                 break
-    
-#     # Log collision for debugging, but continue the game
-#     if collision_occurred:
-#         print(f"Player {player_id} collision with {collision_type} detected (snake survives - testing)")
-    
-#     # Always return False so the player doesn't die
-#     return False
-
-
-def check_collision(player_id, player_data):
-    """
-    Parameters: player number (player_id), dictionary of a player that contains position coordinates direction (player_data)
-
-    Function that implements the collision logic for the snakes.
-    Upon wall collision, snake dies
-    Upon self collision, snake dies
-    Upon collision with other snake's tail, snake dies
-    Upon head-to-head collision, the longer snake survives and a tied length means both die
-    
-    Returns: Boolean of whether or not the snake should die, list of other snakes that should die from this collision
-    """
-
-    # Variables
-    head_x, head_y = player_data["body"][0]
-    additional_deaths = []
-    
-    # Check wall collision
-    if (head_x < 0 or head_x >= GAME_WIDTH or 
-        head_y < 0 or head_y >= GAME_HEIGHT):
-        print(f"Player {player_id} died by hitting a wall")
-        return True, additional_deaths
-    
-    # Check self collision 
-    for segment in player_data["body"][1:]:
-        if head_x == segment[0] and head_y == segment[1]:
-            print(f"Player {player_id} died by hitting own tail")
-            return True, additional_deaths
-    
-    # Check collision with other snakes
-    for other_id, other_data in game_state["players"].items():
-        if other_id == player_id:
-            continue
-        
-        other_head = other_data["body"][0]
-        
-        # Head-to-head collision
-        if head_x == other_head[0] and head_y == other_head[1]:
-
-            # Compare snake lengths to determine winner
-            my_length = len(player_data["body"])
-            other_length = len(other_data["body"])
-                
-            # This snake wins            
-            if my_length > other_length:
-                print(f"Head collision: Player {player_id} wins against Player {other_id} ({my_length} vs {other_length})")
-                additional_deaths.append(other_id)
-                return False, additional_deaths
-
-            # Other snake wins
-            elif other_length > my_length:
-                print(f"Head collision: Player {player_id} loses to Player {other_id} ({my_length} vs {other_length})")
-                return True, additional_deaths
-            
-            # Tie - both snakes lose            
-            else:
-                print(f"Head collision: Players {player_id} and {other_id} tie and both die ({my_length} segments)")
-                additional_deaths.append(other_id)
-                return True, additional_deaths
-        
-        # Collision with other snake's body (except the head)
-        for segment in other_data["body"][1:]:
-            if head_x == segment[0] and head_y == segment[1]:
-                print(f"Player {player_id} died by hitting Player {other_id}'s tail")
-                return True, additional_deaths
-    
-    # No collisions detected
-    return False, additional_deaths
-
-
-def generate_new_food():
+    Returns: NULL (Nothing)
     """
-    Parameters: NULL (Nothing)
+    started = time.perf_counter()
+    TICK_LATENESS_SECONDS.observe(room.scheduler.last_lateness)
+    played, send_time = profiling.capture.run(advance_room, room)
+    if played:
+        total = time.perf_counter() - started
+        SEND_PHASE.observe(send_time)
+        TICK_SECONDS.observe(total)
+        if room.timings is not None:
+            room.timings["send"] = send_time
+            profiling.finish_tick(room, room.timings, total)
+
+
+def room_loop(room):
+    """
+    Parameters: room to run (room)
 
-    Function for finding the new coordinates for the food to generate. 
-    Position cannot be where a snake currently resides on.
+    Function for running the matches of one room (threaded server).
+    Calls room.advance() on every tick of the room's scheduler and queues the resulting
+    messages on the clients' connections (their writer threads do the socket writes).
 
-    Returns: Pair of coordinates that represents the new spawnpoint for food 
+    Returns: NULL (Nothing)
     """
 
-    # Variable
-    occupied_positions = []
-    
-    # Collect all snake positions
-    for player_data in game_state["players"].values():
-        occupied_positions.extend(player_data["body"])
-    
-    # Generate positions until we find one that doesn't overlap
+    # Main loop of the game
     while True:
-        food_x = random.randint(0, (GAME_WIDTH-SPACE_SIZE) // SPACE_SIZE) * SPACE_SIZE
-        food_y = random.randint(0, (GAME_HEIGHT-SPACE_SIZE) // SPACE_SIZE) * SPACE_SIZE
-        
-        # If found, return the coordinates
-        if [food_x, food_y] not in occupied_positions:
-            return [food_x, food_y]
+        for _ in range(room.scheduler.due()):
+            room.scheduler.next_tick()
+            run_tick(room)
+
+        # Control game speed (sleep until the next deadline)
+        time.sleep(room.scheduler.delay())
 
 
-def game_loop():
+def spectator_loop(room):
     """
-    Parameters: NULL (Nothing)
+    Parameters: room to serve (room)
+
+    Function for writing a room's feed to its spectators whenever something was published
+    (threaded server, one thread per room next to its game loop).
+
+    Returns: NULL (Nothing)
+    """
+    feed = room.spectators
+    while True:
+        feed.updated.wait()
+        feed.serve()
 
-    Function for running the main game itself.
-    Enforces logic and ensures the game is ran to completion.
+
+async def room_task(room):
+    """
+    Parameters: room to run (room)
+
+    Coroutine for running the matches of one room (asyncio server) at the room's tick rate.
+    Writes never block: each stream writer buffers its data (up to its limit) and the event loop flushes it.
 
     Returns: NULL (Nothing)
     """
 
-    # Global server game state and time
-    global game_state
-    clock = pygame.time.Clock() if 'pygame' in globals() else None
-    
-    # Countdown variables
-    countdown_started = False
-    last_countdown_time = 0
-    
     # Main loop of the game
     while True:
+        for _ in range(room.scheduler.due()):
+            room.scheduler.next_tick()
+            run_tick(room)
 
-        # Variables to be updated
-        food_eaten = False
-        players_to_remove = []
-        
-        with game_state_lock:
-
-            # Check if all players have connected
-            if len(game_state["players"]) == max_players and not game_state["game_started"] and not countdown_started:
-                print("All players connected. Starting countdown...")
-                game_state["countdown"] = True
-                countdown_started = True
-                last_countdown_time = time.time()
-                game_state["countdown_value"] = 3
-                
-                # Broadcast countdown start
-                try:
-                    broadcast_data = pickle.dumps(game_state)
-                    for client in clients.values():
-                        client.send(broadcast_data)
-                        
-                # Exception for error in broadcasting to clients        
-                except Exception as e:
-                    print(f"Error broadcasting countdown: {e}")
-            
-            # Handle countdown
-            if countdown_started and not game_state["game_started"]:
-                current_time = time.time()
-
-                # Increment countdown
-                if current_time - last_countdown_time >= 1:
-                    game_state["countdown_value"] -= 1
-                    last_countdown_time = current_time
-                    print(f"Countdown: {game_state['countdown_value']}")
-                    
-                    # Broadcast updated countdown
-                    try:
-                        broadcast_data = pickle.dumps(game_state)
-                        for client in clients.values():
-                            client.send(broadcast_data)
-
-                    # Exception for error in broadcasting to clients
-                    except Exception as e:
-                        print(f"Error broadcasting countdown update: {e}")
-                    
-                    # Start the game when countdown reaches 0
-                    if game_state["countdown_value"] <= 0:
-                        game_state["countdown"] = False
-                        game_state["game_started"] = True
-                        print("Game started!")
-                        
-                        # Broadcast game start
-                        try:
-                            broadcast_data = pickle.dumps(game_state)
-                            for client in clients.values():
-                                client.send(broadcast_data)
-
-                        # Exception for error in broadcasting for clients
-                        except Exception as e:
-                            print(f"Error broadcasting game start: {e}")
-                
-                # Skip the rest of the game logic until countdown finishes
-                if not game_state["game_started"]:
-                    time.sleep(0.1)  # Prevent CPU usage hogging
-                    continue
-            
-            # Only proceed if the game has started and there are at least 2 players
-            active_players = len(game_state["players"])
-            if not game_state["game_started"] or active_players < 2:
-                time.sleep(0.1)  # Prevent CPU usage hogging
-                continue
-            
-            # Process each player
-            for player_id, player_data in list(game_state["players"].items()):
-
-                # Skip already removed players
-                if player_id in players_to_remove:
-                    continue
-                    
-                # Move snake
-                if move_snake(player_id, player_data):
-                    food_eaten = True
-                
-                # Check collisions 
-                should_die, others_to_kill = check_collision(player_id, player_data)
-                
-                # If a snake has crashed or should be removed
-                if should_die:
-                    players_to_remove.append(player_id)
-                
-                # Add any other players that should die from this collision
-                for other_id in others_to_kill:
-                    if other_id not in players_to_remove:
-                        players_to_remove.append(other_id)
-            
-            # Generate new food if needed
-            if food_eaten:
-                game_state["food"] = generate_new_food()
-            
-            # Remove dead players
-            for player_id in players_to_remove:
-                if player_id in game_state["players"]:
-                    print(f"Player {player_id} removed from game")
-                    del game_state["players"][player_id]
-            
-            # Check game over condition
-            remaining_players = len(game_state["players"])
-            
-            # Game ends when 0 or 1 player remains
-            if remaining_players <= 1 and active_players > 1:
-                game_state["game_over"] = True
-
-                # Last player standing wins
-                if remaining_players == 1:
-                    game_state["winner"] = list(game_state["players"].keys())[0]
-                    print(f"Game over! Player {game_state['winner']} wins!")
-
-                # Everyone has died - it's a tie
-                else:
-                    game_state["tie"] = True
-                    print("Game over! All players died - it's a tie!")
-            
-            # Broadcast updated game state to all clients
-            try:
-                broadcast_data = pickle.dumps(game_state)
-                for client in clients.values():
-                    client.send(broadcast_data)
-
-            # Exception in the case of failed broadcasting
-            except Exception as e:
-                print(f"Error broadcasting: {e}")
-        
-        # Control game speed
-        if clock:
-            clock.tick(SPEED)
-        else:
-            time.sleep(1/SPEED)
+        # Spectators are written to in a callback of their own, after this task yields
+        if room.spectators.updated.is_set():
+            asyncio.get_running_loop().call_soon(room.spectators.serve)
 
-# Start server and wait for players
-server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server.bind((HOST, PORT))
-server.listen(max_players)
+        # Control game speed (sleep until the next deadline)
+        await asyncio.sleep(room.scheduler.delay())
 
-print(f"Server started. Waiting for {max_players} players...")
-player_count = 0
 
-# Start game loop in a separate thread
-game_thread = threading.Thread(target=game_loop, daemon=True)
-game_thread.start()
+def serve_threaded(host, port, default_size, speed, replay_dir=None, view_radius=0, arena=False):
+    """
+    Parameters: address to listen on (host, port), number of players in a quick-match room (default_size),
+                default ticks per second (speed), directory for match replays, None to not record (replay_dir),
+                radius of each player's view in cells, 0 for the whole board (view_radius),
+                whether rooms are arenas (arena)
+
+    Function for running the threaded server: one thread per client and one per room.
+
+    Returns: NULL (Nothing)
+    """
+    global room_manager
 
-# Accept player connections
-while player_count < max_players:
+    # Every new room gets its own game loop thread and spectator thread
+    def start_room(room):
+        threading.Thread(target=room_loop, args=(room,), daemon=True).start()
+        threading.Thread(target=spectator_loop, args=(room,), daemon=True).start()
+
+    room_manager = rooms.RoomManager(default_size, start_room, default_tick_rate=speed, replay_dir=replay_dir,
+                                     view_radius=view_radius, arena=arena)
+    watch_rooms(room_manager)
+    if udp_sessions is not None:
+        udp.serve_threaded(host, udp_sessions)
+
+    # Start server and wait for players
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind((host, port))
+    server.listen()
+
+    print(f"Server started on port {port}. Waiting for players...")
+
+    # Accept player connections
     try:
-        conn, addr = server.accept()
-        print(f"Player {player_count + 1} connected from {addr}")
-        
-        clients[player_count] = conn
-        
-        thread = threading.Thread(target=handle_client, args=(conn, addr, player_count))
-        thread.start()
-        
-        player_count += 1
-        
-        print(f"{player_count}/{max_players} players connected")
-    
-    # Exception in the case of failed connection
-    except Exception as e:
-        print(f"Error accepting connection: {e}")
+        while True:
+            try:
+                conn, addr = server.accept()
+                print(f"Client connected from {addr}")
+                threading.Thread(target=handle_client, args=(conn, addr), daemon=True).start()
 
-print("All players connected. Game will start after the countdown.")
+            # Exception in the case of failed connection
+            except OSError as e:
+                print(f"Error accepting connection: {e}")
+
+    # Exception in the case of user-inputted server shutdown
+    except KeyboardInterrupt:
+        print("Server shutting down...")
+        server.close()
+
+
+async def serve_async(host, port, default_size, speed, replay_dir=None, view_radius=0, arena=False):
+    """
+    Parameters: address to listen on (host, port), number of players in a quick-match room (default_size),
+                default ticks per second (speed), directory for match replays, None to not record (replay_dir),
+                radius of each player's view in cells, 0 for the whole board (view_radius),
+                whether rooms are arenas (arena)
+
+    Coroutine for running the asyncio server: a single event loop owns every connection
+    and one fixed-rate task per room, so no thread is created per client.
+
+    Returns: NULL (Nothing)
+    """
+    global room_manager
+
+    # Every new room gets its own game loop task
+    room_tasks = set()
+
+    def start_room(room):
+        task = asyncio.get_running_loop().create_task(room_task(room))
+        room_tasks.add(task)
+
+    room_manager = rooms.RoomManager(default_size, start_room, default_tick_rate=speed, replay_dir=replay_dir,
+                                     view_radius=view_radius, arena=arena)
+    watch_rooms(room_manager)
+
+    server = await asyncio.start_server(handle_client_async, host, port)
+    if udp_sessions is not None:
+        await udp.serve_async(host, udp_sessions)
+    print(f"Server started on port {port}. Waiting for players...")
+
+    async with server:
+        try:
+            await server.serve_forever()
+        finally:
+            for task in room_tasks:
+                task.cancel()
+
+
+def main():
+    """
+    Parameters: NULL (Nothing)
+
+    Function for reading the server configuration and starting the selected server.
+
+    Returns: NULL (Nothing)
+    """
+    global udp_sessions
+
+    args = load_config()
+    columns, rows = args.board_size
+    engine.configure_board(columns, rows)
+    if args.arena:
+        print(f"Arenas hold up to {args.players} players on a {columns}x{rows} board at {args.speed} ticks/s.")
+    else:
+        print(f"Quick-match rooms start with {args.players} players on a {columns}x{rows} board "
+              f"at {args.speed} ticks/s.")
+    if args.replay_dir:
+        print(f"Recording match replays to {args.replay_dir}")
+    if args.view_radius:
+        print(f"Players see {args.view_radius} cells around their head")
+    if args.udp_port is not None:
+        udp_sessions = udp.Sessions(args.udp_port, args.udp_loss)
+        print(f"Game state over UDP on port {args.udp_port}" +
+              (f" (dropping {args.udp_loss:.0%} of datagrams)" if args.udp_loss else ""))
+
+    # Phase timing and profile captures (rooms of a supervisor's workers are not profiled)
+    profiling.configure(args.profile_phases, args.slow_tick_ms)
+    profiling.capture.directory = args.profile_dir
+    if hasattr(signal, "SIGUSR1") and not args.workers:
+        signal.signal(signal.SIGUSR1, lambda signum, frame: profiling.capture.request(args.profile_ticks))
+    if args.slow_tick_ms:
+        print(f"Printing ticks slower than {args.slow_tick_ms} ms")
+
+    # Rooms of a supervisor's workers keep their metrics in the worker processes
+    if args.metrics_port is not None:
+        metrics.serve(args.metrics_host, args.metrics_port)
+        print(f"Metrics at http://{args.metrics_host}:{args.metrics_port}/metrics" +
+              (" (front-end traffic only with --workers)" if args.workers else ""))
+
+    if args.workers:
+        import supervisor
+        supervisor.serve(args.host, args.port, args.players, args.workers, args.speed, args.board_size,
+                         args.replay_dir, args.view_radius, args.arena)
+        return
+
+    if args.threaded:
+        serve_threaded(args.host, args.port, args.players, args.speed, args.replay_dir, args.view_radius, args.arena)
+        return
+
+    # Exception in the case of user-inputted server shutdown
+    try:
+        asyncio.run(serve_async(args.host, args.port, args.players, args.speed, args.replay_dir, args.view_radius,
+                                args.arena))
+    except KeyboardInterrupt:
+        print("Server shutting down...")
 
-# Keep the server running
-try:
-    while True:
-        time.sleep(1)
 
-# Exception in the case of user-inputted server shutdown
-except KeyboardInterrupt:
-    print("Server shutting down...")
-    server.close()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import collections
+import threading
+
+
+"""
+Spectators watch a match without taking a player slot.
+Every message a room broadcasts while it has spectators is encoded once and appended
+to the room's SpectatorFeed; each spectator only keeps a cursor into that shared list,
+so hundreds of spectators cost one encoding per tick plus one write each.
+The feed is served outside the room's tick (by its own thread, an event loop callback
+or the supervisor front-end), so spectators can never slow down the players.
+A spectator whose connection falls behind is not buffered for: what it has not been sent
+yet is dropped and it resumes from the next keyframe.
+
+Connections stored in a feed are those of connections.py: send(data) queues without
+blocking and returns False when the data was dropped, buffered() gives the bytes not
+yet sent to the network.
+"""
+
+
+# Messages kept in a feed (spectators further behind are resynchronized)
+FEED_LENGTH = 64
+
+# Bytes a spectator's connection may hold unsent before it is resynchronized
+MAX_BACKLOG = 64 * 1024
+
+
+class SpectatorFeed:
+    """
+    Shared stream of one room's broadcasts and the spectators reading it.
+    Entries are (sequence number, data, resync data): spectators that are keeping up are
+    sent data, one that has to start over may only start from an entry with resync data
+    (a keyframe of that tick). Each local spectator maps to [next sequence number it needs,
+    whether it is waiting for a resync point, data to send before anything else].
+    Spectators served by the supervisor front-end are only counted here, by connection number (remote).
+    """
+
+    def __init__(self):
+        self.entries = collections.deque(maxlen=FEED_LENGTH)
+        self.next_seq = 0
+        self.spectators = {}
+        self.remote = set()
+        self.forwarded = 0
+        self.wants_keyframe = False
+        self.resyncs = 0
+        self.lock = threading.Lock()
+        self.updated = threading.Event()
+
+    def __len__(self):
+        return len(self.spectators) + len(self.remote)
+
+    def __getstate__(self):
+        # Rooms moved between workers take their feed along, but not its local connections or lock
+        state = dict(vars(self))
+        del state["lock"], state["updated"]
+        state["spectators"] = {}
+        return state
+
+    def __setstate__(self, state):
+        vars(self).update(state)
+        self.lock = threading.Lock()
+        self.updated = threading.Event()
+
+    def publish(self, data, resync=None):
+        """
+        Parameters: message for spectators that are keeping up (data),
+                    message a spectator can start from, if any (resync)
+
+        Function for appending one broadcast to the feed.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            self.entries.append((self.next_seq, data, resync))
+            self.next_seq += 1
+            if resync is not None:
+                self.wants_keyframe = False
+        self.updated.set()
+
+    def extend(self, entries):
+        """
+        Parameters: entries published by the feed of a room in a worker (entries)
+
+        Function for copying a remote feed's new entries into this one (supervisor front-end).
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            self.entries.extend(entries)
+            self.next_seq = entries[-1][0] + 1
+        self.updated.set()
+
+    def since(self, seq):
+        """
+        Parameters: first sequence number wanted (seq)
+
+        Function for listing the entries published from a sequence number on.
+
+        Returns: List of entries
+        """
+        with self.lock:
+            return [entry for entry in self.entries if entry[0] >= seq]
+
+    def add(self, connection, initial_data=b"", seq=None):
+        """
+        Parameters: connection of the spectator (connection), data it is sent first (initial_data),
+                    first entry it needs, None for the next one published (seq)
+
+        Function for attaching a spectator to the feed.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            self.spectators[connection] = [self.next_seq if seq is None else seq, False, initial_data]
+        self.updated.set()
+
+    def remove(self, connection):
+        """
+        Parameters: connection of the spectator (connection)
+
+        Function for detaching a spectator that disconnected.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            self.spectators.pop(connection, None)
+
+    def resync(self, connection):
+        """
+        Parameters: connection of the spectator (connection)
+
+        Function for restarting a spectator from the next keyframe (it reported a gap).
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            if connection in self.spectators:
+                self.spectators[connection][1] = True
+                self.wants_keyframe = True
+        self.updated.set()
+
+    def serve(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for sending every local spectator the entries it has not been sent yet.
+        The entries are shared: every spectator is written the same bytes objects.
+        Runs without the feed's lock held while writing.
+
+        Returns: NULL (Nothing)
+        """
+        self.updated.clear()
+        with self.lock:
+            entries = list(self.entries)
+            spectators = [(connection, list(state)) for connection, state in self.spectators.items()]
+        first_seq = entries[0][0] if entries else self.next_seq
+        next_seq = first_seq + len(entries)
+        served = []
+
+        for connection, state in spectators:
+            seq, resyncing, initial_data = state
+
+            # Behind the feed or its connection: drop what it missed, wait for a keyframe
+            if not resyncing and (seq < first_seq or connection.buffered() > MAX_BACKLOG):
+                resyncing = True
+                self.resyncs += 1
+            if resyncing and connection.buffered() > MAX_BACKLOG:
+                served.append((connection, [seq, True, initial_data]))
+                continue
+
+            parts = [initial_data] if initial_data else []
+            start = seq - first_seq
+
+            # Start over from the newest resync point it has not passed
+            if resyncing:
+                start = next((i for i in range(len(entries) - 1, max(start, 0) - 1, -1)
+                              if entries[i][2] is not None), None)
+                if start is None:
+                    served.append((connection, [seq, True, initial_data]))
+                    continue
+                parts.append(entries[start][2])
+                start += 1
+
+            parts.extend(entry[1] for entry in entries[max(start, 0):])
+
+            # A connection that refuses part of it (its queue is full) starts over as well
+            sent = all(connection.send(data) for data in parts)
+            served.append((connection, [next_seq, not sent, b""]))
+
+        with self.lock:
+            for connection, state in served:
+                if connection in self.spectators:
+                    self.spectators[connection] = state
+                    if state[1]:
+                        self.wants_keyframe = True
@@ -0,0 +1,628 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import connections
+import engine
+import protocol
+import rooms
+import spectators
+
+
+"""
+Supervisor mode - spreads rooms across a pool of worker processes so matches
+are not limited to the one core a single Python process can use.
+A front-end process owns every client socket: it decodes client frames, forwards
+them to the worker that owns the client's room and writes the frames the workers
+send back. Each worker runs its own RoomManager and advances its rooms in a
+single loop. Workers report tick-time statistics every second; the front-end
+prints them and moves a running room from an overloaded worker to an idle one.
+Spectators are served by the front-end: a watched room's worker forwards each new
+entry of the room's spectator feed once, and the front-end writes it to every spectator.
+"""
+
+
+# Seconds between worker statistics reports, printed summaries and rebalancing checks
+STATS_INTERVAL = 1
+PRINT_INTERVAL = 10
+REBALANCE_INTERVAL = 5
+
+# A worker busier than this fraction of a core may give a room to a less busy one
+REBALANCE_THRESHOLD = 0.5
+
+
+class ProxyConnection:
+    """Connection of a worker-side room: frames are queued for the front-end to write"""
+
+    def __init__(self, conn_id, events):
+        self.conn_id = conn_id
+        self.events = events
+
+    def send(self, data):
+        self.events.append(("send", self.conn_id, data))
+        return True
+
+    def close(self):
+        self.events.append(("close", self.conn_id))
+
+
+def export_room(room):
+    """
+    Parameters: room leaving this worker (room)
+
+    Function for turning a room into plain data that can be sent to another worker.
+    Connections are replaced by their connection numbers; the lock is left behind.
+
+    Returns: Dictionary of room attributes
+    """
+    blob = {name: value for name, value in vars(room).items() if name not in ("lock", "clients")}
+    blob["clients"] = {player_id: connection.conn_id for player_id, connection in room.clients.items()}
+    return blob
+
+
+def import_room(blob, events):
+    """
+    Parameters: room data built by export_room (blob), event list of this worker (events)
+
+    Function for rebuilding a room that was moved from another worker.
+
+    Returns: The room
+    """
+    room = rooms.Room.__new__(rooms.Room)
+    vars(room).update(blob)
+    room.lock = threading.Lock()
+    room.clients = {player_id: ProxyConnection(conn_id, events) for player_id, conn_id in blob["clients"].items()}
+    return room
+
+
+def worker_main(worker_id, worker_count, pipe, default_size, speed, board_size, replay_dir=None, view_radius=0,
+                arena=False):
+    """
+    Parameters: number of this worker (worker_id), workers in the pool (worker_count),
+                pipe to the front-end (pipe), quick-match room size (default_size),
+                default ticks per second (speed), board size in cells (board_size),
+                directory for match replays, None to not record (replay_dir),
+                radius of each player's view in cells, 0 for the whole board (view_radius),
+                whether rooms are arenas (arena)
+
+    Function for running a worker process: applies the front-end's commands and advances every room
+    it owns, each on its own tick scheduler.
+
+    Returns: NULL (Nothing)
+    """
+    events = []
+    sessions = {}
+    watchers = {}
+    engine.configure_board(*board_size)
+
+    # Room numbers of worker w are w, w + N, w + 2N, ... so they never collide
+    manager = rooms.RoomManager(default_size, lambda room: None, worker_id, worker_count, speed, replay_dir,
+                                view_radius, arena)
+
+    # Statistics for the current report
+    tick_count = 0
+    tick_total = 0.0
+    tick_max = 0.0
+    room_costs = {}
+    last_report = time.monotonic()
+
+    def handle_command(command):
+        kind = command[0]
+
+        # Client messages
+        if kind == "message":
+            _, conn_id, msg_type, data = command
+            if conn_id in sessions:
+                room, player_id, _ = sessions[conn_id]
+                room.handle_message(player_id, msg_type, data)
+
+        # New client asking for a room
+        elif kind == "join":
+            _, conn_id, room_id, max_players, create, tick_rate = command
+            connection = ProxyConnection(conn_id, events)
+            try:
+                room, player_id, initial_data = manager.join(connection, room_id, max_players, create, tick_rate)
+            except rooms.RoomError as e:
+                connection.send(protocol.encode_error(str(e)))
+                connection.close()
+                return
+            sessions[conn_id] = (room, player_id, connection)
+            connection.send(initial_data)
+            events.append(("joined", conn_id, room.room_id, (room.max_players, room.tick_rate),
+                           not room.is_joinable()))
+
+        # Spectator asking to watch a room (the front-end serves it from the room's feed)
+        elif kind == "spectate":
+            _, conn_id, room_id = command
+            room = manager.rooms.get(room_id)
+            if room is None:
+                connection = ProxyConnection(conn_id, events)
+                connection.send(protocol.encode_error(f"Room {room_id} does not exist"))
+                connection.close()
+                return
+            initial_data, seq = room.watch(conn_id)
+            watchers[conn_id] = room
+            events.append(("send", conn_id, initial_data))
+            events.append(("watching", conn_id, room_id, seq))
+
+        # A spectator of the room has to start over from a keyframe
+        elif kind == "keyframe":
+            room = manager.rooms.get(command[1])
+            if room is not None:
+                room.spectators.wants_keyframe = True
+
+        # Client disconnected
+        elif kind == "leave":
+            session = sessions.pop(command[1], None)
+            if session is not None:
+                room, player_id, connection = session
+                room.remove_player(player_id, connection)
+            elif command[1] in watchers:
+                watchers.pop(command[1]).remove_spectator(command[1])
+
+        # Hand a room over to another worker
+        elif kind == "export":
+            room = manager.rooms.pop(command[1], None)
+            if room is None:
+                events.append(("exported", command[1], None))
+                return
+            for connection in room.clients.values():
+                sessions.pop(connection.conn_id, None)
+            for conn_id in room.spectators.remote:
+                watchers.pop(conn_id, None)
+            events.append(("exported", room.room_id, export_room(room)))
+
+        # Take over a room from another worker
+        elif kind == "import":
+            room = import_room(command[1], events)
+            manager.rooms[room.room_id] = room
+            room.scheduler.start()
+            for player_id, connection in room.clients.items():
+                sessions[connection.conn_id] = (room, player_id, connection)
+            for conn_id in room.spectators.remote:
+                watchers[conn_id] = room
+
+    try:
+        while True:
+
+            # Wait for commands until the next room is due
+            now = time.monotonic()
+            timeout = min((room.scheduler.delay(now) for room in manager.rooms.values()), default=0.1)
+            if pipe.poll(timeout):
+                while pipe.poll():
+                    handle_command(pipe.recv())
+
+            # Advance every room that is due
+            now = time.monotonic()
+            for room in list(manager.rooms.values()):
+                for _ in range(room.scheduler.due(now)):
+                    room.scheduler.next_tick()
+
+                    started = time.perf_counter()
+                    outgoing, played = room.advance()
+                    for connection, data in outgoing.items():
+                        connection.send(data)
+                    elapsed = time.perf_counter() - started
+
+                    if played:
+                        tick_count += 1
+                        tick_total += elapsed
+                        tick_max = max(tick_max, elapsed)
+                        room_costs[room.room_id] = room_costs.get(room.room_id, 0.0) + elapsed
+
+                # New spectator feed entries go to the front-end once, whatever the number of spectators
+                feed = room.spectators
+                if feed.remote and feed.next_seq > feed.forwarded:
+                    events.append(("feed", room.room_id, feed.since(feed.forwarded)))
+                    feed.forwarded = feed.next_seq
+
+            # Report tick-time statistics
+            if now - last_report >= STATS_INTERVAL:
+                interval = now - last_report
+                schedulers = [room.scheduler for room in manager.rooms.values()]
+                events.append(("stats", {
+                    "rooms": len(manager.rooms),
+                    "players": sum(len(room.clients) for room in manager.rooms.values()),
+                    "ticks": tick_count,
+                    "tick_mean": tick_total / tick_count if tick_count else 0.0,
+                    "tick_max": tick_max,
+                    "late_max": max((ticks.max_lateness for ticks in schedulers), default=0.0),
+                    "skipped": sum(ticks.skipped_ticks for ticks in schedulers),
+                    "busy": tick_total / interval,
+                    "room_costs": {room_id: cost / interval for room_id, cost in room_costs.items()
+                                   if room_id in manager.rooms}
+                }))
+                tick_count = 0
+                tick_total = tick_max = 0.0
+                room_costs = {}
+                last_report = now
+                for ticks in schedulers:
+                    ticks.reset_stats()
+
+            # Everything produced this pass goes to the front-end in one message
+            if events:
+                pipe.send(list(events))
+                events.clear()
+
+    # Exception in the case of user-inputted server shutdown
+    except (KeyboardInterrupt, EOFError):
+        pass
+
+
+class Supervisor:
+    """
+    Front-end of the supervisor mode: accepts clients, routes their messages to the worker
+    owning their room and writes back what the workers send.
+    """
+
+    def __init__(self, default_size, worker_count, speed, board_size, replay_dir=None, view_radius=0, arena=False):
+        self.default_size = default_size
+        self.worker_count = worker_count
+        self.speed = speed
+        self.pipes = []
+        self.processes = []
+
+        # Per-connection and per-room routing
+        self.connections = {}
+        self.conn_worker = {}
+        self.conn_room = {}
+        self.room_worker = {}
+        self.next_conn_id = 0
+
+        # Quick-match (room size, tick rate) -> [worker currently filling such a room, joins sent to it]
+        self.filling = {}
+
+        # Rooms handed to each worker (counts joins still in flight, unlike the worker statistics)
+        self.assigned_rooms = [0] * worker_count
+
+        # Rooms being moved: room number -> (target worker, commands held back meanwhile)
+        self.migrating = {}
+
+        # Spectators: room number -> front-end copy of the room's feed, connection number -> room watched
+        self.feeds = {}
+        self.spectating = {}
+
+        # Latest statistics of each worker
+        self.stats = [{"rooms": 0, "players": 0, "ticks": 0, "tick_mean": 0.0, "tick_max": 0.0,
+                       "late_max": 0.0, "skipped": 0, "busy": 0.0, "room_costs": {}} for _ in range(worker_count)]
+
+        # Start workers before any event loop exists so they fork from a clean process
+        for worker_id in range(worker_count):
+            parent_pipe, child_pipe = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=worker_main, daemon=True,
+                                              args=(worker_id, worker_count, child_pipe, default_size, speed, board_size,
+                                                    replay_dir, view_radius, arena))
+            process.start()
+            self.pipes.append(parent_pipe)
+            self.processes.append(process)
+
+    def least_loaded_worker(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for picking the worker with the most spare capacity
+        (least busy, then fewest rooms handed to it).
+
+        Returns: Worker number
+        """
+        return min(range(self.worker_count), key=lambda w: (round(self.stats[w]["busy"], 2), self.assigned_rooms[w]))
+
+    def route(self, conn_id, command):
+        """
+        Parameters: connection the command is about (conn_id), command for its worker (command)
+
+        Function for sending a command to the worker owning the connection's room.
+        Commands for a room that is being moved are held back until it arrives.
+
+        Returns: NULL (Nothing)
+        """
+        room_id = self.conn_room.get(conn_id)
+        if room_id in self.migrating:
+            self.migrating[room_id][1].append(command)
+        else:
+            self.pipes[self.conn_worker[conn_id]].send(command)
+
+    def join(self, conn_id, data):
+        """
+        Parameters: connection asking to join (conn_id), decoded join request (data)
+
+        Function for choosing the worker a join request goes to.
+
+        Returns: NULL (Nothing)
+        """
+
+        # Spectator: the owner of the room (by default the one with the most connections)
+        if data["spectate"]:
+            room_id = data["room_id"]
+            if room_id is None:
+                connections = {}
+                for conn_room in self.conn_room.values():
+                    connections[conn_room] = connections.get(conn_room, 0) + 1
+                room_id = max(connections, key=connections.get, default=None)
+                if room_id is None:
+                    raise rooms.RoomError("No room to watch")
+            self.conn_worker[conn_id] = self.room_worker.get(room_id, room_id % self.worker_count)
+            self.conn_room[conn_id] = room_id
+            self.route(conn_id, ("spectate", conn_id, room_id))
+            return
+
+        size = data["max_players"] or self.default_size
+        kind = (size, data["tick_rate"] or self.speed)
+
+        # Specific room: its owner
+        if data["room_id"] is not None:
+            worker = self.room_worker.get(data["room_id"], data["room_id"] % self.worker_count)
+
+        # New room: the least busy worker
+        elif data["create"]:
+            worker = self.least_loaded_worker()
+            self.assigned_rooms[worker] += 1
+
+        # Quick match: keep filling the same worker's room until enough joins were sent to fill it
+        else:
+            if kind not in self.filling:
+                self.filling[kind] = [self.least_loaded_worker(), 0]
+                self.assigned_rooms[self.filling[kind][0]] += 1
+            worker = self.filling[kind][0]
+            self.filling[kind][1] += 1
+            if self.filling[kind][1] >= size:
+                del self.filling[kind]
+
+        self.conn_worker[conn_id] = worker
+        self.pipes[worker].send(("join", conn_id, data["room_id"], size, data["create"], data["tick_rate"]))
+
+    def on_worker_events(self, worker):
+        """
+        Parameters: worker whose pipe has data (worker)
+
+        Function for applying the events a worker sent: frames to write, connections to close,
+        joins, moved rooms and statistics.
+
+        Returns: NULL (Nothing)
+        """
+        pipe = self.pipes[worker]
+        while pipe.poll():
+            for event in pipe.recv():
+                kind = event[0]
+
+                # A player whose queue is full gets a keyframe from its room instead of the dropped frame
+                if kind == "send":
+                    connection = self.connections.get(event[1])
+                    if connection is not None and not connection.send(event[2]) and event[1] not in self.spectating:
+                        self.route(event[1], ("message", event[1], protocol.MSG_KEYFRAME_REQUEST, {"tick": 0}))
+
+                elif kind == "close":
+                    connection = self.connections.get(event[1])
+                    if connection is not None:
+                        connection.close()
+
+                elif kind == "joined":
+                    _, conn_id, room_id, kind, full = event
+                    self.room_worker[room_id] = worker
+                    if conn_id in self.connections:
+                        self.conn_room[conn_id] = room_id
+                    if full and self.filling.get(kind, [None])[0] == worker:
+                        del self.filling[kind]
+
+                elif kind == "watching":
+                    self.add_spectator(*event[1:])
+
+                elif kind == "feed":
+                    self.serve_spectators(event[1], event[2])
+
+                elif kind == "exported":
+                    self.finish_migration(event[1], event[2])
+
+                elif kind == "stats":
+                    self.stats[worker] = event[1]
+
+    def add_spectator(self, conn_id, room_id, seq):
+        """
+        Parameters: connection of the spectator (conn_id), room it watches (room_id),
+                    first feed entry it needs (seq)
+
+        Function for attaching a spectator the worker accepted to the front-end's copy of the room's feed.
+
+        Returns: NULL (Nothing)
+        """
+        connection = self.connections.get(conn_id)
+        if connection is None:
+            return
+        if room_id not in self.feeds:
+            self.feeds[room_id] = spectators.SpectatorFeed()
+            self.feeds[room_id].next_seq = seq
+        self.spectating[conn_id] = room_id
+        self.feeds[room_id].add(connection, seq=seq)
+
+    def serve_spectators(self, room_id, entries):
+        """
+        Parameters: room watched (room_id), new entries of its feed (entries)
+
+        Function for writing a room's new feed entries to its spectators, and asking
+        the room's worker for a keyframe when one of them has to start over.
+
+        Returns: NULL (Nothing)
+        """
+        feed = self.feeds.get(room_id)
+        if feed is None:
+            return
+        feed.extend(entries)
+        feed.serve()
+
+        if feed.wants_keyframe:
+            feed.wants_keyframe = False
+            if room_id in self.migrating:
+                self.migrating[room_id][1].append(("keyframe", room_id))
+            else:
+                self.pipes[self.room_worker[room_id]].send(("keyframe", room_id))
+
+    def finish_migration(self, room_id, blob):
+        """
+        Parameters: room that was moved (room_id), its exported data or None if it is gone (blob)
+
+        Function for handing an exported room to its new worker and releasing held-back commands.
+
+        Returns: NULL (Nothing)
+        """
+        target, held = self.migrating.pop(room_id)
+        if blob is None:
+            return
+
+        self.pipes[target].send(("import", blob))
+        self.assigned_rooms[self.room_worker[room_id]] -= 1
+        self.assigned_rooms[target] += 1
+        self.room_worker[room_id] = target
+        for conn_id in list(blob["clients"].values()) + list(blob["spectators"].remote):
+            self.conn_worker[conn_id] = target
+        for command in held:
+            self.pipes[target].send(command)
+        print(f"Moved room {room_id} to worker {target}")
+
+    def rebalance(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Function for moving one running room from the busiest worker to the least busy one
+        when the busiest is overloaded.
+
+        Returns: NULL (Nothing)
+        """
+        if self.migrating or self.worker_count < 2:
+            return
+
+        busiest = max(range(self.worker_count), key=lambda w: self.stats[w]["busy"])
+        idlest = self.least_loaded_worker()
+        gap = self.stats[busiest]["busy"] - self.stats[idlest]["busy"]
+        if self.stats[busiest]["busy"] < REBALANCE_THRESHOLD or gap < REBALANCE_THRESHOLD / 2:
+            return
+
+        # Largest room that still leaves the busiest worker at least as busy as the idlest
+        candidates = [(cost, room_id) for room_id, cost in self.stats[busiest]["room_costs"].items()
+                      if 0 < cost <= gap / 2]
+        if len(self.stats[busiest]["room_costs"]) < 2 or not candidates:
+            return
+
+        _, room_id = max(candidates)
+        self.migrating[room_id] = (idlest, [])
+        self.pipes[busiest].send(("export", room_id))
+
+    async def handle_client(self, reader, writer):
+        """
+        Parameters: asyncio stream reader (reader) and writer (writer) of a new connection
+
+        Coroutine for reading a client's frames and forwarding them to its worker.
+
+        Returns: NULL (Nothing)
+        """
+        conn_id = self.next_conn_id
+        self.next_conn_id += 1
+        connection = connections.StreamConnection(writer)
+        self.connections[conn_id] = connection
+        decoder = protocol.StreamDecoder()
+
+        try:
+            while True:
+                chunk = await reader.read(1024)
+                if not chunk:
+                    break
+
+                for msg_type, data in decoder.feed(chunk):
+
+                    # Not in a room yet: only a join request is accepted
+                    if conn_id not in self.conn_worker:
+                        if msg_type != protocol.MSG_JOIN:
+                            raise rooms.RoomError("Expected a join request")
+                        self.join(conn_id, data)
+
+                    # Spectators only ever ask to start over from a keyframe
+                    elif conn_id in self.spectating:
+                        if msg_type == protocol.MSG_KEYFRAME_REQUEST:
+                            self.feeds[self.spectating[conn_id]].resync(connection)
+                    else:
+                        self.route(conn_id, ("message", conn_id, msg_type, data))
+
+        # Exception for clients that could not be placed in a room
+        except rooms.RoomError as e:
+            connection.send(protocol.encode_error(str(e)))
+
+        # Exception for errors during data processing
+        except Exception as e:
+            print(f"Error processing client {conn_id} data: {e}")
+
+        # Clean up remaining resources
+        finally:
+            if conn_id in self.spectating:
+                room_id = self.spectating.pop(conn_id)
+                self.feeds[room_id].remove(connection)
+                if not self.feeds[room_id].spectators:
+                    del self.feeds[room_id]
+            if conn_id in self.conn_worker:
+                self.route(conn_id, ("leave", conn_id))
+            del self.connections[conn_id]
+            self.conn_worker.pop(conn_id, None)
+            self.conn_room.pop(conn_id, None)
+            connection.close()
+
+    async def monitor(self):
+        """
+        Parameters: NULL (Nothing)
+
+        Coroutine for printing worker statistics and rebalancing rooms periodically.
+
+        Returns: NULL (Nothing)
+        """
+        elapsed = 0
+        while True:
+            await asyncio.sleep(REBALANCE_INTERVAL)
+            elapsed += REBALANCE_INTERVAL
+            self.rebalance()
+
+            if elapsed % PRINT_INTERVAL == 0:
+                for worker, stats in enumerate(self.stats):
+                    print(f"Worker {worker}: {stats['rooms']} rooms, {stats['players']} players, "
+                          f"{stats['ticks']} ticks/s, tick mean {stats['tick_mean'] * 1000:.2f} ms "
+                          f"max {stats['tick_max'] * 1000:.2f} ms, late max {stats['late_max'] * 1000:.2f} ms, "
+                          f"{stats['skipped']} skipped, busy {stats['busy'] * 100:.1f}%")
+
+    async def serve(self, host, port):
+        """
+        Parameters: address to listen on (host, port)
+
+        Coroutine for running the front-end until the server is stopped.
+
+        Returns: NULL (Nothing)
+        """
+        loop = asyncio.get_running_loop()
+        for worker, pipe in enumerate(self.pipes):
+            loop.add_reader(pipe.fileno(), self.on_worker_events, worker)
+
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"Supervisor started on port {port} with {self.worker_count} workers. Waiting for players...")
+        monitor_task = asyncio.create_task(self.monitor())
+
+        async with server:
+            try:
+                await server.serve_forever()
+            finally:
+                monitor_task.cancel()
+
+
+def serve(host, port, default_size, worker_count, speed, board_size, replay_dir=None, view_radius=0, arena=False):
+    """
+    Parameters: address to listen on (host, port), quick-match room size (default_size),
+                number of worker processes (worker_count), default ticks per second (speed),
+                board size in cells (board_size), directory for match replays, None to not record (replay_dir),
+                radius of each player's view in cells, 0 for the whole board (view_radius),
+                whether rooms are arenas (arena)
+
+    Function for running the server in supervisor mode.
+
+    Returns: NULL (Nothing)
+    """
+    supervisor = Supervisor(default_size, worker_count, speed, board_size, replay_dir, view_radius, arena)
+
+    # Exception in the case of user-inputted server shutdown
+    try:
+        asyncio.run(supervisor.serve(host, port))
+    except KeyboardInterrupt:
+        print("Server shutting down...")
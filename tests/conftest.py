@@ -0,0 +1,36 @@
+import pytest
+import engine
+
+
+"""
+Fixtures shared by the tests.
+"""
+
+
+class Connection:
+    """Stand-in for a client connection: a room only sends to it and closes it"""
+
+    def __init__(self):
+        self.sent = bytearray()
+        self.closed = False
+
+    def send(self, data):
+        self.sent += data
+        return True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def board():
+    """Restores the default board size after a test that changes it"""
+    columns, rows = engine.COLUMNS, engine.ROWS
+    yield engine.configure_board
+    engine.configure_board(columns, rows)
+
+
+@pytest.fixture
+def connection():
+    """Makes stand-in client connections for rooms"""
+    return Connection
@@ -0,0 +1,101 @@
+import random
+import pytest
+import engine
+import protocol
+
+np = pytest.importorskip("numpy")
+batch = pytest.importorskip("batch")
+
+
+"""
+Regression test of batch.BatchEngine against engine.update_game. The batch engine is a
+second implementation of the rules, so seeded random games are played on both with the
+same inputs and the same food (the batch engine draws its food with NumPy, and that cell
+is copied to the engine's game state), and every board is compared snake for snake after
+every tick, including scores, the winner and ties.
+"""
+
+
+# Seeded games per board size and player count, and the longest any of them runs
+GAMES = 25
+MAX_TICKS = 200
+
+
+def engine_board(batch_engine, board_number):
+    """
+    Parameters: batch engine (batch_engine), one of its boards (board_number)
+
+    Function for building the engine game state of a board at the start of its match.
+
+    Returns: Game state dictionary
+    """
+    game_state = engine.new_game_state(board_number)
+    game_state["food"] = batch_engine.board_state(board_number)["food"]
+    for slot, (column, row, direction) in enumerate(batch_engine.starts[:batch_engine.players]):
+        direction = protocol.DIRECTIONS[direction]
+        body = engine.initialize_snake([column * engine.SPACE_SIZE, row * engine.SPACE_SIZE], direction)
+        engine.add_snake(game_state, str(slot), body, direction)
+        game_state["scores"][str(slot)] = 0
+    return game_state
+
+
+def compare(game_state, batch_state, where):
+    """
+    Parameters: engine game state (game_state), batch board as a client-style state (batch_state),
+                board and tick for the message (where)
+
+    Function for asserting that both engines see the same match.
+
+    Returns: NULL (Nothing)
+    """
+    players = {key: {"body": [list(segment) for segment in snake], "direction": snake.direction}
+               for key, snake in game_state["players"].items()}
+    assert players == batch_state["players"], where
+    assert game_state["scores"] == batch_state["scores"], where
+    assert game_state["game_over"] == batch_state["game_over"], where
+    assert game_state.get("winner") == batch_state.get("winner"), where
+    assert game_state.get("tie", False) == batch_state.get("tie", False), where
+
+
+def test_batch_matches_engine(board, capsys):
+    rng = random.Random(1)
+    ticks = 0
+    for columns, rows in ((6, 6), (8, 8), (12, 9)):
+        board(columns, rows)
+        for players in (2, 3, 4):
+            batch_engine = batch.BatchEngine(GAMES, players, columns, rows, seed=columns * players)
+            states = [engine_board(batch_engine, number) for number in range(GAMES)]
+
+            for tick in range(1, MAX_TICKS + 1):
+                if batch_engine.game_over.all():
+                    break
+
+                # Mostly towards an empty cell, sometimes anywhere (reversals included: both engines ignore them)
+                directions = np.full((GAMES, players), batch.NO_INPUT)
+                for number, game_state in enumerate(states):
+                    for key, snake in game_state["players"].items():
+                        cells = {direction: engine.cell_index(*engine.next_head(*snake.head(), direction))
+                                 for direction in protocol.DIRECTIONS}
+                        safe = [direction for direction in protocol.DIRECTIONS
+                                if cells[direction] >= 0 and game_state["grid"][cells[direction]] == 0]
+                        if rng.random() < 0.1 or not safe:
+                            direction = rng.choice(protocol.DIRECTIONS)
+                        elif snake.direction not in safe or rng.random() < 0.2:
+                            direction = rng.choice(safe)
+                        else:
+                            continue
+                        directions[number, int(key)] = protocol.DIRECTION_CODES[direction]
+                        if not engine.is_reversal(snake.direction, direction):
+                            snake.direction = direction
+
+                running = ~batch_engine.game_over
+                batch_engine.step(directions)
+                for number in np.flatnonzero(running):
+                    game_state = states[number]
+                    engine.update_game(game_state)
+                    batch_state = batch_engine.board_state(number)
+                    compare(game_state, batch_state, f"{columns}x{rows}, {players} players, board {number}, tick {tick}")
+                    game_state["food"] = batch_state["food"]
+                    ticks += 1
+    capsys.readouterr()
+    assert ticks > 9 * GAMES * 10
@@ -0,0 +1,200 @@
+import asyncio
+import socket
+import types
+import pytest
+import connections
+import engine
+import protocol
+
+
+"""
+Tests of the bounded send queues in connections.py: under MAX_QUEUED_BYTES a message is
+queued whole; over it the game state frames are dropped and the control frames (countdown,
+result, errors) still queued; a client over the limit for MAX_LAG seconds is disconnected.
+The clock of the module is replaced so no test has to wait. asyncio connections run in an
+event loop, as in the server, and time how long their messages wait in the transport.
+"""
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Clock of connections.py, moved on by hand"""
+    clock = types.SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(connections, "time", types.SimpleNamespace(monotonic=lambda: clock.now))
+    return clock
+
+
+class Transport:
+    """Transport whose write buffer never drains unless the test empties it"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.aborted = False
+
+    def get_write_buffer_size(self):
+        return len(self.buffer)
+
+    def set_write_buffer_limits(self, high=None, low=None):
+        pass
+
+    def abort(self):
+        self.aborted = True
+
+
+class Writer:
+    """Stand-in for an asyncio StreamWriter"""
+
+    def __init__(self):
+        self.transport = Transport()
+
+    def is_closing(self):
+        return self.transport.aborted
+
+    def write(self, data):
+        self.transport.buffer += data
+
+    def get_extra_info(self, name):
+        return ("127.0.0.1", 1)
+
+    async def drain(self):
+        await asyncio.Future()
+
+
+def snapshot():
+    """Game state frame of an empty match"""
+    return protocol.encode_snapshot(engine.new_game_state(1), 1)
+
+
+def test_admit_under_the_limit(clock):
+    limit = connections.SendLimit()
+    data = snapshot() + protocol.encode_countdown(2)
+    assert limit.admit(0, data) == (data, True)
+    assert limit.admit(connections.MAX_QUEUED_BYTES - 1, data) == (data, True)
+    assert limit.over_since is None
+    assert limit.dropped == 0
+
+
+def test_admit_drops_state_but_keeps_control_frames(clock):
+    limit = connections.SendLimit()
+    countdown = protocol.encode_countdown(1)
+    game_over = protocol.encode_game_over("0")
+    assert limit.admit(connections.MAX_QUEUED_BYTES, snapshot() + countdown) == (countdown, False)
+    assert limit.admit(connections.MAX_QUEUED_BYTES, snapshot()) == (b"", False)
+    assert limit.admit(connections.MAX_QUEUED_BYTES, game_over + snapshot()) == (game_over, False)
+    assert limit.dropped == 3
+
+    # Back under the limit the client is no longer behind
+    assert limit.over_since == clock.now
+    assert limit.admit(0, snapshot())[1]
+    assert limit.over_since is None
+
+
+def test_lagging_after_max_lag(clock):
+    limit = connections.SendLimit()
+    limit.admit(connections.MAX_QUEUED_BYTES, snapshot())
+    clock.now += connections.MAX_LAG - 0.1
+    limit.admit(connections.MAX_QUEUED_BYTES, snapshot())
+    assert not limit.lagging()
+    clock.now += 0.1
+    assert limit.lagging()
+
+
+def test_stream_connection_drops_and_disconnects(clock, capsys):
+    async def main():
+        writer = Writer()
+        connection = connections.StreamConnection(writer)
+        frame = snapshot()
+        while connection.buffered() < connections.MAX_QUEUED_BYTES:
+            assert connection.send(frame)
+
+        # Over the limit: state is dropped, the result still goes out
+        backlog = connection.buffered()
+        assert not connection.send(frame)
+        assert connection.buffered() == backlog
+        game_over = protocol.encode_game_over()
+        assert not connection.send(frame + game_over)
+        assert writer.transport.buffer.endswith(game_over)
+        assert not writer.transport.aborted
+
+        # Still over the limit MAX_LAG seconds later
+        clock.now += connections.MAX_LAG
+        assert not connection.send(frame)
+        assert writer.transport.aborted
+        assert not connection.send(frame)
+        capsys.readouterr()
+
+    asyncio.run(main())
+
+
+def test_stream_connection_recovers_when_drained(clock):
+    async def main():
+        writer = Writer()
+        connection = connections.StreamConnection(writer)
+        writer.transport.buffer += bytes(connections.MAX_QUEUED_BYTES)
+        assert not connection.send(snapshot())
+        clock.now += connections.MAX_LAG - 1
+        writer.transport.buffer.clear()
+        assert connection.send(snapshot())
+        clock.now += connections.MAX_LAG
+        writer.transport.buffer += bytes(connections.MAX_QUEUED_BYTES)
+        assert not connection.send(snapshot())
+        assert not writer.transport.aborted
+
+    asyncio.run(main())
+
+
+def test_socket_connection_writes_in_order():
+    server, client = socket.socketpair()
+    connection = connections.SocketConnection(server)
+    frames = [protocol.encode_countdown(value) for value in range(3, 0, -1)] + [protocol.encode_game_over("1")]
+    for frame in frames:
+        assert connection.send(frame)
+    connection.close()
+
+    decoder = protocol.StreamDecoder()
+    messages = []
+    client.settimeout(5)
+    while True:
+        data = client.recv(4096)
+        if not data:
+            break
+        messages.extend(decoder.feed(data))
+    client.close()
+    assert messages == [(protocol.MSG_COUNTDOWN, {"countdown_value": value}) for value in (3, 2, 1)] + \
+        [(protocol.MSG_GAME_OVER, {"winner": "1"})]
+    assert connection.buffered() == 0
+
+
+def test_stream_connection_times_writes(capsys):
+    async def main():
+        server, client = socket.socketpair()
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        client.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        client.setblocking(False)
+        _, writer = await asyncio.open_connection(sock=server)
+        connection = connections.StreamConnection(writer)
+        delays = connections.SEND_DELAY_SECONDS
+        before = sum(delays.counts)
+
+        # More than the socket takes at once: the rest waits in the transport until the client reads
+        frame = protocol.encode_error("x" * 10000)
+        for _ in range(12):
+            assert connection.send(frame)
+        assert connection.buffered() and connection.waiting
+        assert sum(delays.counts) - before == 12 - len(connection.waiting)
+
+        received = 0
+        while received < 12 * len(frame):
+            await asyncio.sleep(0.01)
+            try:
+                while True:
+                    received += len(client.recv(1 << 16))
+            except BlockingIOError:
+                pass
+        await asyncio.sleep(0.01)
+        assert not connection.waiting
+        assert sum(delays.counts) - before == 12
+        writer.close()
+        client.close()
+
+    asyncio.run(main())
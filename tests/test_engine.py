@@ -0,0 +1,208 @@
+import random
+import engine
+
+
+"""
+Regression tests of the game rules in engine.py.
+The collision rules were first written as scans over every snake's list of segments and
+are now resolved with the occupancy grid. reference_tick keeps the scanning version, and
+seeded random games are played with both, tick by tick, on small crowded boards where
+walls, bodies and head-to-head collisions happen all the time. The grid, the free-cell
+list and the spatial hash buckets are checked against the snakes after every tick.
+"""
+
+
+# Seeded games played, and the longest any of them runs
+GAMES = 400
+MAX_TICKS = 200
+
+
+def reference_collision(snakes, player_id, body):
+    """
+    Parameters: every snake's body and direction (snakes), player number (player_id), its body (body)
+
+    Function for checking the collisions of a snake that just moved by scanning every segment
+    of every snake (the rules check_collision implements with the grid).
+
+    Returns: Boolean of whether the snake dies, list of other snakes that die from this collision
+    """
+    head = body[0]
+    if not (0 <= head[0] < engine.GAME_WIDTH and 0 <= head[1] < engine.GAME_HEIGHT):
+        return True, []
+    if head in body[1:]:
+        return True, []
+
+    for other_id, other in snakes.items():
+        if other_id == player_id:
+            continue
+
+        # Head-to-head collision: the longer snake survives, a tie kills both
+        if head == other["body"][0]:
+            if len(body) > len(other["body"]):
+                return False, [other_id]
+            if len(body) < len(other["body"]):
+                return True, []
+            return True, [other_id]
+
+        if head in other["body"][1:]:
+            return True, []
+    return False, []
+
+
+def reference_tick(snakes, scores, food):
+    """
+    Parameters: every snake's body and direction (snakes), scores (scores), food cell (food)
+
+    Function for moving every snake in player order and collecting the dead, as update_game does.
+
+    Returns: Boolean of whether the food was eaten, list of the snakes that died
+    """
+    eaten = False
+    dead = []
+    for player_id, snake in snakes.items():
+        if player_id in dead:
+            continue
+
+        body = snake["body"]
+        body.insert(0, list(engine.next_head(*body[0], snake["direction"])))
+        if food is not None and body[0] == food:
+            scores[player_id] += 1
+            eaten = True
+        else:
+            body.pop()
+
+        dies, others = reference_collision(snakes, player_id, body)
+        if dies:
+            dead.append(player_id)
+        dead.extend(other_id for other_id in others if other_id not in dead)
+    return eaten, dead
+
+
+def check_board(game_state):
+    """
+    Parameters: game state of the match (game_state)
+
+    Function for asserting that the grid, the free-cell list and the buckets describe the snakes.
+
+    Returns: NULL (Nothing)
+    """
+    grid = [0] * (engine.COLUMNS * engine.ROWS)
+    buckets = [{} for _ in range(engine.BUCKET_COLUMNS * engine.BUCKET_ROWS)]
+    for player_id, snake in game_state["players"].items():
+        for x, y in snake:
+            cell = engine.cell_index(x, y)
+            grid[cell] = engine.owner_code(player_id)
+            counts = buckets[cell // engine.COLUMNS // engine.BUCKET_CELLS * engine.BUCKET_COLUMNS +
+                             cell % engine.COLUMNS // engine.BUCKET_CELLS]
+            counts[grid[cell]] = counts.get(grid[cell], 0) + 1
+
+    assert list(game_state["grid"]) == grid
+    assert sorted(game_state["free"]) == [cell for cell, owner in enumerate(grid) if owner == 0]
+    assert all(game_state["free_pos"][cell] == index for index, cell in enumerate(game_state["free"]))
+    assert game_state["buckets"] == buckets
+
+
+def play_game(seed, columns, rows, players):
+    """
+    Parameters: seed of the game (seed), board size in cells (columns, rows), snakes on it (players)
+
+    Function for playing one random game with update_game and with the reference rules side by side.
+
+    Returns: Ticks played
+    """
+    rng = random.Random(seed)
+    game_state = engine.new_game_state(seed)
+    snakes = {}
+    for index in range(players):
+        column, row, direction = engine.starting_cell(index)
+        body = engine.initialize_snake([column * engine.SPACE_SIZE, row * engine.SPACE_SIZE], direction)
+        engine.add_snake(game_state, str(index), body, direction)
+        game_state["scores"][str(index)] = 0
+        snakes[str(index)] = {"body": [list(segment) for segment in body], "direction": direction}
+    scores = dict(game_state["scores"])
+    check_board(game_state)
+
+    for tick in range(1, MAX_TICKS + 1):
+        # Mostly towards an empty cell, sometimes anywhere (so every kind of collision happens)
+        for player_id, snake in game_state["players"].items():
+            options = [direction for direction in engine.OPPOSITE_DIRECTIONS
+                       if not engine.is_reversal(snake.direction, direction)]
+            cells = {direction: engine.cell_index(*engine.next_head(*snake.head(), direction)) for direction in options}
+            safe = [direction for direction in options if cells[direction] >= 0 and game_state["grid"][cells[direction]] == 0]
+            if rng.random() < 0.1 or not safe:
+                direction = rng.choice(options)
+            elif snake.direction not in safe or rng.random() < 0.2:
+                direction = rng.choice(safe)
+            else:
+                direction = snake.direction
+            snake.direction = snakes[player_id]["direction"] = direction
+
+        food = game_state["food"]
+        eaten, dead = reference_tick(snakes, scores, food)
+        removed = engine.update_game(game_state)
+        for player_id in dead:
+            del snakes[player_id]
+
+        assert sorted(removed) == sorted(dead), f"seed {seed}, tick {tick}"
+        assert ({key: ([list(segment) for segment in snake], snake.direction)
+                 for key, snake in game_state["players"].items()} ==
+                {key: (snake["body"], snake["direction"]) for key, snake in snakes.items()}), f"seed {seed}, tick {tick}"
+        assert game_state["scores"] == scores
+        assert (game_state["food"] != food) == eaten or game_state["food"] is None
+        check_board(game_state)
+
+        # Last snake standing wins, none left is a tie (or the highest score once the board is full)
+        if game_state["game_over"]:
+            if not game_state.get("board_full"):
+                assert len(snakes) <= 1
+                assert game_state.get("winner") == next(iter(snakes), None)
+                assert game_state.get("tie", False) == (not snakes)
+            return tick
+        assert len(snakes) >= 2
+    return MAX_TICKS
+
+
+def test_collisions_match_list_scan(board, capsys):
+    sizes = [(6, 6), (8, 8), (10, 7), (12, 12)]
+    ticks = 0
+    for seed in range(GAMES):
+        columns, rows = sizes[seed % len(sizes)]
+        board(columns, rows)
+        ticks += play_game(seed, columns, rows, 2 + seed % 3)
+    capsys.readouterr()
+    assert ticks > GAMES * 20
+
+
+def test_head_to_head_longer_snake_wins(board, capsys):
+    board(10, 10)
+    game_state = engine.new_game_state(1)
+    game_state["food"] = None
+    engine.add_snake(game_state, "0", [[60, 100], [40, 100], [20, 100], [0, 100]], "RIGHT")
+    engine.add_snake(game_state, "1", [[100, 100], [120, 100], [140, 100]], "LEFT")
+    for player_id in game_state["players"]:
+        game_state["scores"][player_id] = 0
+
+    engine.update_game(game_state)
+    capsys.readouterr()
+
+    assert list(game_state["players"]) == ["0"]
+    assert game_state["players"]["0"].head() == (80, 100)
+    assert game_state["winner"] == "0"
+    check_board(game_state)
+
+
+def test_head_to_head_tie_kills_both(board, capsys):
+    board(10, 10)
+    game_state = engine.new_game_state(1)
+    game_state["food"] = None
+    engine.add_snake(game_state, "0", [[60, 100], [40, 100], [20, 100]], "RIGHT")
+    engine.add_snake(game_state, "1", [[100, 100], [120, 100], [140, 100]], "LEFT")
+    for player_id in game_state["players"]:
+        game_state["scores"][player_id] = 0
+
+    engine.update_game(game_state)
+    capsys.readouterr()
+
+    assert game_state["players"] == {}
+    assert game_state["tie"]
+    check_board(game_state)
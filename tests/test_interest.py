@@ -0,0 +1,101 @@
+import engine
+import interest
+import protocol
+
+
+"""
+Tests of the areas of interest in interest.py: a View holds the snakes with a cell in the
+buckets around its player's head, a snake entering it arrives in full (BODY_FULL) and one
+leaving it is listed as removed, and the state a client rebuilds from a view's frames is
+always the view's own snapshot. A view without a snake looks at the middle of the board.
+"""
+
+
+def add(game_state, player_key, column, row, direction):
+    """
+    Parameters: game state (game_state), player key (player_key), head cell (column, row), direction (direction)
+
+    Function for adding a snake of the starting length and its score.
+
+    Returns: NULL (Nothing)
+    """
+    body = engine.initialize_snake([column * engine.SPACE_SIZE, row * engine.SPACE_SIZE], direction)
+    engine.add_snake(game_state, player_key, body, direction)
+    game_state["scores"][player_key] = 0
+
+
+def decode(frame):
+    """
+    Parameters: one encoded frame (frame)
+
+    Function for decoding a view's frame.
+
+    Returns: Message type, decoded message
+    """
+    [message] = protocol.StreamDecoder().feed(frame)
+    return message
+
+
+def test_snakes_enter_and_leave_the_view(board, capsys):
+    board(64, 24)
+    game_state = engine.new_game_state(1, arena=True)
+    game_state["game_started"] = True
+    game_state["food"] = None
+
+    # Two snakes on different rows heading towards each other, then apart
+    add(game_state, "0", 12, 4, "RIGHT")
+    add(game_state, "1", 52, 10, "LEFT")
+    view = interest.View(6)
+    msg_type, (client_tick, client) = decode(view.encode(game_state, "0", 0)[0])
+    assert msg_type == protocol.MSG_SNAPSHOT
+    assert set(client["players"]) == {"0"}
+    assert set(client["scores"]) == {"0"}
+
+    entered = left = None
+    for tick in range(1, 36):
+        engine.update_game(game_state)
+        frame, is_keyframe = view.encode(game_state, "0", tick)
+        assert not is_keyframe
+        _, (delta_tick, base_tick, delta) = decode(frame)
+        assert base_tick == client_tick
+        seen = "1" in client["players"]
+        client_tick, client = delta_tick, protocol.apply_delta(client, delta)
+
+        if not seen and "1" in client["players"]:
+            entered = tick
+            [entry] = [entry for entry in delta["players"] if entry[0] == "1"]
+            assert entry[2] == protocol.BODY_FULL
+            assert ("1", 0) in delta["scores"]
+        if seen and "1" not in client["players"]:
+            left = tick
+            assert delta["removed_players"] == ["1"]
+            assert delta["removed_scores"] == ["1"]
+
+        # The client holds exactly the snakes the spatial hash finds around the head
+        assert set(client["players"]) == view.visible_keys(game_state) | {"0"}
+        _, (_, snapshot) = decode(protocol.encode_snapshot(view.visible_state(game_state, "0"), tick))
+        assert client == snapshot
+    capsys.readouterr()
+    assert entered is not None and left is not None and entered < left
+
+
+def test_view_without_a_snake_looks_at_the_middle(board):
+    board(64, 24)
+    game_state = engine.new_game_state(1, arena=True)
+    game_state["food"] = [32 * engine.SPACE_SIZE, 12 * engine.SPACE_SIZE]
+    add(game_state, "1", 33, 13, "LEFT")
+    add(game_state, "2", 2, 2, "RIGHT")
+    view = interest.View(4)
+    state = view.visible_state(game_state, "0")
+    assert view.center == (32, 12)
+    assert set(state["players"]) == {"1"}
+    assert state["food"] == game_state["food"]
+
+    # Once its snake has been seen, the view stays where that snake was last
+    add(game_state, "0", 5, 5, "RIGHT")
+    view.visible_state(game_state, "0")
+    engine.remove_snake(game_state, "0")
+    state = view.visible_state(game_state, "0")
+    assert view.center == (5, 5)
+    assert set(state["players"]) == {"2"}
+    assert state["food"] is None
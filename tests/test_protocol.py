@@ -0,0 +1,232 @@
+import random
+import pytest
+import engine
+import protocol
+
+
+"""
+Tests of the wire format in protocol.py: every message type survives an encode/decode
+round trip, a StreamDecoder rebuilds frames however TCP splits or merges them and
+refuses frames it must not buffer, and a client applying a SnapshotEncoder's keyframes
+and deltas always holds exactly what a full snapshot of the same tick would give it,
+while snakes grow, die, leave and come back under the same player number.
+"""
+
+
+# Seeded matches played through the encoder, and the longest any of them runs
+GAMES = 40
+MAX_TICKS = 150
+
+
+def decode_frames(data):
+    """
+    Parameters: one or more encoded frames (data)
+
+    Function for decoding frames with a fresh StreamDecoder, checking that nothing is left over.
+
+    Returns: List of (message type, decoded message) tuples
+    """
+    decoder = protocol.StreamDecoder()
+    messages = decoder.feed(data)
+    assert not decoder.buffer
+    return messages
+
+
+def decode_frame(data):
+    """
+    Parameters: one encoded frame (data)
+
+    Function for decoding a single frame.
+
+    Returns: Message type, decoded message
+    """
+    messages = decode_frames(data)
+    assert len(messages) == 1
+    return messages[0]
+
+
+def test_control_messages_round_trip():
+    assert decode_frame(protocol.encode_hello(3, 4, room_id=7, tick_rate=20, columns=40, rows=30, view_radius=12)) == (
+        protocol.MSG_HELLO, {"player_id": 3, "max_players": 4, "room_id": 7, "tick_rate": 20,
+                             "columns": 40, "rows": 30, "view_radius": 12})
+    assert decode_frame(protocol.encode_join()) == (
+        protocol.MSG_JOIN, {"room_id": None, "max_players": 0, "create": False, "spectate": False,
+                            "udp": False, "tick_rate": 0})
+    assert decode_frame(protocol.encode_join(5, 3, create=True, tick_rate=30, spectate=True, udp=True)) == (
+        protocol.MSG_JOIN, {"room_id": 5, "max_players": 3, "create": True, "spectate": True,
+                            "udp": True, "tick_rate": 30})
+    assert decode_frame(protocol.encode_input(2, "LEFT", seq=9, tick=120)) == (
+        protocol.MSG_INPUT, {"player_id": 2, "direction": "LEFT", "seq": 9, "tick": 120})
+    assert decode_frame(protocol.encode_countdown(3)) == (protocol.MSG_COUNTDOWN, {"countdown_value": 3})
+    assert decode_frame(protocol.encode_game_over("1")) == (protocol.MSG_GAME_OVER, {"winner": "1"})
+    assert decode_frame(protocol.encode_game_over()) == (protocol.MSG_GAME_OVER, {"tie": True})
+    assert decode_frame(protocol.encode_error("Room is full")) == (protocol.MSG_ERROR, {"reason": "Room is full"})
+    assert decode_frame(protocol.encode_keyframe_request(77)) == (protocol.MSG_KEYFRAME_REQUEST, {"tick": 77})
+    assert decode_frame(protocol.encode_udp_offer(5556, 2 ** 64 - 1)) == (
+        protocol.MSG_UDP_OFFER, {"port": 5556, "token": 2 ** 64 - 1})
+
+
+def test_every_direction_round_trips():
+    for direction in protocol.DIRECTIONS:
+        assert decode_frame(protocol.encode_input(0, direction))[1]["direction"] == direction
+
+
+def test_datagrams_round_trip():
+    frames = protocol.encode_countdown(2) + protocol.encode_game_over("0")
+    seq, tick, messages = protocol.decode_datagram(protocol.encode_datagram(12, 340, frames))
+    assert (seq, tick) == (12, 340)
+    assert messages == [(protocol.MSG_COUNTDOWN, {"countdown_value": 2}), (protocol.MSG_GAME_OVER, {"winner": "0"})]
+
+    # Only the last REDUNDANT_INPUTS inputs travel
+    inputs = [(seq, protocol.DIRECTIONS[seq % 4], 100 + seq) for seq in range(1, 8)]
+    token, decoded = protocol.decode_client_datagram(protocol.encode_client_datagram(2 ** 63 + 5, inputs))
+    assert token == 2 ** 63 + 5
+    assert decoded == inputs[-protocol.REDUNDANT_INPUTS:]
+    assert protocol.decode_client_datagram(protocol.encode_client_datagram(1)) == (1, [])
+
+
+def test_bad_datagrams_are_refused():
+    with pytest.raises(protocol.ProtocolError):
+        protocol.decode_datagram(b"\x01")
+    with pytest.raises(protocol.ProtocolError):
+        protocol.decode_datagram(protocol.encode_datagram(1, 1, protocol.encode_countdown(2)[:-1]))
+    with pytest.raises(protocol.ProtocolError):
+        protocol.decode_client_datagram(protocol.encode_client_datagram(1, [(1, "UP", 5)])[:-2])
+
+    datagram = bytearray(protocol.encode_client_datagram(1))
+    datagram[0] = protocol.PROTOCOL_VERSION + 1
+    with pytest.raises(protocol.ProtocolError):
+        protocol.decode_client_datagram(bytes(datagram))
+
+
+def test_stream_decoder_splits_and_merges():
+    frames = [protocol.encode_hello(1, 2), protocol.encode_countdown(3), protocol.encode_input(1, "UP", 4, 5),
+              protocol.encode_error("bye")]
+    data = b"".join(frames)
+    expected = decode_frames(data)
+    assert [msg_type for msg_type, _ in expected] == [protocol.MSG_HELLO, protocol.MSG_COUNTDOWN,
+                                                      protocol.MSG_INPUT, protocol.MSG_ERROR]
+
+    # One byte at a time, and in random chunks that cut through headers and payloads
+    decoder = protocol.StreamDecoder()
+    assert [message for byte in range(len(data)) for message in decoder.feed(data[byte:byte + 1])] == expected
+    rng = random.Random(1)
+    for _ in range(50):
+        decoder = protocol.StreamDecoder()
+        messages = []
+        offset = 0
+        while offset < len(data):
+            size = rng.randint(1, 12)
+            messages.extend(decoder.feed(data[offset:offset + size]))
+            offset += size
+        assert messages == expected
+        assert not decoder.buffer
+
+
+def test_stream_decoder_refuses_bad_frames():
+    with pytest.raises(protocol.ProtocolError):
+        protocol.StreamDecoder().feed(protocol.FRAME_HEADER.pack(1, protocol.PROTOCOL_VERSION + 1,
+                                                                 protocol.MSG_COUNTDOWN) + b"\x01")
+
+    # An oversize length is refused from the header alone, before any payload arrives
+    with pytest.raises(protocol.ProtocolError):
+        protocol.StreamDecoder().feed(protocol.FRAME_HEADER.pack(protocol.MAX_FRAME_SIZE + 1, protocol.PROTOCOL_VERSION,
+                                                                 protocol.MSG_SNAPSHOT))
+    with pytest.raises(protocol.ProtocolError):
+        protocol.StreamDecoder().feed(protocol.FRAME_HEADER.pack(1, protocol.PROTOCOL_VERSION, 200) + b"\x00")
+    with pytest.raises(protocol.ProtocolError):
+        protocol.StreamDecoder().feed(protocol.FRAME_HEADER.pack(1, protocol.PROTOCOL_VERSION, protocol.MSG_INPUT) + b"\x00")
+
+
+def test_control_frames_keeps_only_control_messages():
+    state = engine.new_game_state(1)
+    snapshot = protocol.encode_snapshot(state, 1)
+    countdown = protocol.encode_countdown(1)
+    game_over = protocol.encode_game_over()
+    assert protocol.control_frames(snapshot + countdown + snapshot + game_over) == countdown + game_over
+    assert protocol.control_frames(snapshot) == b""
+
+
+def play_match(seed, board):
+    """
+    Parameters: seed of the match (seed), board fixture (board)
+
+    Function for playing one random arena match (it never ends) with players leaving and
+    rejoining under their old number, sending every tick through a SnapshotEncoder, and
+    checking the state the client rebuilds against a full snapshot of the same tick.
+
+    Returns: Number of deltas applied
+    """
+    rng = random.Random(seed)
+    board(10 + seed % 3, 10)
+    game_state = engine.new_game_state(seed, arena=True)
+    game_state["game_started"] = True
+    for index in range(4):
+        column, row, direction = engine.starting_cell(index)
+        engine.add_snake(game_state, str(index),
+                         engine.initialize_snake([column * engine.SPACE_SIZE, row * engine.SPACE_SIZE], direction),
+                         direction)
+        game_state["scores"][str(index)] = 0
+
+    encoder = protocol.SnapshotEncoder(keyframe_interval=5 + seed % 20)
+    client = None
+    client_tick = None
+    deltas = 0
+    for tick in range(1, MAX_TICKS + 1):
+        for snake in game_state["players"].values():
+            if rng.random() < 0.3:
+                snake.direction = rng.choice([direction for direction in protocol.DIRECTIONS
+                                              if not engine.is_reversal(snake.direction, direction)])
+            snake.last_input += rng.random() < 0.3
+        engine.update_game(game_state)
+
+        # A player leaves (its score goes), or a dead player's number comes back on the freed cells
+        if rng.random() < 0.05 and game_state["scores"]:
+            player_id = rng.choice(sorted(game_state["scores"]))
+            if player_id in game_state["players"]:
+                engine.remove_snake(game_state, player_id)
+            del game_state["scores"][player_id]
+        for player_id in map(str, range(4)):
+            if player_id not in game_state["players"] and rng.random() < 0.2:
+                free = [[cell % engine.COLUMNS * engine.SPACE_SIZE, cell // engine.COLUMNS * engine.SPACE_SIZE]
+                        for cell in game_state["free"]]
+                engine.add_snake(game_state, player_id, rng.sample(free, min(len(free), rng.randint(1, 4))), "UP")
+                game_state["scores"].setdefault(player_id, 0)
+
+        msg_type, message = decode_frame(encoder.encode(game_state, tick, force_keyframe=rng.random() < 0.02)[0])
+        if msg_type == protocol.MSG_SNAPSHOT:
+            client_tick, client = message
+        else:
+            delta_tick, base_tick, delta = message
+            assert base_tick == client_tick
+            client_tick, client = delta_tick, protocol.apply_delta(client, delta)
+            deltas += 1
+
+        assert client_tick == tick
+        assert client == decode_frame(protocol.encode_snapshot(game_state, tick))[1][1], f"seed {seed}, tick {tick}"
+    return deltas
+
+
+def test_deltas_rebuild_snapshots(board, capsys):
+    deltas = sum(play_match(seed, board) for seed in range(GAMES))
+    capsys.readouterr()
+    assert deltas > GAMES * 20
+
+
+def test_reused_player_number_is_sent_in_full(board, capsys):
+    board(10, 10)
+    game_state = engine.new_game_state(1)
+    game_state["food"] = None
+    engine.add_snake(game_state, "0", [[60, 0], [40, 0], [20, 0], [0, 0]], "RIGHT")
+    game_state["scores"]["0"] = 0
+    encoder = protocol.SnapshotEncoder()
+    _, (_, client) = decode_frame(encoder.encode(game_state, 1)[0])
+
+    # New snake under the same number whose body starts on the old head
+    engine.remove_snake(game_state, "0")
+    engine.add_snake(game_state, "0", [[80, 0], [60, 0], [40, 0]], "RIGHT")
+    _, (_, _, delta) = decode_frame(encoder.encode(game_state, 2)[0])
+    capsys.readouterr()
+
+    assert delta["players"][0][2] == protocol.BODY_FULL
+    assert protocol.apply_delta(client, delta)["players"]["0"]["body"] == [[80, 0], [60, 0], [40, 0]]
@@ -0,0 +1,141 @@
+import glob
+import os
+import random
+import protocol
+import replay
+import rooms
+
+
+"""
+Round trip of the replays in replay.py: rooms record seeded random matches (a classic
+match played to its end and an arena that players keep joining and leaving), and each
+replay file written is played back through engine.update_game with every stored
+checksum compared, ending on the board the room had.
+"""
+
+
+def steer(room, rng, step):
+    """
+    Parameters: room (room), random generator of the test (rng), number of the pass (step)
+
+    Function for sending some of the room's players a random turn for the next tick.
+
+    Returns: NULL (Nothing)
+    """
+    for player_id in list(room.clients):
+        if rng.random() < 0.2:
+            room.handle_message(player_id, protocol.MSG_INPUT,
+                                {"player_id": player_id, "direction": rng.choice(protocol.DIRECTIONS),
+                                 "seq": step + 1, "tick": room.tick + 1})
+
+
+def played_back(directory):
+    """
+    Parameters: replay directory (directory)
+
+    Function for playing every replay in a directory back with its checksums verified.
+
+    Returns: List of (Replay, game state, tick reached) in the order the files were written
+    """
+    results = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.replay")), key=os.path.getmtime):
+        recorded = replay.Replay.load(path)
+        game_state, tick, mismatches = recorded.play(verify=True)
+        assert mismatches == [], path
+        assert tick == recorded.last_tick
+        results.append((recorded, game_state, tick))
+    return results
+
+
+def board_of(game_state):
+    """
+    Parameters: game state (game_state)
+
+    Function for summarizing what a replay must rebuild.
+
+    Returns: Dictionary of snakes, food and scores
+    """
+    return {"players": {key: ([list(segment) for segment in snake], snake.direction)
+                        for key, snake in game_state["players"].items()},
+            "food": game_state["food"], "scores": game_state["scores"]}
+
+
+def test_match_replays(board, connection, tmp_path, capsys):
+    board(12, 12)
+    rng = random.Random(1)
+    room = rooms.Room(0, 3, replay_dir=str(tmp_path))
+    for _ in range(3):
+        room.add_player(connection())
+
+    # Countdown steps are not waited for
+    for step in range(2000):
+        room.next_countdown_time = 0
+        steer(room, rng, step)
+        room.advance()
+        if room.finished_time is not None:
+            break
+    capsys.readouterr()
+    assert room.game_state["game_over"]
+
+    [(recorded, game_state, tick)] = played_back(str(tmp_path))
+    assert not recorded.arena
+    assert tick == room.tick
+    assert board_of(game_state) == board_of(room.game_state)
+    assert game_state["game_over"]
+    assert game_state.get("winner") == room.game_state.get("winner")
+
+
+def test_arena_replays(board, connection, tmp_path, capsys):
+    board(40, 40)
+    rng = random.Random(2)
+    room = rooms.Room(0, 30, replay_dir=str(tmp_path), view_radius=10, arena=True)
+    for step in range(500):
+        if rng.random() < 0.2 and len(room.clients) < 30:
+            room.add_player(connection())
+        if rng.random() < 0.05 and len(room.clients) > 3:
+            player_id = rng.choice(sorted(room.clients))
+            room.remove_player(player_id, room.clients[player_id])
+        steer(room, rng, step)
+        room.advance()
+        assert not room.game_state["game_over"]
+
+    ticks = room.tick
+    for player_id in list(room.clients):
+        room.remove_player(player_id, room.clients[player_id])
+    capsys.readouterr()
+
+    # The checksums stored every CHECKSUM_INTERVAL ticks cover every snake, the food and the scores
+    [(recorded, game_state, tick)] = played_back(str(tmp_path))
+    assert recorded.arena
+    assert tick == ticks
+    assert sum(1 for event in recorded.events if event[1] == replay.EVENT_CHECKSUM) > ticks // replay.CHECKSUM_INTERVAL
+    assert sum(1 for event in recorded.events if event[1] == replay.EVENT_SPAWN) > 50
+    assert not game_state["players"] and not game_state["scores"]
+
+
+def test_arena_recording_is_cut(board, connection, tmp_path, capsys, monkeypatch):
+    monkeypatch.setattr(rooms, "ARENA_REPLAY_TICKS", 100)
+    board(30, 30)
+    rng = random.Random(3)
+    room = rooms.Room(0, 20, replay_dir=str(tmp_path), arena=True)
+    for step in range(450):
+        if rng.random() < 0.2 and len(room.clients) < 20:
+            room.add_player(connection())
+        steer(room, rng, step)
+        room.advance()
+
+        # A piece already saved is played back while the arena goes on, from the board at the cut
+        if step == 300:
+            pieces = played_back(str(tmp_path))
+            assert pieces and all(tick == 100 for _, _, tick in pieces)
+            assert room.recorder.first_tick == 100 * len(pieces)
+    ticks = room.tick
+    for player_id in list(room.clients):
+        room.remove_player(player_id, room.clients[player_id])
+    capsys.readouterr()
+
+    pieces = played_back(str(tmp_path))
+    assert len(pieces) == ticks // 100 + 1
+    assert [recorded.continued for recorded, _, _ in pieces] == [False] + [True] * (len(pieces) - 1)
+    assert sum(tick for _, _, tick in pieces) == ticks
+    assert len({recorded.seed for recorded, _, _ in pieces}) == len(pieces)
@@ -0,0 +1,114 @@
+import pytest
+import protocol
+import rooms
+
+
+"""
+Tests of how a Room queues tick-stamped inputs and applies them in _apply_inputs: one
+turn per tick in the order they were sent, a turn meant for a later tick waits for it
+(unless it claims to be further ahead than MAX_INPUT_LEAD), turns that are no longer
+valid are skipped for the next one, and every input taken off the queue is acknowledged.
+"""
+
+
+@pytest.fixture
+def room(connection, capsys):
+    """Room of two players whose match is running; player 0's snake faces RIGHT"""
+    room = rooms.Room(0, 2)
+    for _ in range(2):
+        room.add_player(connection())
+    room.game_state["game_started"] = True
+    yield room
+    capsys.readouterr()
+
+
+def send(room, seq, direction, tick=0, player_id=0):
+    """
+    Parameters: room (room), input sequence number (seq), direction (direction),
+                tick it is meant for, 0 for as soon as possible (tick), player number (player_id)
+
+    Function for delivering an input as the server does.
+
+    Returns: NULL (Nothing)
+    """
+    room.handle_message(player_id, protocol.MSG_INPUT,
+                        {"player_id": player_id, "direction": direction, "seq": seq, "tick": tick})
+
+
+def step(room):
+    """
+    Parameters: room (room)
+
+    Function for applying the queued inputs of the next tick and counting the tick (without moving the snakes).
+
+    Returns: Direction and last acknowledged input of player 0's snake
+    """
+    room._apply_inputs(room.game_state)
+    room.tick += 1
+    snake = room.game_state["players"]["0"]
+    return snake.direction, snake.last_input
+
+
+def test_one_turn_per_tick(room):
+    send(room, 1, "UP")
+    send(room, 2, "LEFT")
+    send(room, 3, "DOWN")
+    assert step(room) == ("UP", 1)
+    assert step(room) == ("LEFT", 2)
+    assert step(room) == ("DOWN", 3)
+    assert step(room) == ("DOWN", 3)
+
+
+def test_turn_waits_for_its_tick(room):
+    send(room, 1, "UP", tick=room.tick + 3)
+    assert step(room) == ("RIGHT", 0)
+    assert step(room) == ("RIGHT", 0)
+    assert step(room) == ("UP", 1)
+
+
+def test_turn_too_far_ahead_is_applied_at_once(room):
+    send(room, 1, "UP", tick=room.tick + 2 + rooms.MAX_INPUT_LEAD)
+    assert step(room) == ("UP", 1)
+
+    # At the edge of the window it still waits for its tick
+    send(room, 2, "RIGHT", tick=room.tick + 1 + rooms.MAX_INPUT_LEAD)
+    for _ in range(rooms.MAX_INPUT_LEAD):
+        assert step(room) == ("UP", 1)
+    assert step(room) == ("RIGHT", 2)
+
+
+def test_invalid_turns_are_skipped(room):
+    send(room, 1, "LEFT")
+    send(room, 2, "RIGHT")
+    send(room, 3, "DOWN")
+    assert step(room) == ("DOWN", 3)
+
+    # Nothing valid left: the direction stays and the skipped inputs are still acknowledged
+    send(room, 4, "UP")
+    send(room, 5, "DOWN")
+    assert step(room) == ("DOWN", 5)
+
+
+def test_inputs_are_acknowledged_once(room):
+    send(room, 1, "UP")
+    send(room, 1, "LEFT")
+    send(room, 2, "UP", tick=room.tick + 5)
+    assert step(room) == ("UP", 1)
+    assert step(room) == ("UP", 1)
+
+    # A repeat of an input already queued (from a UDP datagram) is ignored
+    send(room, 2, "UP", tick=room.tick + 5)
+    assert len(room.input_queues["0"][0]) == 1
+    for _ in range(3):
+        step(room)
+    assert step(room) == ("UP", 2)
+
+
+def test_queue_is_bounded_and_per_player(room):
+    for seq in range(1, 2 * rooms.MAX_QUEUED_INPUTS):
+        send(room, seq, "UP" if seq % 2 else "RIGHT")
+    send(room, 1, "UP", player_id=1)
+    assert len(room.input_queues["0"][0]) == rooms.MAX_QUEUED_INPUTS
+    step(room)
+    assert room.game_state["players"]["1"].direction == "UP"
+    assert room.game_state["players"]["1"].last_input == 1
@@ -0,0 +1,109 @@
+import pytest
+import scheduler
+
+
+"""
+Tests of the fixed-timestep TickScheduler: deadlines stay on the grid start + n / rate
+whatever the loop does between ticks, a loop that fell behind runs the missed ticks back
+to back, at most MAX_CATCH_UP of them, and skips the rest. Times are passed in directly.
+"""
+
+
+# A tick rate whose interval (0.25 s) is exact in floating point
+RATE = 4
+INTERVAL = 1 / RATE
+START = 100.0
+
+
+def run_due(schedule, now):
+    """
+    Parameters: schedule (schedule), current time (now)
+
+    Function for running every tick that is due, as the server's room loops do.
+
+    Returns: Number of ticks run
+    """
+    count = schedule.due(now)
+    for _ in range(count):
+        schedule.next_tick(now)
+    return count
+
+
+def test_first_tick_is_due_at_once():
+    schedule = scheduler.TickScheduler(RATE)
+    assert schedule.delay(START) == 0.0
+    assert schedule.due(START) == 1
+    assert schedule.next_tick(START) == 1
+    assert schedule.due(START) == 0
+    assert schedule.delay(START + 0.1) == pytest.approx(INTERVAL - 0.1)
+
+
+def test_deadlines_do_not_drift():
+    schedule = scheduler.TickScheduler(RATE)
+    schedule.start(START)
+    now = START
+
+    # Every tick starts a little late and takes most of the interval: the next deadline does not move
+    for tick in range(1, 101):
+        now += schedule.delay(now) + 0.01
+        assert run_due(schedule, now) == 1
+        now += 0.2
+        assert schedule.deadline() == pytest.approx(START + tick * INTERVAL)
+    assert schedule.tick == 100
+    assert schedule.stats()["late_ticks"] == 0
+    assert schedule.stats()["lateness_max"] < 0.011
+
+
+def test_catch_up_runs_missed_ticks_back_to_back():
+    schedule = scheduler.TickScheduler(RATE)
+    run_due(schedule, START)
+
+    # Two intervals late: ticks 2 and 3 are both due now
+    now = START + 2 * INTERVAL
+    assert run_due(schedule, now) == 2
+    assert schedule.due(now) == 0
+    assert schedule.delay(now) == INTERVAL
+    stats = schedule.stats()
+    assert stats["skipped_ticks"] == 0
+    assert stats["late_ticks"] == 1
+
+
+def test_catch_up_is_bounded():
+    schedule = scheduler.TickScheduler(RATE)
+    run_due(schedule, START)
+
+    # Ten intervals late (ticks 2 to 11 missed): MAX_CATCH_UP of them run, the rest are skipped
+    now = START + 10 * INTERVAL
+    missed = 10
+    assert run_due(schedule, now) == scheduler.MAX_CATCH_UP
+    assert schedule.stats()["skipped_ticks"] == missed - scheduler.MAX_CATCH_UP
+    assert schedule.due(now) == 0
+
+    # The schedule goes on from there at the same rate
+    assert schedule.delay(now) == INTERVAL
+    assert run_due(schedule, now + INTERVAL) == 1
+    assert schedule.tick == 1 + scheduler.MAX_CATCH_UP + 1
+
+
+def test_custom_catch_up_limit():
+    schedule = scheduler.TickScheduler(RATE, max_catch_up=1)
+    run_due(schedule, START)
+    assert run_due(schedule, START + 5 * INTERVAL) == 1
+    assert schedule.stats()["skipped_ticks"] == 4
+
+
+def test_set_rate_keeps_the_next_deadline():
+    schedule = scheduler.TickScheduler(RATE)
+    run_due(schedule, START)
+    schedule.set_rate(2 * RATE)
+    assert schedule.deadline() == START + INTERVAL
+    run_due(schedule, START + INTERVAL)
+    assert schedule.deadline() == START + INTERVAL + INTERVAL / 2
+
+
+def test_restart_after_a_pause():
+    schedule = scheduler.TickScheduler(RATE)
+    run_due(schedule, START)
+    schedule.start(START + 60)
+    assert schedule.due(START + 60) == 1
+    assert schedule.stats()["skipped_ticks"] == 0
@@ -0,0 +1,204 @@
+import protocol
+import rooms
+import spectators
+
+
+"""
+Tests of the shared spectator feed in spectators.py: spectators that keep up are all
+written the same entries, and one that fell behind the feed, whose connection is backed
+up or refused a write, or that reported a gap, is sent nothing more until a keyframe is
+published and then starts over from it.
+"""
+
+
+class Spectator:
+    """Stand-in for a spectator's connection whose backlog the test sets"""
+
+    def __init__(self):
+        self.sent = []
+        self.backlog = 0
+        self.refuse = False
+
+    def send(self, data):
+        if self.refuse:
+            return False
+        self.sent.append(data)
+        return True
+
+    def buffered(self):
+        return self.backlog
+
+
+def publish(feed, name, keyframe=False):
+    """
+    Parameters: feed (feed), name of the entry (name), whether a spectator can start from it (keyframe)
+
+    Function for publishing an entry whose resync data is told apart from its data.
+
+    Returns: NULL (Nothing)
+    """
+    feed.publish(b"delta " + name, b"keyframe " + name if keyframe else None)
+
+
+def test_spectators_share_the_entries():
+    feed = spectators.SpectatorFeed()
+    first, second = Spectator(), Spectator()
+    feed.add(first, b"hello")
+    publish(feed, b"1")
+    feed.add(second)
+    publish(feed, b"2")
+    feed.serve()
+    assert first.sent == [b"hello", b"delta 1", b"delta 2"]
+    assert second.sent == [b"delta 2"]
+    assert first.sent[2] is second.sent[0]
+
+    # Nothing new: nothing is sent
+    feed.serve()
+    assert len(first.sent) == 3 and len(second.sent) == 1
+    assert feed.resyncs == 0 and not feed.wants_keyframe
+
+
+def test_spectator_behind_the_feed_starts_from_a_keyframe():
+    feed = spectators.SpectatorFeed()
+    spectator = Spectator()
+    feed.add(spectator)
+    for index in range(spectators.FEED_LENGTH + 10):
+        publish(feed, b"%d" % index, keyframe=index % 20 == 0)
+    feed.serve()
+
+    # Entry 0 has left the feed: it starts over from the newest keyframe
+    assert spectator.sent[0] == b"keyframe 60"
+    assert spectator.sent[1:] == [b"delta %d" % index for index in range(61, spectators.FEED_LENGTH + 10)]
+    assert feed.resyncs == 1
+    assert not feed.wants_keyframe
+
+
+def test_backed_up_spectator_waits_for_a_keyframe():
+    feed = spectators.SpectatorFeed()
+    spectator, other = Spectator(), Spectator()
+    feed.add(spectator)
+    feed.add(other)
+    spectator.backlog = spectators.MAX_BACKLOG + 1
+    publish(feed, b"1")
+    feed.serve()
+    assert spectator.sent == []
+    assert feed.wants_keyframe
+
+    # Drained, it still skips the deltas until a keyframe comes
+    spectator.backlog = 0
+    publish(feed, b"2")
+    feed.serve()
+    assert spectator.sent == []
+    publish(feed, b"3", keyframe=True)
+    assert not feed.wants_keyframe
+    publish(feed, b"4")
+    feed.serve()
+    assert spectator.sent == [b"keyframe 3", b"delta 4"]
+    assert other.sent == [b"delta %d" % index for index in range(1, 5)]
+    assert feed.resyncs == 1
+
+
+def test_refused_write_starts_over():
+    feed = spectators.SpectatorFeed()
+    spectator = Spectator()
+    feed.add(spectator)
+    spectator.refuse = True
+    publish(feed, b"1")
+    feed.serve()
+    assert feed.wants_keyframe
+
+    spectator.refuse = False
+    publish(feed, b"2")
+    feed.serve()
+    assert spectator.sent == []
+    publish(feed, b"3", keyframe=True)
+    feed.serve()
+    assert spectator.sent == [b"keyframe 3"]
+
+
+def test_reported_gap_starts_over():
+    feed = spectators.SpectatorFeed()
+    spectator = Spectator()
+    feed.add(spectator)
+    publish(feed, b"1", keyframe=True)
+    publish(feed, b"2")
+    feed.serve()
+    assert spectator.sent == [b"delta 1", b"delta 2"]
+
+    # A keyframe it was already sent does not count: the next one is waited for
+    feed.resync(spectator)
+    assert feed.wants_keyframe
+    feed.serve()
+    assert spectator.sent == [b"delta 1", b"delta 2"]
+    publish(feed, b"3")
+    publish(feed, b"4", keyframe=True)
+    feed.serve()
+    assert spectator.sent[2:] == [b"keyframe 4"]
+
+    # A spectator that left is forgotten
+    feed.remove(spectator)
+    feed.resync(spectator)
+    assert len(feed) == 0
+
+
+def test_room_sends_a_keyframe_to_a_resyncing_spectator(board, connection, capsys):
+    board(20, 20)
+    room = rooms.Room(0, 2, arena=True)
+    for _ in range(2):
+        room.add_player(connection())
+    spectator = Spectator()
+    room.add_spectator(spectator)
+
+    client = None
+    client_tick = None
+    decoder = protocol.StreamDecoder()
+
+    def watch():
+        # Applies what the spectator was sent, as a client does; returns whether it needed a keyframe
+        nonlocal client, client_tick
+        gap = False
+        for msg_type, message in decoder.feed(b"".join(spectator.sent)):
+            if msg_type == protocol.MSG_SNAPSHOT:
+                client_tick, client = message
+            elif msg_type == protocol.MSG_DELTA:
+                delta_tick, base_tick, delta = message
+                if base_tick != client_tick:
+                    gap = True
+                    continue
+                client_tick, client = delta_tick, protocol.apply_delta(client, delta)
+        spectator.sent.clear()
+        return gap
+
+    for _ in range(10):
+        room.advance()
+        room.spectators.serve()
+        assert not watch()
+    assert client_tick == room.tick
+
+    # A write is refused: the deltas after it are not sent, and the next tick publishes a keyframe
+    spectator.refuse = True
+    room.advance()
+    room.spectators.serve()
+    assert room.spectators.wants_keyframe
+    spectator.refuse = False
+    room.advance()
+    assert not room.spectators.wants_keyframe
+    room.spectators.serve()
+    assert [msg_type for msg_type, _ in protocol.StreamDecoder().feed(spectator.sent[0])] == [protocol.MSG_SNAPSHOT]
+    assert not watch()
+    assert client_tick == room.tick
+
+    # So does a gap the client reports
+    room.handle_spectator_message(spectator, protocol.MSG_KEYFRAME_REQUEST, {"tick": client_tick})
+    assert room.spectators.wants_keyframe
+    room.advance()
+    room.spectators.serve()
+    assert [msg_type for msg_type, _ in protocol.StreamDecoder().feed(spectator.sent[0])] == [protocol.MSG_SNAPSHOT]
+    for _ in range(3):
+        room.advance()
+        room.spectators.serve()
+        assert not watch()
+    capsys.readouterr()
+    assert client_tick == room.tick
+    [(_, (_, snapshot))] = protocol.StreamDecoder().feed(protocol.encode_snapshot(room.game_state, room.tick))
+    assert client == snapshot
@@ -0,0 +1,140 @@
+import pytest
+import protocol
+import rooms
+import udp
+
+
+"""
+Tests of the UDP transport in udp.py: only a datagram carrying a token the server offered
+(and has not forgotten) registers an address or delivers inputs, inputs repeated across
+datagrams are queued once, and the frames of the last REDUNDANT_TICKS ticks carried by
+every datagram let a client lose up to REDUNDANT_TICKS - 1 of them in a row without a gap.
+"""
+
+
+ADDR = ("127.0.0.1", 40000)
+
+
+@pytest.fixture
+def room(connection, capsys):
+    """Arena of two players"""
+    room = rooms.Room(0, 2, arena=True)
+    for _ in range(2):
+        room.add_player(connection())
+    yield room
+    capsys.readouterr()
+
+
+@pytest.fixture
+def sessions(room):
+    """Sessions whose sent datagrams are kept in sessions.sent, with player 0's token in sessions.token"""
+    sessions = udp.Sessions(0)
+    sessions.sent = []
+    sessions.transport_sendto = lambda data, addr: sessions.sent.append((data, addr))
+    _, offer = protocol.StreamDecoder().feed(sessions.offer(room.clients[0], room, 0))[0]
+    sessions.token = offer["token"]
+    return sessions
+
+
+def test_offer_tokens_are_random(room, sessions):
+    tokens = {sessions.token}
+    for _ in range(20):
+        _, offer = protocol.StreamDecoder().feed(sessions.offer(object(), room, 1))[0]
+        tokens.add(offer["token"])
+    assert len(tokens) == 21
+    assert all(0 <= token < 2 ** udp.TOKEN_BITS for token in tokens)
+
+
+def test_registration_needs_the_token(room, sessions):
+    sessions.receive(protocol.encode_client_datagram(sessions.token ^ 1), ADDR)
+    sessions.receive(protocol.encode_client_datagram(sessions.token ^ 1, [(1, "UP", 0)]), ADDR)
+    sessions.receive(b"\x00\x01", ADDR)
+    assert sessions.sent == []
+    assert room.datagram_clients == {}
+    assert "0" not in room.input_queues
+
+    # The right token registers the address and is answered
+    sessions.receive(protocol.encode_client_datagram(sessions.token), ADDR)
+    endpoint = room.datagram_clients[0]
+    assert endpoint.addr == ADDR
+    assert sessions.sent == [(protocol.encode_datagram(0, 0), ADDR)]
+
+    # The same token from a new address (the client's NAT mapping changed) moves the endpoint
+    sessions.receive(protocol.encode_client_datagram(sessions.token), ("127.0.0.1", 40001))
+    assert room.datagram_clients[0] is not endpoint
+    assert room.datagram_clients[0].addr == ("127.0.0.1", 40001)
+
+
+def test_forgotten_token_is_refused(room, sessions):
+    sessions.forget(room.clients[0])
+    sessions.receive(protocol.encode_client_datagram(sessions.token, [(1, "UP", 0)]), ADDR)
+    assert sessions.sent == []
+    assert room.datagram_clients == {}
+    assert "0" not in room.input_queues
+
+
+def test_repeated_inputs_are_queued_once(room, sessions):
+    inputs = [(seq, "UP" if seq % 2 else "RIGHT", 0) for seq in range(1, 6)]
+    for count in range(1, len(inputs) + 1):
+        sessions.receive(protocol.encode_client_datagram(sessions.token, inputs[:count]), ADDR)
+    assert [entry[0] for entry in room.input_queues["0"][0]] == [1, 2, 3, 4, 5]
+    assert sessions.sent == []
+
+
+def play(room, lost):
+    """
+    Parameters: room (room), ticks whose datagram to player 0 is lost (lost)
+
+    Function for running a room and applying the datagrams player 0 receives as the client does.
+
+    Returns: Whether the client saw a gap, its state, its tick
+    """
+    endpoint = room.datagram_clients[0]
+    client = None
+    client_tick = None
+    last_seq = 0
+    gap = False
+    for _ in range(20):
+        outgoing, _ = room.advance()
+
+        # Its state goes by UDP only, and the other player's still over TCP
+        assert room.clients[0] not in outgoing and room.clients[1] in outgoing
+        if room.tick in lost:
+            continue
+        seq, tick, messages = protocol.decode_datagram(outgoing[endpoint])
+        assert seq > last_seq and tick == room.tick
+        last_seq = seq
+
+        # Frames already applied are skipped, a delta from a tick it does not have is a gap
+        for msg_type, message in messages:
+            if msg_type == protocol.MSG_SNAPSHOT:
+                if client_tick is None or message[0] >= client_tick:
+                    client_tick, client = message
+            elif msg_type == protocol.MSG_DELTA:
+                delta_tick, base_tick, delta = message
+                if client_tick is not None and delta_tick <= client_tick:
+                    continue
+                if base_tick != client_tick:
+                    gap = True
+                    continue
+                client_tick, client = delta_tick, protocol.apply_delta(client, delta)
+    return gap, client, client_tick
+
+
+def test_redundant_frames_cover_lost_datagrams(room, sessions):
+    sessions.receive(protocol.encode_client_datagram(sessions.token), ADDR)
+    start = room.tick
+    lost = {start + tick for tick in range(5, 5 + udp.REDUNDANT_TICKS - 1)} | {start + 12}
+    gap, client, client_tick = play(room, lost)
+    assert not gap
+    assert client_tick == room.tick
+    [(_, (_, snapshot))] = protocol.StreamDecoder().feed(protocol.encode_snapshot(room.game_state, room.tick))
+    assert client == snapshot
+
+
+def test_too_many_lost_datagrams_leave_a_gap(room, sessions):
+    sessions.receive(protocol.encode_client_datagram(sessions.token), ADDR)
+    start = room.tick
+    gap, _, client_tick = play(room, {start + tick for tick in range(5, 5 + udp.REDUNDANT_TICKS)})
+    assert gap
+    assert client_tick == start + 4
@@ -0,0 +1,212 @@
+import asyncio
+import random
+import secrets
+import socket
+import threading
+import metrics
+import protocol
+
+
+"""
+Optional UDP transport for the game state and the players' inputs.
+Over TCP one lost packet holds back every later update until it is resent; over UDP a
+lost datagram is simply replaced by the next one. The handshake stays on TCP: a player
+that asks for UDP in its join request is sent a token and the server's UDP port, and
+its first datagram carrying the token tells the server where to send the state. From
+then on its room sends it one datagram per tick holding the frames of the last
+REDUNDANT_TICKS ticks; countdown, results and keyframe requests stay on TCP.
+The token is all that proves a datagram comes from the player, so it is TOKEN_BITS
+bits from the secrets module that another host can neither guess nor predict.
+Inputs arrive in datagrams that repeat the player's last few inputs with their sequence
+numbers; the room queues each one once (see Room.handle_message).
+For testing on a local network, a loss rate drops that fraction of datagrams in both
+directions at random.
+"""
+
+
+# Ticks of frames repeated in each datagram (a client recovers from this many - 1 lost in a row)
+REDUNDANT_TICKS = 3
+
+# Random bits of a session token
+TOKEN_BITS = 64
+
+# Metrics
+DATAGRAM_BYTES = metrics.counter("snake_datagram_bytes_total", "Bytes of UDP datagrams sent and received",
+                                 labelnames=("direction",))
+DATAGRAMS = metrics.counter("snake_datagrams_total", "UDP datagrams sent and received", labelnames=("direction",))
+SENT_BYTES, RECEIVED_BYTES = DATAGRAM_BYTES.labels("sent"), DATAGRAM_BYTES.labels("received")
+SENT_DATAGRAMS, RECEIVED_DATAGRAMS = DATAGRAMS.labels("sent"), DATAGRAMS.labels("received")
+
+
+class DatagramEndpoint:
+    """UDP address of a player; send() writes one datagram and never blocks or queues"""
+
+    def __init__(self, sessions, addr):
+        self.sessions = sessions
+        self.addr = addr
+        self.seq = 0
+
+    def send(self, data):
+        self.sessions.sendto(data, self.addr)
+        return True
+
+    def buffered(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class Session:
+    """A player allowed to use UDP: its room, player number and endpoint once known"""
+
+    def __init__(self, room, player_id):
+        self.room = room
+        self.player_id = player_id
+        self.endpoint = None
+
+
+class Sessions:
+    """
+    Tokens offered to players over TCP and what their datagrams mean.
+    transport_sendto is set by whichever server runs the UDP socket.
+    """
+
+    def __init__(self, port, loss=0.0):
+        self.port = port
+        self.loss = loss
+        self.rng = random.Random()
+        self.by_token = {}
+        self.by_connection = {}
+        self.lock = threading.Lock()
+        self.transport_sendto = None
+
+    def offer(self, connection, room, player_id):
+        """
+        Parameters: TCP connection of the player (connection), its room (room), its player number (player_id)
+
+        Function for inviting a player that joined to switch its game state to UDP.
+
+        Returns: Encoded offer to send over TCP
+        """
+        with self.lock:
+            token = secrets.randbits(TOKEN_BITS)
+            while token in self.by_token:
+                token = secrets.randbits(TOKEN_BITS)
+            self.by_token[token] = Session(room, player_id)
+            self.by_connection[connection] = token
+        return protocol.encode_udp_offer(self.port, token)
+
+    def forget(self, connection):
+        """
+        Parameters: TCP connection that went away (connection)
+
+        Function for invalidating the token of a player that left.
+
+        Returns: NULL (Nothing)
+        """
+        with self.lock:
+            token = self.by_connection.pop(connection, None)
+            self.by_token.pop(token, None)
+
+    def sendto(self, data, addr):
+        """
+        Parameters: datagram (data), address to send it to (addr)
+
+        Function for sending a datagram, unless the simulated loss drops it.
+
+        Returns: NULL (Nothing)
+        """
+        if self.loss and self.rng.random() < self.loss:
+            return
+        try:
+            self.transport_sendto(data, addr)
+        except OSError:
+            return
+        SENT_DATAGRAMS.inc()
+        SENT_BYTES.inc(len(data))
+
+    def receive(self, data, addr):
+        """
+        Parameters: datagram (data), address it came from (addr)
+
+        Function for handling a client datagram: registers or updates the player's address
+        and passes its inputs to the room, oldest first.
+
+        Returns: NULL (Nothing)
+        """
+        if self.loss and self.rng.random() < self.loss:
+            return
+        RECEIVED_DATAGRAMS.inc()
+        RECEIVED_BYTES.inc(len(data))
+        try:
+            token, inputs = protocol.decode_client_datagram(data)
+        except protocol.ProtocolError:
+            return
+
+        with self.lock:
+            session = self.by_token.get(token)
+            if session is None:
+                return
+            endpoint = session.endpoint
+            if endpoint is None or endpoint.addr != addr:
+                endpoint = session.endpoint = DatagramEndpoint(self, addr)
+
+        session.room.attach_datagrams(session.player_id, endpoint)
+        for seq, direction, tick in sorted(inputs):
+            session.room.handle_message(session.player_id, protocol.MSG_INPUT,
+                                        {"player_id": session.player_id, "direction": direction,
+                                         "seq": seq, "tick": tick})
+
+        # Registration datagrams are answered so the client knows UDP gets through
+        if not inputs:
+            self.sendto(protocol.encode_datagram(0, 0), addr)
+
+
+class DatagramServer(asyncio.DatagramProtocol):
+    """UDP socket of the asyncio server"""
+
+    def __init__(self, sessions):
+        self.sessions = sessions
+
+    def connection_made(self, transport):
+        self.sessions.transport_sendto = transport.sendto
+
+    def datagram_received(self, data, addr):
+        self.sessions.receive(data, addr)
+
+
+async def serve_async(host, sessions):
+    """
+    Parameters: address to listen on (host), sessions of the server (sessions)
+
+    Coroutine for opening the UDP socket of the asyncio server.
+
+    Returns: Datagram transport
+    """
+    transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+        lambda: DatagramServer(sessions), local_addr=(host, sessions.port))
+    return transport
+
+
+def serve_threaded(host, sessions):
+    """
+    Parameters: address to listen on (host), sessions of the server (sessions)
+
+    Function for opening the UDP socket of the threaded server and reading it in a thread of its own.
+
+    Returns: NULL (Nothing)
+    """
+    udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp_socket.bind((host, sessions.port))
+    sessions.transport_sendto = udp_socket.sendto
+
+    def receive():
+        while True:
+            try:
+                data, addr = udp_socket.recvfrom(65536)
+            except OSError:
+                continue
+            sessions.receive(data, addr)
+
+    threading.Thread(target=receive, daemon=True).start()